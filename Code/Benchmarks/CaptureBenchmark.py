@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from glob import glob
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils import BinaryFormat
+from Utils.FileWriter import FileWriter
+from Utils.DataCollector import DataCollector
+from Utils.FeatureStream import FeatureStream
+from Utils.HubSimulator import SimulatedHub, DEFAULT_RATES
+
+WRITER_CONFIGURATIONS = [
+    ('csv', False),
+    ('csv', True),
+    ('binary', False),
+    ('binary', True),
+    ('session', False),
+    ('session', True),
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+# number of samples which actually reached the disk
+def count_written_samples(directory):
+    written = 0
+    for path in glob(os.path.join(directory, '*', '*', '*')):
+        if path.endswith(BinaryFormat.SESSION_EXTENSION):
+            written += sum(len(records) for records in BinaryFormat.open_session(path)[1].values())
+        elif path.endswith(BinaryFormat.FILE_EXTENSION):
+            written += len(BinaryFormat.open_stream(path))
+        else:
+            with open(path) as csv_file:
+                written += sum(1 for _ in csv_file) - 1   # header line
+    return written
+
+
+def run_benchmark(backend, async_writing, rate_factor, duration, time_scale, seed, features=False):
+    directory = tempfile.mkdtemp(prefix='capture_benchmark_')
+    try:
+        fileWriter = FileWriter(backend=backend, async_writing=async_writing)
+        fileWriter.storagePath = directory
+        dataCollector = DataCollector(fileWriter, new_feature_stream=FeatureStream if features else None)
+
+        rates = {stream: rate * rate_factor for stream, rate in DEFAULT_RATES.items()}
+        hub = SimulatedHub(rates=rates, duration=duration, time_scale=time_scale, seed=seed)
+
+        fileWriter.open_files('benchmark', 'simulated')
+        hub.run(1000, dataCollector)
+        hub.wait()
+        fileWriter.close_files()
+
+        latencies = sorted(latency for stream_latencies in hub.latencies.values() for latency in stream_latencies)
+        delivered = sum(hub.sampleCounts.values())
+        written = count_written_samples(directory)
+
+        return {
+            'backend': backend,
+            'async': async_writing,
+            'delivered': delivered,
+            'written': written,
+            'dropped': delivered - written,
+            'overflow': fileWriter.overflowCount,
+            'samples_per_second': delivered / hub.elapsed if hub.elapsed > 0 else 0.0,
+            'latency_us': {
+                'p50': percentile(latencies, 0.50) * 1_000_000,
+                'p90': percentile(latencies, 0.90) * 1_000_000,
+                'p99': percentile(latencies, 0.99) * 1_000_000,
+                'max': latencies[-1] * 1_000_000 if latencies else 0.0,
+            },
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the capture path with a simulated Myo hub.')
+    parser.add_argument('--rate-factor', type=float, default=1.0,
+                        help='multiplies the sample rates of the real armband')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of simulated data per run')
+    parser.add_argument('--as-fast-as-possible', action='store_true',
+                        help='deliver samples without waiting instead of in real time')
+    parser.add_argument('--features', action='store_true', help='compute live features in the callbacks as well')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    time_scale = None if args.as_fast_as_possible else 1.0
+
+    results = []
+    print('{:<8} {:<6} {:>12} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+        'backend', 'async', 'samples/s', 'p50 us', 'p90 us', 'p99 us', 'max us', 'dropped'))
+    for backend, async_writing in WRITER_CONFIGURATIONS:
+        result = run_benchmark(backend, async_writing, args.rate_factor, args.duration, time_scale, args.seed,
+                               args.features)
+        results.append(result)
+        print('{:<8} {:<6} {:>12.0f} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>9}'.format(
+            backend, str(async_writing), result['samples_per_second'], result['latency_us']['p50'],
+            result['latency_us']['p90'], result['latency_us']['p99'], result['latency_us']['max'],
+            result['dropped']))
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import pickle
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from time import perf_counter
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils import ArrayDataset
+from Utils.Profiling import peak_rss_megabytes
+from Utils.Interpolation import METHODS
+from Utils.WriterBackends import CsvBackend, STREAM_NAMES
+from Tools.CSVconverter import (CONVERTER_VERSION, STREAM_COLUMNS, acquire_recording, conversion_parameters,
+                                convert_recordings, eliminate_duplicates, find_gesture_start_end, find_recordings,
+                                interpolate_data, plan_conversion, recording_size)
+
+# sample rates of the armband in Hz
+STREAM_RATES = {'emg': 200, 'gyro': 50, 'orientation': 50, 'accelerometer': 50}
+
+STAGES = ('acquire', 'eliminate_duplicates', 'interpolate_data', 'serialize')
+
+# a stage counts as regression if it takes this much longer than in the baseline, differences of less than
+# MIN_DIFFERENCE seconds are measurement noise
+DEFAULT_TOLERANCE = 0.2
+MIN_DIFFERENCE = 0.01
+
+# options which change what is measured, results are only comparable if these are the same
+COMPARED_OPTIONS = ('raw', 'users', 'gestures', 'recordings', 'seconds', 'seed', 'interpolate', 'timestep',
+                    'output_format', 'workers')
+
+
+# timestamps as the armband delivers them: EMG arrives in packets of two samples with the same timestamp, every packet
+# is a little late, and now and then a packet overtakes the one before it
+def stream_timestamps(rng, start, seconds, stream):
+    rate = STREAM_RATES[stream]
+    count = int(seconds * rate)
+    per_packet = 2 if stream == 'emg' else 1
+
+    packets = start + np.arange(0, count, per_packet) * 1_000_000 // rate
+    packets = packets + rng.integers(0, 2_000, len(packets))
+    swapped = np.flatnonzero(rng.random(len(packets) - 1) < 0.002)
+    packets[swapped], packets[swapped + 1] = packets[swapped + 1], packets[swapped].copy()
+    return np.repeat(packets, per_packet)[:count]
+
+
+# samples of one stream: EMG noise with bursts of activity, gravity plus noise for the accelerometer, slow rotations
+# for the gyroscope and a random walk of unit quaternions for the orientation
+def stream_values(rng, stream, count):
+    if stream == 'emg':
+        activity = np.repeat(rng.random(count // 100 + 1) < 0.4, 100)[:count]
+        emg = rng.normal(0.0, 3.0, (count, 8)) * np.where(activity, 12.0, 1.0)[:, np.newaxis]
+        return np.clip(np.round(emg), -128, 127).astype(np.int64)
+    if stream == 'accelerometer':
+        return rng.normal(0.0, 0.05, (count, 3)) + np.array([0.0, 0.0, 1.0])
+    if stream == 'gyro':
+        return np.cumsum(rng.normal(0.0, 4.0, (count, 3)), axis=0) * 0.98
+    quaternions = np.cumsum(rng.normal(0.0, 0.01, (count, 4)), axis=0) + np.array([0.0, 0.0, 0.0, 1.0])
+    return quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)
+
+
+# writes a raw tree Data/raw/<user>/<gesture>/<stream>_<creation time>.csv with the CsvBackend of the FileWriter,
+# every recording lasts `seconds` +-20 %, returns the number of bytes written
+def generate_raw_tree(raw_path, users, gestures, recordings, seconds, seed):
+    rng = np.random.default_rng(seed)
+    start_time = datetime(2018, 5, 4, 12)
+
+    for user in range(users):
+        for gesture in range(gestures):
+            directory = os.path.join(raw_path, 'user{}'.format(user), 'gesture{}'.format(gesture))
+            os.makedirs(directory, exist_ok=True)
+
+            for _ in range(recordings):
+                duration = seconds * rng.uniform(0.8, 1.2)
+                start = int(start_time.timestamp() * 1_000_000)
+
+                backend = CsvBackend()
+                backend.open(directory, start_time.strftime('%Y-%m-%d_%H-%M-%S'), {})
+                for stream_id, stream in enumerate(STREAM_NAMES):
+                    timestamps = stream_timestamps(rng, start, duration, stream)
+                    values = stream_values(rng, stream, len(timestamps))
+                    backend.write_rows(stream_id, zip(timestamps.tolist(), *values.T.tolist()))
+                backend.close()
+
+                start_time += timedelta(seconds=duration + 5)
+
+    return sum(recording_size(recording) for _, _, _, recording in find_recordings(raw_path))
+
+
+# time and traced memory of the stages of a conversion, a stage may run many times, times add up and the peak is the
+# largest one of all runs
+class StageProfile:
+
+    def __init__(self, trace_memory):
+        self.traceMemory = trace_memory
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.peakBytes = {stage: 0 for stage in STAGES}
+        self.__stage = None
+
+    def start(self, stage):
+        self.__stage = stage
+        if self.traceMemory:
+            tracemalloc.reset_peak()
+            self.__baseBytes = tracemalloc.get_traced_memory()[0]
+        self.__start = perf_counter()
+
+    def stop(self):
+        self.seconds[self.__stage] += perf_counter() - self.__start
+        if self.traceMemory:
+            self.peakBytes[self.__stage] = max(self.peakBytes[self.__stage],
+                                               tracemalloc.get_traced_memory()[1] - self.__baseBytes)
+
+
+# runs the stages of the converter one after the other on every recording
+def profile_stages(recordings, output_path, parameters, trace_memory):
+    profile = StageProfile(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        for user, gesture, creation_time, recording in recordings:
+            profile.start('acquire')
+            gesture_dict = acquire_recording(user, gesture, recording)
+            profile.stop()
+
+            profile.start('eliminate_duplicates')
+            for stream in STREAM_COLUMNS:
+                eliminate_duplicates(gesture_dict[stream]['timestamps'])
+            profile.stop()
+
+            profile.start('interpolate_data')
+            start, end = find_gesture_start_end(gesture_dict)
+            interpolated_dict = interpolate_data(start, end, parameters['timestep'], gesture_dict,
+                                                 parameters['interpolation'])
+            profile.stop()
+            del gesture_dict
+
+            profile.start('serialize')
+            if parameters['output_format'] == 'array':
+                ArrayDataset.save_recording(output_path + ArrayDataset.ARRAY_EXTENSION, interpolated_dict, parameters)
+            else:
+                with open(output_path + '.p', 'wb') as pickle_file:
+                    pickle.dump(interpolated_dict, pickle_file)
+            profile.stop()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return profile
+
+
+# the whole conversion the way the converter runs it, `workers` processes convert the recordings
+def run_end_to_end(raw_path, converted_path, parameters, workers):
+    jobs = plan_conversion(raw_path, converted_path, {}, parameters, force=True)[0]
+    start = perf_counter()
+    for job, _, error in convert_recordings(jobs, workers or os.cpu_count() or 1):
+        if error is not None:
+            raise RuntimeError('could not convert {}/{}/{}: {}'.format(*job[:3], error))
+    return perf_counter() - start
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# stages which are slower than in the baseline by more than tolerance, [(stage, baseline, current)]
+def compare_results(baseline, result, tolerance):
+    timings = [(stage, baseline.get('stages', {}).get(stage, {}).get('seconds'), values['seconds'])
+               for stage, values in result['stages'].items()]
+    timings.append(('end_to_end', baseline.get('end_to_end_seconds'), result['end_to_end_seconds']))
+    return [(stage, baseline_seconds, seconds) for stage, baseline_seconds, seconds in timings
+            if baseline_seconds and seconds > baseline_seconds * (1.0 + tolerance) and
+            seconds - baseline_seconds >= MIN_DIFFERENCE]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the time and memory of every stage of the CSVconverter on '
+                                                 'a generated raw tree and compare it with earlier results.')
+    parser.add_argument('--raw', help='benchmark this raw tree instead of a generated one')
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--gestures', type=int, default=3)
+    parser.add_argument('--recordings', type=int, default=5, help='recordings per user and gesture')
+    parser.add_argument('--seconds', type=float, default=10.0, help='mean length of the generated recordings')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--interpolate', choices=METHODS, default='cubic')
+    parser.add_argument('--timestep', type=int, default=1_000, help='microseconds between two interpolated samples')
+    parser.add_argument('--output-format', choices=['pickle', 'array'], default='pickle')
+    parser.add_argument('--workers', type=int, default=None, help='processes of the end-to-end run')
+    parser.add_argument('--repeat', type=int, default=3, help='the fastest of this many runs is kept')
+    parser.add_argument('--no-memory', action='store_true', help='skip the run which traces the memory')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare with the results of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='fraction a stage may be slower than in the baseline')
+    parser.add_argument('--keep', action='store_true', help='keep the generated and converted files')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='converter_benchmark_')
+    raw_path = args.raw or os.path.join(directory, 'raw')
+    converted_path = os.path.join(directory, 'converted')
+    parameters = conversion_parameters(args.interpolate, args.timestep, args.output_format)
+
+    try:
+        starttime = perf_counter()
+        if args.raw:
+            byte_count = sum(recording_size(recording) for _, _, _, recording in find_recordings(raw_path))
+        else:
+            byte_count = generate_raw_tree(raw_path, args.users, args.gestures, args.recordings, args.seconds,
+                                           args.seed)
+        generate_seconds = perf_counter() - starttime
+
+        recordings = find_recordings(raw_path)
+        stage_path = os.path.join(directory, 'stage')
+        runs = [profile_stages(recordings, stage_path, parameters, False) for _ in range(max(1, args.repeat))]
+        memory = None if args.no_memory else profile_stages(recordings, stage_path, parameters, True)
+
+        end_to_end = min(run_end_to_end(raw_path, converted_path, parameters, args.workers)
+                         for _ in range(max(1, args.repeat)))
+    finally:
+        if args.keep:
+            print('files kept in {}'.format(directory))
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    result = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'converter_version': CONVERTER_VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'parameters': {option: getattr(args, option) for option in COMPARED_OPTIONS},
+        'recordings': len(recordings),
+        'megabytes': byte_count / 1_000_000,
+        'generate_seconds': generate_seconds,
+        'stages': {stage: {'seconds': min(run.seconds[stage] for run in runs),
+                           'peak_megabytes': memory.peakBytes[stage] / 1_000_000 if memory else None}
+                   for stage in STAGES},
+        'end_to_end_seconds': end_to_end,
+        # None on Windows, where the peak memory of a process is not available
+        'peak_rss_megabytes': max(peak_rss_megabytes(), peak_rss_megabytes(children=True))
+        if peak_rss_megabytes() is not None else None,
+    }
+
+    print('{recordings} recordings, {megabytes:.1f} MB of csv files'.format(**result))
+    for stage, values in result['stages'].items():
+        print('{:<22} {:8.3f} s'.format(stage, values['seconds']) +
+              ('  peak {:8.1f} MB'.format(values['peak_megabytes']) if values['peak_megabytes'] is not None else ''))
+    print('{:<22} {:8.3f} s  ({:.1f} MB/s)'.format('end to end', end_to_end,
+                                                  result['megabytes'] / end_to_end if end_to_end > 0 else 0.0))
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(result, json_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('parameters') != result['parameters']:
+            print('The baseline was measured with other parameters, the comparison may not be meaningful.')
+
+        regressions = compare_results(baseline, result, args.tolerance)
+        for stage, baseline_seconds, seconds in regressions:
+            print('REGRESSION {}: {:.3f} s -> {:.3f} s ({:+.0%})'.format(stage, baseline_seconds, seconds,
+                                                                         seconds / baseline_seconds - 1.0))
+        if regressions:
+            sys.exit(1)
+        print('No stage is more than {:.0%} slower than in the baseline {} ({}).'.format(
+            args.tolerance, args.baseline, baseline.get('revision')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import os
+import csv
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+from glob import glob
+from time import perf_counter
+
+import numpy as np
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils.WriterBackends import CsvBackend, STREAM_NAMES
+from Tools.CSVconverter import load_csv_stream, records_to_dict, STREAM_COLUMNS
+
+# sample rates of the armband in Hz, used to generate recordings of a given length
+STREAM_RATES = {'emg': 200, 'gyro': 50, 'orientation': 50, 'accelerometer': 50}
+
+
+# the row by row loader the converter used before, kept as reference for speed and results
+def legacy_load_csv_stream(path_to_csv_file, stream):
+    convert = int if stream == 'emg' else float
+    data_dict = {'timestamps': []}
+    for column in STREAM_COLUMNS[stream]:
+        data_dict[column] = []
+
+    with open(path_to_csv_file, newline='') as stream_csv:
+        stream_csv.readline()  # skip the first line
+        reader = csv.reader(stream_csv, delimiter=',')
+        for row in reader:
+            data_dict['timestamps'].append(int(row[0]))
+            for index, column in enumerate(STREAM_COLUMNS[stream]):
+                data_dict[column].append(convert(row[index + 1]))
+    return data_dict
+
+
+# writes recordings of `seconds` seconds with the CsvBackend of the recorder, returns [(stream, path)]
+def generate_recordings(directory, recording_count, seconds, seed):
+    rng = random.Random(seed)
+    timestamp = 1_525_435_200_000_000
+
+    for index in range(recording_count):
+        backend = CsvBackend()
+        backend.open(directory, 'recording{}'.format(index), {})
+        for stream_id, stream in enumerate(STREAM_NAMES):
+            rows = []
+            for sample in range(seconds * STREAM_RATES[stream]):
+                sample_time = timestamp + sample * 1_000_000 // STREAM_RATES[stream]
+                if stream == 'emg':
+                    rows.append((sample_time,) + tuple(rng.randint(-128, 127) for _ in range(8)))
+                else:
+                    rows.append((sample_time,) + tuple(rng.uniform(-2.0, 2.0)
+                                                       for _ in STREAM_COLUMNS[stream]))
+            backend.write_rows(stream_id, rows)
+        backend.close()
+        timestamp += seconds * 1_000_000
+
+    return [(os.path.basename(path).split('_', 1)[0], path) for path in sorted(glob(os.path.join(directory, '*.csv')))]
+
+
+# csv stream files of an existing raw tree, e.g. Data/raw, files of unknown streams are skipped
+def find_recordings(raw_path):
+    files = []
+    for path in sorted(glob(os.path.join(raw_path, '*', '*', '*.csv'))):
+        stream = os.path.basename(path).split('_', 1)[0]
+        if stream in STREAM_COLUMNS:
+            files.append((stream, path))
+    return files
+
+
+def same_results(legacy_dict, data_dict):
+    return all(np.array_equal(np.asarray(legacy_values), data_dict[column])
+               for column, legacy_values in legacy_dict.items())
+
+
+def run_benchmark(files):
+    legacy_time, bulk_time, byte_count = 0.0, 0.0, 0
+    mismatches = []
+
+    for stream, path in files:
+        byte_count += os.path.getsize(path)
+
+        start = perf_counter()
+        legacy_dict = legacy_load_csv_stream(path, stream)
+        legacy_time += perf_counter() - start
+
+        start = perf_counter()
+        data_dict = records_to_dict(stream, load_csv_stream(path, stream))
+        bulk_time += perf_counter() - start
+
+        if not same_results(legacy_dict, data_dict):
+            mismatches.append(path)
+
+    return {
+        'files': len(files),
+        'megabytes': byte_count / 1_000_000,
+        'legacy_seconds': legacy_time,
+        'bulk_seconds': bulk_time,
+        'speedup': legacy_time / bulk_time if bulk_time > 0 else 0.0,
+        'mismatches': mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the bulk csv loader of the converter with the row by '
+                                                 'row loader it replaced.')
+    parser.add_argument('--raw', help='benchmark the csv files of this raw tree instead of generated recordings')
+    parser.add_argument('--recordings', type=int, default=20, help='number of generated recordings')
+    parser.add_argument('--seconds', type=int, default=60, help='length of every generated recording')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    directory = None
+    try:
+        if args.raw:
+            files = find_recordings(args.raw)
+        else:
+            directory = tempfile.mkdtemp(prefix='ingestion_benchmark_')
+            files = generate_recordings(directory, args.recordings, args.seconds, args.seed)
+
+        result = run_benchmark(files)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print('{files} files, {megabytes:.1f} MB: row by row {legacy_seconds:.2f} s, bulk {bulk_seconds:.2f} s, '
+          'speedup {speedup:.1f}x'.format(**result))
+    if result['mismatches']:
+        print('Different results for:\n' + '\n'.join(result['mismatches']))
+    else:
+        print('Both loaders return the same values for all files.')
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(result, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
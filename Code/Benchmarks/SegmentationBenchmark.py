@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from time import perf_counter
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils.Segmentation import detect_segments
+
+EMG_RATE = 200
+IMU_RATE = 50
+
+
+# a continuous session with a gesture every few seconds, EMG noise at rest and bursts with movement during gestures,
+# returns (emg timestamps, emg, imu timestamps, gyro, acceleration, [(start, end)] of the gestures in microseconds)
+def generate_session(minutes, seed):
+    rng = np.random.default_rng(seed)
+    duration = minutes * 60_000_000
+    start = 1_525_435_200_000_000
+
+    gestures = []
+    time_point = start + 2_000_000
+    while time_point < start + duration - 4_000_000:
+        length = int(rng.uniform(0.8, 2.0) * 1_000_000)
+        gestures.append((time_point, time_point + length))
+        time_point += length + int(rng.uniform(1.5, 4.0) * 1_000_000)
+
+    emg_timestamps = start + np.arange(duration * EMG_RATE // 1_000_000, dtype=np.int64) * (1_000_000 // EMG_RATE)
+    imu_timestamps = start + np.arange(duration * IMU_RATE // 1_000_000, dtype=np.int64) * (1_000_000 // IMU_RATE)
+
+    emg_active = np.zeros(len(emg_timestamps), dtype=bool)
+    imu_active = np.zeros(len(imu_timestamps), dtype=bool)
+    for first, last in gestures:
+        emg_active[np.searchsorted(emg_timestamps, first):np.searchsorted(emg_timestamps, last)] = True
+        imu_active[np.searchsorted(imu_timestamps, first):np.searchsorted(imu_timestamps, last)] = True
+
+    emg = rng.normal(0.0, 2.0, (len(emg_timestamps), 8))
+    emg[emg_active] *= 15.0
+    emg = np.clip(emg, -128, 127).astype(np.int8)
+
+    gyro = rng.normal(0.0, 2.0, (len(imu_timestamps), 3))
+    gyro[imu_active] += rng.normal(0.0, 120.0, (int(imu_active.sum()), 3))
+    acceleration = rng.normal(0.0, 0.01, (len(imu_timestamps), 3)) + np.array([0.0, 0.0, 1.0])
+
+    return emg_timestamps, emg, imu_timestamps, gyro, acceleration, gestures
+
+
+# a detected segment counts as hit if it overlaps a gesture by at least half of their union
+def match_segments(detected, gestures):
+    hits = 0
+    for first, last in gestures:
+        for start, end in detected:
+            overlap = min(last, end) - max(first, start)
+            if overlap > 0 and overlap / (max(last, end) - min(first, start)) >= 0.5:
+                hits += 1
+                break
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the throughput of the gesture segmentation.')
+    parser.add_argument('--minutes', type=float, default=60.0, help='length of the generated session')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--padding', type=float, default=0.0, help='milliseconds added around every segment')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    emg_timestamps, emg, imu_timestamps, gyro, acceleration, gestures = generate_session(args.minutes, args.seed)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = perf_counter()
+        detected = detect_segments(emg_timestamps, emg, imu_timestamps, gyro, imu_timestamps, acceleration,
+                                   padding=args.padding)
+        timings.append(perf_counter() - start)
+
+    best = min(timings)
+    hits = match_segments(detected, gestures)
+    result = {
+        'minutes': args.minutes,
+        'seconds': best,
+        'minutes_per_second': args.minutes / best if best > 0 else 0.0,
+        'gestures': len(gestures),
+        'detected': len(detected),
+        'hits': hits,
+    }
+
+    print('{minutes:.0f} min of signal in {seconds:.3f} s: {minutes_per_second:.0f} min/s, '
+          '{hits}/{gestures} gestures found, {detected} segments detected'.format(**result))
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(result, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
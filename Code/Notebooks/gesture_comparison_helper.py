@@ -1,176 +1,307 @@
 import os
 import re
+import sys
 import pickle
 import numpy as np
+from datetime import datetime
+from collections import OrderedDict
+from collections.abc import Mapping
 import matplotlib.cm as cm
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 
 from glob import glob
 
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utils import ArrayDataset, Catalog
 
-def acc_print(data, ylim_range=[-1.5, 1.5]):
-    f, (ax1, ax2, ax3) = plt.subplots(3, 1, sharex='col', sharey='row')
+convertedPath = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'converted')
 
-    ax1.set_title('Accelerometer - x')
-    ax1.set_ylim(ylim_range)
-    ax2.set_title('Accelerometer - y')
-    ax2.set_ylim(ylim_range)
-    ax3.set_title('Accelerometer - z')
-    ax3.set_ylim(ylim_range)
+STREAMS = ('emg', 'accelerometer', 'gyro', 'orientation', 'orientationEuler')
 
-    colors = iter(cm.rainbow(np.linspace(0, 1, len(data))))
-    handles = []
-    labels = []
+# bytes of stream data all Recordings keep in memory together, memory-mapped streams do not count
+CACHE_SIZE = 512 * 1024 * 1024
 
-    for element in data:
-        color = next(colors)
-        labels.append(element['performed_by'])
 
-        l1, = ax1.plot(element['accelerometer']['x'], color=color)
-        ax2.plot(element['accelerometer']['y'], color=color)
-        ax3.plot(element['accelerometer']['z'], color=color)
+# up to this many recordings get a legend entry each, more would cover the plots
+LEGEND_LIMIT = 30
+# more recordings than this are only drawn as their mean +- standard deviation unless lines=True is given,
+# drawing hundreds of lines is too slow to use the plots interactively, lines drawn anyway are rasterized
+LINE_LIMIT = 100
 
-        handles.append(l1)
 
-    f.legend(handles, labels, 'center right')
+# min/max envelope of values in bins of samples_per_bin samples, two points per bin at the bin centre keep every peak
+# visible while the line has no more points than the axes has pixels, returns (x, y)
+def decimate(values, samples_per_bin):
+    values = np.asarray(values, dtype=np.float64)
+    if samples_per_bin <= 1 or len(values) <= 2:
+        return np.arange(len(values), dtype=np.float64), values
 
+    starts = np.arange(0, len(values), samples_per_bin)
+    centres = np.minimum(starts + (samples_per_bin - 1) / 2.0, len(values) - 1)
+    return (np.repeat(centres, 2),
+            np.column_stack((np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts))).ravel())
 
-def emg_print(data, ylim_range=[-128, 128]):
-    f, ((ax1, ax2), (ax3, ax4), (ax5, ax6), (ax7, ax8)) = plt.subplots(4, 2, sharex='col', sharey='row')
 
-    ax1.set_title('EMG 1')
-    ax2.set_title('EMG 2')
-    ax2.set_ylim(ylim_range)
-    ax3.set_title('EMG 3')
-    ax4.set_title('EMG 4')
-    ax4.set_ylim(ylim_range)
-    ax5.set_title('EMG 5')
-    ax6.set_title('EMG 6')
-    ax6.set_ylim(ylim_range)
-    ax7.set_title('EMG 7')
-    ax8.set_title('EMG 8')
-    ax8.set_ylim(ylim_range)
+# mean and standard deviation over all recordings at every sample, recordings shorter than others only count as long
+# as they have samples, returns the decimated (x, mean, lower, upper)
+def mean_band(columns, samples_per_bin):
+    length = max(len(column) for column in columns)
+    stacked = np.full((len(columns), length), np.nan)
+    for row, column in enumerate(columns):
+        stacked[row, :len(column)] = column
 
-    colors = iter(cm.rainbow(np.linspace(0, 1, len(data))))
-    handles = []
-    labels = []
+    mean = np.nanmean(stacked, axis=0)
+    deviation = np.nanstd(stacked, axis=0)
+    starts = np.arange(0, length, max(1, samples_per_bin))
+    counts = np.diff(np.append(starts, length))
+    return (starts + (counts - 1) / 2.0, np.add.reduceat(mean, starts) / counts,
+            np.minimum.reduceat(mean - deviation, starts), np.maximum.reduceat(mean + deviation, starts))
 
-    for element in data:
-        color = next(colors)
-        labels.append(element['performed_by'])
 
-        l1, = ax1.plot(element['emg']['1'], color=color)
-        ax2.plot(element['emg']['2'], color=color)
-        ax3.plot(element['emg']['3'], color=color)
-        ax4.plot(element['emg']['4'], color=color)
-        ax5.plot(element['emg']['5'], color=color)
-        ax6.plot(element['emg']['6'], color=color)
-        ax7.plot(element['emg']['7'], color=color)
-        ax8.plot(element['emg']['8'], color=color)
+# plots one stream of all recordings, one axes per column, the recordings of a column are drawn as one LineCollection
+# decimated to the width of the axes in pixels, summary=True adds the mean +- standard deviation of all recordings,
+# lines=False only shows that summary, by default the lines are drawn for up to LINE_LIMIT recordings and the summary
+# for more
+def stream_print(data, stream, columns, titles, shape, ylim_range, linewidth=1, summary=None, lines=None):
+    if lines is None:
+        lines = len(data) <= LINE_LIMIT
+    if summary is None:
+        summary = not lines
 
-        handles.append(l1)
+    f, axes = plt.subplots(*shape, sharex='col', sharey='row', squeeze=False)
+    colors = cm.rainbow(np.linspace(0, 1, len(data)))
+    # every recording is read once, not once per column
+    stream_dicts = [element[stream] for element in data]
+
+    for ax, column, title in zip(axes.ravel(), columns, titles):
+        ax.set_title(title)
+        ax.set_ylim(ylim_range)
+
+        values = [np.asarray(stream_dict[column]) for stream_dict in stream_dicts]
+        length = max((len(value) for value in values), default=0)
+        if length == 0:
+            continue
+        samples_per_bin = int(np.ceil(length / max(1, ax.bbox.width)))
 
-    f.legend(handles, labels, 'center right')
+        if lines:
+            segments = [np.column_stack(decimate(value, samples_per_bin)) for value in values]
+            ax.add_collection(LineCollection(segments, colors=colors, linewidths=linewidth,
+                                             alpha=0.3 if summary else 1.0, rasterized=len(data) > LINE_LIMIT))
+        if summary:
+            x, mean, lower, upper = mean_band(values, samples_per_bin)
+            ax.fill_between(x, lower, upper, color='black', alpha=0.2, linewidth=0)
+            ax.plot(x, mean, color='black', linewidth=linewidth)
+        ax.set_xlim(0, length - 1)
 
+    if lines and len(data) <= LEGEND_LIMIT:
+        handles = [Line2D([], [], color=color, linewidth=linewidth) for color in colors]
+        f.legend(handles, [element['performed_by'] for element in data], loc='center right')
+    return f
 
-def gyro_print(data, ylim_range=[-150, 150]):
-    f, (ax1, ax2, ax3) = plt.subplots(3, 1, sharex='col', sharey='row')
 
-    ax1.set_title('Gyroscope - x')
-    ax1.set_ylim(ylim_range)
-    ax2.set_title('Gyroscope - y')
-    ax2.set_ylim(ylim_range)
-    ax3.set_title('Gyroscope - z')
-    ax3.set_ylim(ylim_range)
+def acc_print(data, ylim_range=[-1.5, 1.5], **options):
+    return stream_print(data, 'accelerometer', ('x', 'y', 'z'),
+                        ('Accelerometer - x', 'Accelerometer - y', 'Accelerometer - z'), (3, 1), ylim_range, **options)
 
-    colors = iter(cm.rainbow(np.linspace(0, 1, len(data))))
-    handles = []
-    labels = []
 
-    for element in data:
-        color = next(colors)
-        labels.append(element['performed_by'])
+def emg_print(data, ylim_range=[-128, 128], **options):
+    return stream_print(data, 'emg', tuple(str(c) for c in range(1, 9)), tuple('EMG {}'.format(c) for c in range(1, 9)),
+                        (4, 2), ylim_range, **options)
 
-        l1, = ax1.plot(element['gyro']['x'], color=color)
-        ax2.plot(element['gyro']['y'], color=color)
-        ax3.plot(element['gyro']['z'], color=color)
 
-        handles.append(l1)
+def gyro_print(data, ylim_range=[-150, 150], **options):
+    return stream_print(data, 'gyro', ('x', 'y', 'z'), ('Gyroscope - x', 'Gyroscope - y', 'Gyroscope - z'), (3, 1),
+                        ylim_range, **options)
 
-    f.legend(handles, labels, 'center right')
 
-
-def orientation_print(data, ylim_range=[-1.5, 1.5]):
-    f, (ax1, ax2, ax3, ax4) = plt.subplots(4, 1, sharex='col', sharey='row')
-
-    ax1.set_title('Orientation - x')
-    ax1.set_ylim(ylim_range)
-    ax2.set_title('Orientation - y')
-    ax2.set_ylim(ylim_range)
-    ax3.set_title('Orientation - z')
-    ax3.set_ylim(ylim_range)
-    ax4.set_title('Orientation - w')
-    ax4.set_ylim(ylim_range)
-
-    colors = iter(cm.rainbow(np.linspace(0, 1, len(data))))
-    handles = []
-    labels = []
-
-    for element in data:
-        color = next(colors)
-        labels.append(element['performed_by'])
-
-        l1, = ax1.plot(element['orientation']['x'], linewidth=2, color=color)
-        ax3.plot(element['orientation']['z'], linewidth=2, color=color)
-        ax2.plot(element['orientation']['y'], linewidth=2, color=color)
-        ax4.plot(element['orientation']['w'], linewidth=2, color=color)
-
-        handles.append(l1)
-
-    f.legend(handles, labels, 'center right')
-
-
-def orientation_euler_print(data, ylim_range=[-5, 5]):
-    f, (ax1, ax2, ax3) = plt.subplots(3, 1, sharex='col', sharey='row')
-
-    ax1.set_title('Orientation Euler - roll')
-    ax1.set_ylim(ylim_range)
-    ax2.set_title('Orientation Euler - pitch')
-    ax2.set_ylim(ylim_range)
-    ax3.set_title('Orientation Euler - yaw')
-    ax3.set_ylim(ylim_range)
-
-    colors = iter(cm.rainbow(np.linspace(0, 1, len(data))))
-    handles = []
-    labels = []
-
-    for element in data:
-        color = next(colors)
-        labels.append(element['performed_by'])
-
-        l1, = ax1.plot(element['orientationEuler']['roll'], color=color)
-        ax2.plot(element['orientationEuler']['pitch'], color=color)
-        ax3.plot(element['orientationEuler']['yaw'], color=color)
-
-        handles.append(l1)
-
-    f.legend(handles, labels, 'center right')
-
-def all_print(data):
-    acc_print(data)
-    emg_print(data)
-    gyro_print(data)
-    orientation_print(data)
-    orientation_euler_print(data)
-
-
-def load_gestures(path):
+def orientation_print(data, ylim_range=[-1.5, 1.5], **options):
+    return stream_print(data, 'orientation', ('x', 'y', 'z', 'w'),
+                        ('Orientation - x', 'Orientation - y', 'Orientation - z', 'Orientation - w'), (4, 1),
+                        ylim_range, **dict({'linewidth': 2}, **options))
+
+
+def orientation_euler_print(data, ylim_range=[-5, 5], **options):
+    return stream_print(data, 'orientationEuler', ('roll', 'pitch', 'yaw'),
+                        ('Orientation Euler - roll', 'Orientation Euler - pitch', 'Orientation Euler - yaw'), (3, 1),
+                        ylim_range, **options)
+
+
+# options are passed on to stream_print, e.g. all_print(gestures, summary=True)
+def all_print(data, **options):
+    acc_print(data, **options)
+    emg_print(data, **options)
+    gyro_print(data, **options)
+    orientation_print(data, **options)
+    orientation_euler_print(data, **options)
+
+
+# paths of the converted recordings matching all given filters, read from the catalog of the converter
+# e.g. load_gestures(find_gestures(user='ruben', gesture='come_up', min_duration=1.5))
+def find_gestures(user=None, gesture=None, since=None, until=None, min_duration=None, max_duration=None):
+    with Catalog.Catalog(convertedPath) as catalog:
+        return catalog.query(user=user, gesture=gesture, since=since, until=until, min_duration=min_duration,
+                             max_duration=max_duration)
+
+
+# least recently used streams are dropped once the streams in memory take more than max_bytes
+class StreamCache:
+
+    def __init__(self, max_bytes):
+        self.maxBytes = max_bytes
+        self.currentBytes = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, data_dict):
+        self.remove(key)
+        size = sum(values.nbytes for values in data_dict.values() if not isinstance(values, np.memmap))
+        self.entries[key] = (data_dict, size)
+        self.currentBytes += size
+        self.evict()
+
+    # the most recently used stream is kept even if it is larger than max_bytes on its own
+    def evict(self):
+        while self.currentBytes > self.maxBytes and len(self.entries) > 1:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.currentBytes -= evicted_size
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.currentBytes -= entry[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.currentBytes = 0
+
+
+streamCache = StreamCache(CACHE_SIZE)
+
+
+def set_cache_size(max_bytes):
+    streamCache.maxBytes = max_bytes
+    streamCache.evict()
+
+
+# key of a converted file in the catalog, its path relative to the converted folder with / as separator
+def catalog_key(path):
+    return os.path.relpath(os.path.abspath(path), convertedPath).replace(os.sep, '/')
+
+
+# metadata of a recording like in the gesture dicts from its row in the catalog, None if it is not catalogued
+def catalog_metadata(row):
+    if row is None:
+        return None
+
+    metadata = {'gesture': row['gesture'], 'performed_by': row['user'],
+                'datetime': datetime.fromisoformat(row['datetime']) if row['datetime'] else None}
+    if row['device'] is not None:
+        metadata['device'] = row['device']
+    return metadata
+
+
+# a converted recording which is read when it is used, it can be used like the gesture dicts of the converter
+#
+# only the metadata is read when it is first needed (from the catalog or the sidecar of an array), every stream
+# is read when it is first accessed, streams of arrays are memory-mapped unless mmap is False,
+# pickles can only be read as a whole, all their streams go into the cache then
+class Recording(Mapping):
+
+    # catalog_rows: {key: row} of the catalog, read once by load_gestures for all its recordings, if None the catalog
+    # is opened when the metadata of this recording is first needed
+    def __init__(self, path, mmap=True, catalog_rows=None):
+        self.path = path
+        self.mmap = mmap
+        self.isArray = path.endswith(ArrayDataset.ARRAY_EXTENSION)
+        self.catalogRows = catalog_rows
+        self.__metadata = None
+
+    @property
+    def metadata(self):
+        if self.__metadata is None:
+            if self.isArray:
+                metadata = ArrayDataset.load_metadata(self.path)
+                self.__metadata = {key: metadata[key] for key in ArrayDataset.METADATA_KEYS if key in metadata}
+                self.__metadata['datetime'] = datetime.fromisoformat(metadata['datetime'])
+            else:
+                self.__metadata = self.__catalog_metadata() or self.__load_pickle()[0]
+        return self.__metadata
+
+    def __catalog_metadata(self):
+        key = catalog_key(self.path)
+        if self.catalogRows is not None:
+            return catalog_metadata(self.catalogRows.get(key))
+        if not os.path.exists(os.path.join(convertedPath, Catalog.CATALOG_NAME)):
+            return None
+        with Catalog.Catalog(convertedPath) as catalog:
+            return catalog_metadata(catalog.row(key))
+
+    # reads the whole pickle and puts its streams into the cache, returns (metadata, streams)
+    # the cache may not keep all streams, so the caller uses the returned ones
+    def __load_pickle(self):
+        with open(self.path, 'rb') as pickle_file:
+            gesture_dict = pickle.load(pickle_file)
+
+        streams = {stream: {column: np.asarray(values) for column, values in gesture_dict[stream].items()}
+                   for stream in STREAMS}
+        for stream, data_dict in streams.items():
+            streamCache.put((self.path, stream), data_dict)
+        return {key: value for key, value in gesture_dict.items() if key not in STREAMS}, streams
+
+    def stream(self, stream):
+        data_dict = streamCache.get((self.path, stream))
+        if data_dict is None:
+            if self.isArray:
+                data_dict = ArrayDataset.load_stream(self.path, stream, 'r' if self.mmap else None)
+                streamCache.put((self.path, stream), data_dict)
+            else:
+                metadata, streams = self.__load_pickle()
+                if self.__metadata is None:
+                    self.__metadata = metadata
+                data_dict = streams[stream]
+        return data_dict
+
+    def __getitem__(self, key):
+        if key in STREAMS:
+            return self.stream(key)
+        return self.metadata[key]
+
+    def __iter__(self):
+        return iter(tuple(self.metadata) + STREAMS)
+
+    def __len__(self):
+        return len(self.metadata) + len(STREAMS)
+
+    def __repr__(self):
+        return 'Recording({!r})'.format(self.path)
+
+
+# returns a Recording for every converted file, nothing is read until the recordings are used
+def load_gestures(path, mmap=True):
     # converted_data = glob('../Data/converted/*')
 
     loaded_data = []
 
-    for element in path:
-        loaded_data.append(pickle.load(open(element, 'rb')))
+    # the metadata of converted arrays is read from their sidecar, the one of pickles from the catalog, which is
+    # opened once for all of them
+    paths = [element for element in path if not element.endswith(ArrayDataset.SIDECAR_EXTENSION)]
+    catalog_rows = {}
+    if (any(not element.endswith(ArrayDataset.ARRAY_EXTENSION) for element in paths)
+            and os.path.exists(os.path.join(convertedPath, Catalog.CATALOG_NAME))):
+        with Catalog.Catalog(convertedPath) as catalog:
+            catalog_rows = {row['path']: row for row in catalog.rows()}
+
+    for element in paths:
+        loaded_data.append(Recording(element, mmap, catalog_rows))
     return loaded_data
 
 
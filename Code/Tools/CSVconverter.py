@@ -1,334 +1,815 @@
 import os
-import re
-import csv
 import sys
 import math
 import time
+import json
 import pickle
+import hashlib
+import argparse
+import warnings
+import numpy as np
 
 from glob import glob
+from functools import partial
+from itertools import islice
 from datetime import datetime
-from collections import Counter
-from scipy.interpolate import interp1d
 
-import threading
 from multiprocessing import Pool
 
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils import BinaryFormat, ArrayDataset, Catalog, Profiling
+from Utils.Orientation import calculate_roll_pitch_yaw
+from Utils.Interpolation import METHODS, interpolate, repair_timestamps
+
 rawPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'raw')
 convertedPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'converted')
 
-gesture_dict_lock = threading.Lock()
-interpolated_dict_lock = threading.Lock()
+# the manifest remembers which raw files and parameters every converted file was built from
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
 
+# increase whenever the conversion itself changes, so that all recordings are converted again
+CONVERTER_VERSION = 1
 
-def acquire_acc_or_gyro(path_to_acc_or_gyro_file, gesture_dict, is_acc=True):
-    data_dict = {'timestamps': [], 'x': [], 'y': [], 'z': []}
-
-    with open(path_to_acc_or_gyro_file, newline='') as acc_or_gyro_csv:
-        acc_or_gyro_csv.readline()   # skip the first line
-        reader = csv.reader(acc_or_gyro_csv, delimiter=',')
-        for row in reader:
-            # print(row)
-            data_dict['timestamps'].append(int(row[0]))
-            data_dict['x'].append(float(row[1]))
-            data_dict['y'].append(float(row[2]))
-            data_dict['z'].append(float(row[3]))
-    # with gesture_dict_lock:
-    if is_acc:
-        gesture_dict['accelerometer'] = data_dict
-    else:
-        gesture_dict['gyro'] = data_dict
-    # return data_dict
 
+# column names of the converted dicts for every stream
+STREAM_COLUMNS = {
+    'accelerometer': ('x', 'y', 'z'),
+    'emg': ('1', '2', '3', '4', '5', '6', '7', '8'),
+    'gyro': ('x', 'y', 'z'),
+    'orientationEuler': ('roll', 'pitch', 'yaw'),
+    'orientation': ('x', 'y', 'z', 'w'),
+}
 
-def acquire_emg(path_to_emg_file, gesture_dict):
-    emg_dict = {'timestamps': [], '1': [], '2': [], '3': [], '4': [], '5': [], '6': [], '7': [], '8': []}
-
-    with open(path_to_emg_file, newline='') as emg_csv:
-        emg_csv.readline()  # skip the first line
-        reader = csv.reader(emg_csv, delimiter=',')
-        for row in reader:
-            # print(row)
-            emg_dict['timestamps'].append(int(row[0]))
-            emg_dict['1'].append(int(row[1]))
-            emg_dict['2'].append(int(row[2]))
-            emg_dict['3'].append(int(row[3]))
-            emg_dict['4'].append(int(row[4]))
-            emg_dict['5'].append(int(row[5]))
-            emg_dict['6'].append(int(row[6]))
-            emg_dict['7'].append(int(row[7]))
-            emg_dict['8'].append(int(row[8]))
-
-    # with gesture_dict_lock:
-    gesture_dict['emg'] = emg_dict
-    # return emg_dict
+# extensions of the files a recording may consist of, the streams are csv or binary stream files, sessions hold all
+# streams of a recording
+RECORDED_EXTENSIONS = dict({stream: ('.csv', BinaryFormat.FILE_EXTENSION) for stream in STREAM_COLUMNS},
+                           session=(BinaryFormat.SESSION_EXTENSION,))
 
+# value types of the recorded csv files, EMG values are signed bytes and timestamps microseconds as integer
+CSV_VALUE_TYPES = {
+    'accelerometer': np.float64,
+    'emg': np.int8,
+    'gyro': np.float64,
+    'orientationEuler': np.float64,
+    'orientation': np.float64,
+}
 
-def acquire_orientation(path_to_orientation_file, gesture_dict):
-    ori_dict = {'timestamps': [], 'x': [], 'y': [], 'z': [], 'w': []}
-    with open(path_to_orientation_file, newline='') as ori_csv:
-        ori_csv.readline()  # skip the first line
-        reader = csv.reader(ori_csv, delimiter=',')
-        for row in reader:
-            # print(row)
-            ori_dict['timestamps'].append(int(row[0]))
-            ori_dict['x'].append(float(row[1]))
-            ori_dict['y'].append(float(row[2]))
-            ori_dict['z'].append(float(row[3]))
-            ori_dict['w'].append(float(row[4]))
-
-    # with gesture_dict_lock:
-    gesture_dict['orientation'] = ori_dict
-    # return ori_dict
-
-
-def acquire_orientation_euler(path_to_orientationEuler_file, gesture_dict):
-    ori_euler_dict = {'timestamps': [], 'roll': [], 'pitch': [], 'yaw': []}
-
-    with open(path_to_orientationEuler_file, newline='') as ori_euler_csv:
-        ori_euler_csv.readline()  # skip the first line
-        reader = csv.reader(ori_euler_csv, delimiter=',')
-        for row in reader:
-            # print(row)
-            ori_euler_dict['timestamps'].append(int(row[0]))
-            ori_euler_dict['pitch'].append(float(row[1]))
-            ori_euler_dict['roll'].append(float(row[2]))
-            ori_euler_dict['yaw'].append(float(row[3]))
-
-    # with gesture_dict_lock:
-    gesture_dict['orientationEuler'] = ori_euler_dict
-
-
-def acquire_data(user, gesture, gesture_dict):
-    recordedData = glob(os.path.join(rawPath, user, gesture) + '\*')
-
-    # sort by last modified date
-    recordedData = sorted(recordedData, key=os.path.getmtime)
-
-    # split in chunks of five, because a single gesture consists of the following csv files
-    # accelerometer, emg, gyro, orientation and orientationEuler
-    # sort by name, so that acquire functions are called in the right order
-    recordedData = [sorted(recordedData[x:x + 5]) for x in range(0, len(recordedData), 5)]
-
-    for gesture_chunk in recordedData:
-        gesture_dict['gesture'] = gesture
-        gesture_dict['datetime'] = datetime.fromtimestamp(os.path.getctime(gesture_chunk[0]))
-        gesture_dict['performed_by'] = user
-
-        acquire_acc_or_gyro(gesture_chunk[0], gesture_dict, is_acc=True)
-        acquire_emg(gesture_chunk[1], gesture_dict)
-        acquire_acc_or_gyro(gesture_chunk[2], gesture_dict, is_acc=False)
-        acquire_orientation_euler(gesture_chunk[3], gesture_dict)
-        acquire_orientation(gesture_chunk[4], gesture_dict)
-
-        # t_acc = threading.Thread(target=acquire_acc_or_gyro, args=(gesture_chunk[0], gesture_dict, True), daemon=True)
-        # t_acc.start()
-        # t_emg = threading.Thread(target=acquire_emg, args=(gesture_chunk[1], gesture_dict), daemon=True)
-        # t_emg.start()
-        # t_gyro = threading.Thread(target=acquire_acc_or_gyro, args=(gesture_chunk[2], gesture_dict, False), daemon=True)
-        # t_gyro.start()
-        # t_oriEuler = threading.Thread(target=acquire_orientation_euler, args=(gesture_chunk[3], gesture_dict), daemon=True)
-        # t_oriEuler.start()
-        # t_ori = threading.Thread(target=acquire_orientation, args=(gesture_chunk[4], gesture_dict), daemon=True)
-        # t_ori.start()
-
-        # t_acc.join()
-        # t_emg.join()
-        # t_gyro.join()
-        # t_oriEuler.join()
-        # t_ori.join()
 
-        start, end = find_gesture_start_end(gesture_dict)
-        # interpolated_dict = interpolate_data(start, end, 1_000, gesture_dict) # interpolated values every millisecond
+def csv_record_dtype(stream):
+    return np.dtype([('timestamp', '<i8'), ('values', CSV_VALUE_TYPES[stream], (len(STREAM_COLUMNS[stream]),))])
 
 
-        # save dictionary as pickle to disk
-        savePath = os.path.join(convertedPath, user, gesture)
-        os.makedirs(savePath, exist_ok=True)
-        # extract timestamp from csv file name
-        timestamp = re.sub(r'.*\\[a-z_]+', '', gesture_chunk[0]).strip('.csv')
-        pickle.dump(gesture_dict, open(os.path.join(savePath, gesture + timestamp) + '.p', 'wb'))
+# parses a whole csv stream file at once into one record array, the first line is the header
+def load_csv_stream(path_to_csv_file, stream):
+    Profiling.count('bytes_read', os.path.getsize(path_to_csv_file))
+    return parse_csv(path_to_csv_file, stream, skiprows=1)
 
 
-def eliminate_duplicates(list_with_duplicates):
-    cleaned_list = []
+# source: path or list of lines
+def parse_csv(source, stream, skiprows=0):
+    with warnings.catch_warnings():
+        # a recording which was stopped right away only contains the header
+        warnings.filterwarnings('ignore', message='.*[Ee]mpty input file.*')
+        warnings.filterwarnings('ignore', message='.*no data.*')
+        with Profiling.stage('parse'):
+            records = np.loadtxt(source, dtype=csv_record_dtype(stream), delimiter=',', skiprows=skiprows, ndmin=1)
+    Profiling.count('rows', len(records))
+    return records
 
-    duplicate_counter = Counter(list_with_duplicates)
 
-    for element, count in duplicate_counter.items():
-        if count < 2:
-            cleaned_list.append(element)
-        else:
-            for increment_by_one in range(count):
-                cleaned_list.append(element + increment_by_one)
+def acquire_acc_or_gyro(path_to_acc_or_gyro_file, gesture_dict, is_acc=True):
+    stream = 'accelerometer' if is_acc else 'gyro'
+    gesture_dict[stream] = records_to_dict(stream, load_csv_stream(path_to_acc_or_gyro_file, stream))
 
-    return sorted(cleaned_list)
 
+def acquire_emg(path_to_emg_file, gesture_dict):
+    gesture_dict['emg'] = records_to_dict('emg', load_csv_stream(path_to_emg_file, 'emg'))
 
-# timestep_size is an integer with unit microseconds
-def interpolate_data(start, end, timestep_size, gesture_dict):
-    # prepare interpolated dict
-    interpolated_dict = {}
-    interpolated_dict['gesture'] = gesture_dict['gesture']
-    interpolated_dict['datetime'] = gesture_dict['datetime']
-    interpolated_dict['performed_by'] = gesture_dict['performed_by']
-    interpolated_dict['timestamps'] = list(range(start, end + 1, timestep_size)) # end shall be included thus + 1
 
-    # get references to internal dicts
-    acc_dict = gesture_dict['accelerometer']
-    emg_dict = gesture_dict['emg']
-    gyro_dict = gesture_dict['gyro']
-    ori_dict = gesture_dict['orientation']
-    ori_euler_dict = gesture_dict['orientationEuler']
+def acquire_orientation(path_to_orientation_file, gesture_dict):
+    gesture_dict['orientation'] = records_to_dict('orientation',
+                                                  load_csv_stream(path_to_orientation_file, 'orientation'))
 
-    # interpolate and add results
-    interpolated_dict['accelerometer'] = interpolate_acc_or_gyro_or_oriEuler(interpolated_dict['timestamps'], acc_dict)
-    interpolated_dict['emg'] = interpolate_emg(interpolated_dict['timestamps'], emg_dict)
-    interpolated_dict['gyro'] = interpolate_acc_or_gyro_or_oriEuler(interpolated_dict['timestamps'], gyro_dict)
-    interpolated_dict['orientation'] = interpolate_orientation(interpolated_dict['timestamps'], ori_dict)
-    interpolated_dict['orientationEuler'] = interpolate_acc_or_gyro_or_oriEuler(interpolated_dict['timestamps'],
-                                                                          ori_euler_dict, is_oriEuler=True)
 
-    return interpolated_dict
+# returns the records of a binary stream file as structured array mapped from disk
+def acquire_binary_stream(path_to_binary_file):
+    with Profiling.stage('parse'):
+        records = BinaryFormat.open_stream(path_to_binary_file)
+    Profiling.count('rows', len(records))
+    Profiling.count('bytes_read', os.path.getsize(path_to_binary_file))
+    return records
 
 
-def interpolate_acc_or_gyro_or_oriEuler(timestamp_list, a_g_oE_dict, is_oriEuler=False):
-    a_g_oE_dict['timestamps'] = eliminate_duplicates(a_g_oE_dict['timestamps'])
+# maps the records of a csv or binary stream onto the dict layout of the converter without copying any values
+def records_to_dict(stream, records):
+    data_dict = {'timestamps': records['timestamp']}
+    for index, column in enumerate(STREAM_COLUMNS[stream]):
+        data_dict[column] = records['values'][:, index]
+    return data_dict
 
-    if is_oriEuler:
-        result_dict = {'roll': [], 'pitch': [], 'yaw': []}
 
-        roll_interpolate = interp1d(a_g_oE_dict['timestamps'], a_g_oE_dict['roll'], kind='cubic', fill_value='extrapolate')
-        pitch_interpolate = interp1d(a_g_oE_dict['timestamps'], a_g_oE_dict['pitch'], kind='cubic', fill_value='extrapolate')
-        yaw_interpolate = interp1d(a_g_oE_dict['timestamps'], a_g_oE_dict['yaw'], kind='cubic', fill_value='extrapolate')
+# fills gesture_dict with views onto the binary stream files, no values are parsed or copied
+def acquire_binary(gesture_chunk, gesture_dict):
+    for path_to_binary_file in gesture_chunk:
+        records = acquire_binary_stream(path_to_binary_file)
+        stream = BinaryFormat.read_header(path_to_binary_file)[0]['stream']
 
-        [result_dict['roll'].append(roll_interpolate(timestamp)) for timestamp in timestamp_list]
-        [result_dict['pitch'].append(pitch_interpolate(timestamp)) for timestamp in timestamp_list]
-        [result_dict['yaw'].append(yaw_interpolate(timestamp)) for timestamp in timestamp_list]
+        gesture_dict[stream] = records_to_dict(stream, records)
 
-    else:
-        result_dict = {'x': [], 'y': [], 'z': []}
-        ao_x_interpolate = interp1d(a_g_oE_dict['timestamps'], a_g_oE_dict['x'], kind='cubic', fill_value='extrapolate')
-        ao_y_interpolate = interp1d(a_g_oE_dict['timestamps'], a_g_oE_dict['y'], kind='cubic', fill_value='extrapolate')
-        ao_z_interpolate = interp1d(a_g_oE_dict['timestamps'], a_g_oE_dict['z'], kind='cubic', fill_value='extrapolate')
 
-        [result_dict['x'].append(ao_x_interpolate(timestamp)) for timestamp in timestamp_list]
-        [result_dict['y'].append(ao_y_interpolate(timestamp)) for timestamp in timestamp_list]
-        [result_dict['z'].append(ao_z_interpolate(timestamp)) for timestamp in timestamp_list]
+# fills gesture_dict with the metadata and views onto all streams of a session file
+def acquire_session(path_to_session_file, gesture_dict):
+    with Profiling.stage('parse'):
+        metadata, streams = BinaryFormat.open_session(path_to_session_file)
+    Profiling.count('rows', sum(len(records) for records in streams.values()))
+    Profiling.count('bytes_read', os.path.getsize(path_to_session_file))
 
-    return result_dict
+    gesture_dict['datetime'] = datetime.fromisoformat(metadata['start_time'])
+    gesture_dict['device'] = metadata['device']
+    gesture_dict['firmware'] = metadata['firmware']
 
+    for stream, records in streams.items():
+        gesture_dict[stream] = records_to_dict(stream, records)
 
-def interpolate_emg(timestamp_list, emg_dict):
-    result_dict = {'1': [], '2': [], '3': [], '4': [], '5': [], '6': [], '7': [], '8': []}
 
-    emg_dict['timestamps'] = eliminate_duplicates(emg_dict['timestamps'])
+# computes roll, pitch and yaw for all orientation samples at once instead of reading them from a recorded file
+def derive_orientation_euler(gesture_dict):
+    ori_dict = gesture_dict['orientation']
+    with Profiling.stage('euler'):
+        roll, pitch, yaw = calculate_roll_pitch_yaw(ori_dict['x'], ori_dict['y'], ori_dict['z'], ori_dict['w'])
+
+    gesture_dict['orientationEuler'] = {'timestamps': ori_dict['timestamps'], 'roll': roll, 'pitch': pitch, 'yaw': yaw}
+
+
+# groups the stream files of a gesture folder by the creation time in their names,
+# e.g. emg_2018-05-04_12-00-00.csv, returns a sorted list of (creation_time, {stream: path})
+# session files contain all streams of a recording, they show up as {'session': path}
+# files which are not named <stream>_<creation time> with a known stream and extension are skipped,
+# e.g. desktop.ini or .DS_Store
+def group_recordings(recorded_files):
+    recordings = {}
+
+    for path in recorded_files:
+        name, extension = os.path.splitext(os.path.basename(path))
+        stream, _, creation_time = name.partition('_')
+        if not creation_time or extension not in RECORDED_EXTENSIONS.get(stream, ()):
+            continue
+        recordings.setdefault(creation_time, {})[stream] = path
+
+    return sorted(recordings.items())
+
+
+# samples of every stream which are kept on both sides of a chunk border, so every chunk is interpolated with the
+# same neighbours as the whole recording, the influence of a sample on a cubic spline decays by about 0.27 per sample
+CHUNK_OVERLAP = 32
+
+# samples per stream read at once and rows of the output written at once in chunked conversion
+CHUNK_ROWS = 65_536
+
+
+# yields the records of a csv stream file in chunks of at most chunk_rows
+def iter_csv_chunks(path_to_csv_file, stream, chunk_rows=CHUNK_ROWS):
+    Profiling.count('bytes_read', os.path.getsize(path_to_csv_file))
+    with open(path_to_csv_file) as stream_csv:
+        stream_csv.readline()  # skip the first line
+        while True:
+            lines = list(islice(stream_csv, chunk_rows))
+            if not lines:
+                return
+            yield parse_csv(lines, stream)
+
+
+# yields slices of records which are mapped from disk, only the sliced pages are read
+def iter_record_chunks(records, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(records), chunk_rows):
+        yield records[start:start + chunk_rows]
+
+
+# yields the records of the blocks of a session stream in chunks of at most chunk_rows, small blocks are joined,
+# so the chunks are about as large as the ones of a stream written in one block
+def iter_block_chunks(blocks, chunk_rows=CHUNK_ROWS):
+    pending, pending_rows = [], 0
+    for records in blocks:
+        for start in range(0, len(records), chunk_rows):
+            part = records[start:start + chunk_rows]
+            if pending_rows + len(part) > chunk_rows:
+                yield np.concatenate(pending)
+                pending, pending_rows = [], 0
+            pending.append(part)
+            pending_rows += len(part)
+    if pending:
+        yield np.concatenate(pending)
+
+
+# first and last timestamp of a csv stream file without reading the lines in between
+def csv_time_range(path_to_csv_file):
+    with open(path_to_csv_file, 'rb') as stream_csv:
+        stream_csv.readline()
+        first_line = stream_csv.readline()
+
+        stream_csv.seek(0, os.SEEK_END)
+        position = stream_csv.tell()
+        tail = b''
+        while position > 0 and tail.strip().count(b'\n') < 1:
+            step = min(4096, position)
+            position -= step
+            stream_csv.seek(position)
+            tail = stream_csv.read(step) + tail
+        last_line = tail.strip().split(b'\n')[-1]
+
+    if not first_line.strip():
+        return None
+    return int(first_line.split(b',', 1)[0]), int(last_line.split(b',', 1)[0])
+
+
+# the metadata of a recording and {stream: (chunk iterator, (first timestamp, last timestamp))}, nothing but the
+# first and last samples is read
+def open_recording_chunks(user, gesture, recording, chunk_rows=CHUNK_ROWS):
+    metadata = {'gesture': gesture, 'performed_by': user}
+    sources = {}
+
+    if 'session' in recording:
+        # the blocks of a session are read one after the other, they are never copied into one array
+        session_metadata, stream_blocks = BinaryFormat.open_session_blocks(recording['session'])
+        metadata['datetime'] = datetime.fromisoformat(session_metadata['start_time'])
+        metadata['device'] = session_metadata['device']
+        metadata['firmware'] = session_metadata['firmware']
+        for stream, blocks in stream_blocks.items():
+            time_range = (int(blocks[0]['timestamp'][0]), int(blocks[-1]['timestamp'][-1])) if blocks else None
+            sources[stream] = (iter_block_chunks(blocks, chunk_rows), time_range)
+        streams = {}
+    else:
+        metadata['datetime'] = datetime.fromtimestamp(os.path.getctime(recording['accelerometer']))
+        streams = {}
+        for stream in ('emg', 'accelerometer', 'gyro', 'orientation'):
+            if recording[stream].endswith(BinaryFormat.FILE_EXTENSION):
+                streams[stream] = acquire_binary_stream(recording[stream])
+            else:
+                time_range = csv_time_range(recording[stream])
+                sources[stream] = (iter_csv_chunks(recording[stream], stream, chunk_rows), time_range)
+
+    for stream, records in streams.items():
+        time_range = (int(records['timestamp'][0]), int(records['timestamp'][-1])) if len(records) else None
+        sources[stream] = (iter_record_chunks(records, chunk_rows), time_range)
+
+    return metadata, sources
+
+
+# the samples of a stream around the part of the recording which is interpolated at the moment,
+# chunks are read, repaired and dropped as the interpolation moves on
+class ChunkedStream:
+
+    # derive: optional function which returns additional value columns of a chunk, e.g. euler angles
+    # columns: number of value columns including the derived ones
+    def __init__(self, stream, chunks, summary, method, derive=None, columns=0):
+        self.stream = stream
+        self.columns = columns
+        self.chunks = chunks
+        self.summary = summary
+        self.method = method
+        self.derive = derive
+
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.values = None
+        self.lastTimestamp = None
+        self.exhausted = False
+
+    def __read_chunk(self):
+        records = next(self.chunks, None)
+        if records is None:
+            self.exhausted = True
+            return
+
+        self.summary.add(self.stream, records['timestamp'])
+        with Profiling.stage('deduplicate'):
+            order, timestamps = repair_timestamps(records['timestamp'], self.lastTimestamp)
+        if len(timestamps) == 0:
+            return
+
+        values = np.asarray(records['values'][order], dtype=np.float64)
+        if self.derive is not None:
+            values = np.column_stack((values, self.derive(values)))
+
+        self.lastTimestamp = int(timestamps[-1])
+        self.timestamps = np.concatenate((self.timestamps, timestamps))
+        self.values = values if self.values is None else np.concatenate((self.values, values))
+
+    # interpolates the samples on grid, which has to follow the grid of the previous call
+    def interpolate(self, grid):
+        while not self.exhausted and len(self.timestamps) - np.searchsorted(self.timestamps, grid[-1],
+                                                                           side='right') < CHUNK_OVERLAP:
+            self.__read_chunk()
+
+        # a stream without any samples is missing in the whole recording, its columns stay empty
+        if len(self.timestamps) == 0:
+            return np.full((len(grid), self.columns), np.nan)
+        with Profiling.stage('interpolate'):
+            interpolated = interpolate(self.timestamps, self.values, grid, self.method)
+
+        # samples far before the end of this grid are not needed for the next one
+        keep = max(0, np.searchsorted(self.timestamps, grid[-1], side='right') - CHUNK_OVERLAP)
+        self.timestamps = self.timestamps[keep:]
+        self.values = self.values[keep:]
+        return interpolated
+
+
+def euler_columns(orientation_values):
+    return np.column_stack(calculate_roll_pitch_yaw(*orientation_values.T))
+
+
+# converts a recording of any length with constant memory: all streams are read in chunks and interpolated onto
+# the output grid window by window, each window is written into the memory-mapped output array right away,
+# returns the same as convert_recording but always writes an array
+def convert_recording_chunked(job, chunk_rows=CHUNK_ROWS):
+    user, gesture, creation_time, recording, converted_path, parameters = job
+    method = parameters.get('interpolation') or 'cubic'
+    timestep = parameters.get('timestep') or 1_000
+
+    metadata, sources = open_recording_chunks(user, gesture, recording, chunk_rows)
+    summary = Catalog.RecordingSummary()
+
+    time_ranges = [time_range for _, time_range in sources.values() if time_range is not None]
+    if not time_ranges:
+        raise ValueError('recording {} of {}/{} contains no samples'.format(creation_time, user, gesture))
+    start = math.floor(min(first for first, _ in time_ranges) / 1_000) * 1_000
+    end = math.ceil(max(last for _, last in time_ranges) / 1_000) * 1_000
+    length = (end - start) // timestep + 1
+
+    # (stream, first column in the array), the orientation stream holds the euler angles as well
+    streams = []
+    column = 1
+    for stream, columns in ArrayDataset.ARRAY_STREAMS:
+        if stream == 'orientationEuler':
+            continue
+        stream_columns = len(columns) + (3 if stream == 'orientation' else 0)
+        streams.append((ChunkedStream(stream, sources[stream][0], summary, method,
+                                      euler_columns if stream == 'orientation' else None, stream_columns), column))
+        column += stream_columns
+
+    output_path = converted_file_path(converted_path, user, gesture, creation_time, 'array')
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    array = ArrayDataset.create_recording(output_path, length)
+
+    for row in range(0, length, chunk_rows):
+        grid = np.arange(start + row * timestep, start + min(length, row + chunk_rows) * timestep, timestep,
+                         dtype=np.int64)
+        array[row:row + len(grid), 0] = grid
+        for chunked_stream, column in streams:
+            interpolated = chunked_stream.interpolate(grid)
+            array[row:row + len(grid), column:column + chunked_stream.columns] = interpolated
+
+    with Profiling.stage('serialize'):
+        array.flush()
+        del array
+        ArrayDataset.save_metadata(output_path, metadata, length, start, timestep, parameters)
+    Profiling.count('bytes_written', written_size(output_path))
+
+    return output_path, dict(summary.as_dict(metadata), length=length, timestep=timestep)
+
+
+# all recordings below raw_path as (user, gesture, creation_time, {stream: path}), users and gestures are the
+# folder names, e.g. Data/raw/alice/fist/emg_2018-05-04_12-00-00.csv
+def find_recordings(raw_path=rawPath):
+    recordings = []
+    with Profiling.stage('find_recordings'):
+        for gesture_path in sorted(glob(os.path.join(raw_path, '*', '*', ''))):
+            gesture_path = os.path.dirname(gesture_path)
+            gesture = os.path.basename(gesture_path)
+            user = os.path.basename(os.path.dirname(gesture_path))
+
+            for creation_time, recording in group_recordings(glob(os.path.join(gesture_path, '*'))):
+                recordings.append((user, gesture, creation_time, recording))
+    return recordings
+
+
+# the converted file of a recording, e.g. Data/converted/alice/fist/fist2018-05-04_12-00-00.p
+def converted_file_path(converted_path, user, gesture, creation_time, output_format='pickle'):
+    extension = ArrayDataset.ARRAY_EXTENSION if output_format == 'array' else '.p'
+    return os.path.join(converted_path, user, gesture, gesture + creation_time) + extension
+
+
+def recording_size(recording):
+    return sum(os.path.getsize(path) for path in recording.values())
+
+
+# bytes of a converted file, arrays come with a sidecar
+def written_size(output_path):
+    size = os.path.getsize(output_path)
+    if output_path.endswith(ArrayDataset.ARRAY_EXTENSION):
+        size += os.path.getsize(ArrayDataset.sidecar_path(output_path))
+    return size
+
+
+# reads all streams of a single recording into a new gesture_dict
+def acquire_recording(user, gesture, recording):
+    gesture_dict = {'gesture': gesture, 'performed_by': user}
+
+    # older recordings contain an orientationEuler file as well, it is ignored and the angles are derived from
+    # the orientation quaternions so that all recordings are converted the same way
+    if 'session' in recording:
+        acquire_session(recording['session'], gesture_dict)
+    else:
+        gesture_dict['datetime'] = datetime.fromtimestamp(os.path.getctime(recording['accelerometer']))
 
-    emg1_interpolate = interp1d(emg_dict['timestamps'], emg_dict['1'], kind='cubic', fill_value='extrapolate')
-    emg2_interpolate = interp1d(emg_dict['timestamps'], emg_dict['2'], kind='cubic', fill_value='extrapolate')
-    emg3_interpolate = interp1d(emg_dict['timestamps'], emg_dict['3'], kind='cubic', fill_value='extrapolate')
-    emg4_interpolate = interp1d(emg_dict['timestamps'], emg_dict['4'], kind='cubic', fill_value='extrapolate')
-    emg5_interpolate = interp1d(emg_dict['timestamps'], emg_dict['5'], kind='cubic', fill_value='extrapolate')
-    emg6_interpolate = interp1d(emg_dict['timestamps'], emg_dict['6'], kind='cubic', fill_value='extrapolate')
-    emg7_interpolate = interp1d(emg_dict['timestamps'], emg_dict['7'], kind='cubic', fill_value='extrapolate')
-    emg8_interpolate = interp1d(emg_dict['timestamps'], emg_dict['8'], kind='cubic', fill_value='extrapolate')
+        if recording['emg'].endswith(BinaryFormat.FILE_EXTENSION):
+            acquire_binary([recording['accelerometer'], recording['emg'], recording['gyro'],
+                            recording['orientation']], gesture_dict)
+        else:
+            acquire_acc_or_gyro(recording['accelerometer'], gesture_dict, is_acc=True)
+            acquire_emg(recording['emg'], gesture_dict)
+            acquire_acc_or_gyro(recording['gyro'], gesture_dict, is_acc=False)
+            acquire_orientation(recording['orientation'], gesture_dict)
 
-    [result_dict['1'].append(emg1_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['2'].append(emg2_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['3'].append(emg3_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['4'].append(emg4_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['5'].append(emg5_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['6'].append(emg6_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['7'].append(emg7_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['8'].append(emg8_interpolate(timestamp)) for timestamp in timestamp_list]
+    derive_orientation_euler(gesture_dict)
+    return gesture_dict
 
-    return result_dict
 
+# converts one recording and saves it as pickle or array, runs in the worker processes of main
+# job: (user, gesture, creation_time, {stream: path}, converted_path, parameters)
+# returns the path of the output and the catalog summary of the recorded samples
+# with an interpolation method in the parameters, all streams are interpolated on a common time grid
+def convert_recording(job):
+    user, gesture, creation_time, recording, converted_path, parameters = job
 
-def interpolate_orientation(timestamp_list, ori_dict):
-    result_dict = {'x': [], 'y': [], 'z': [], 'w': []}
+    gesture_dict = acquire_recording(user, gesture, recording)
+    summary = Catalog.summarize(gesture_dict)
 
-    ori_dict['timestamps'] = eliminate_duplicates(ori_dict['timestamps'])
+    if parameters.get('interpolation') is not None:
+        start, end = find_gesture_start_end(gesture_dict)
+        gesture_dict = interpolate_data(start, end, parameters['timestep'], gesture_dict, parameters['interpolation'])
+        # the catalog knows the time grid, so windows can be planned without opening the file
+        summary['length'] = len(gesture_dict['timestamps'])
+        summary['timestep'] = parameters['timestep']
 
-    ori_x_interpolate = interp1d(ori_dict['timestamps'], ori_dict['x'], kind='cubic', fill_value='extrapolate')
-    ori_y_interpolate = interp1d(ori_dict['timestamps'], ori_dict['y'], kind='cubic', fill_value='extrapolate')
-    ori_z_interpolate = interp1d(ori_dict['timestamps'], ori_dict['z'], kind='cubic', fill_value='extrapolate')
-    ori_w_interpolate = interp1d(ori_dict['timestamps'], ori_dict['w'], kind='cubic', fill_value='extrapolate')
+    output_path = converted_file_path(converted_path, user, gesture, creation_time, parameters['output_format'])
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    [result_dict['x'].append(ori_x_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['y'].append(ori_y_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['z'].append(ori_z_interpolate(timestamp)) for timestamp in timestamp_list]
-    [result_dict['w'].append(ori_w_interpolate(timestamp)) for timestamp in timestamp_list]
+    with Profiling.stage('serialize'):
+        if parameters['output_format'] == 'array':
+            ArrayDataset.save_recording(output_path, gesture_dict, parameters)
+        else:
+            # save dictionary as pickle to disk
+            with open(output_path, 'wb') as pickle_file:
+                pickle.dump(gesture_dict, pickle_file)
+    Profiling.count('bytes_written', written_size(output_path))
+    return output_path, summary
 
-    return result_dict
 
+def acquire_data(user, gesture, parameters=None):
+    parameters = conversion_parameters() if parameters is None else parameters
+    with Profiling.stage('find_recordings'):
+        recordings = group_recordings(glob(os.path.join(rawPath, user, gesture, '*')))
+    return [convert_profiled(convert_recording, (user, gesture, creation_time, recording, convertedPath, parameters))[0]
+            for creation_time, recording in recordings]
 
-def find_gesture_start_end(gesture_dict):
-    CONVERT_MILLI_MICRO = 1_000
 
-    acc_timestamp_start = gesture_dict['accelerometer']['timestamps'][0]
-    acc_timestamp_end = gesture_dict['accelerometer']['timestamps'][-1]
-    emg_timestamp_start = gesture_dict['emg']['timestamps'][0]
-    emg_timestamp_end = gesture_dict['emg']['timestamps'][-1]
-    gyro_timestamp_start = gesture_dict['gyro']['timestamps'][0]
-    gyro_timestamp_end = gesture_dict['gyro']['timestamps'][-1]
-    ori_timestamp_start = gesture_dict['orientation']['timestamps'][0]
-    ori_timestamp_end = gesture_dict['orientation']['timestamps'][-1]
+# returns the timestamps sorted and made strictly increasing, see Interpolation.repair_timestamps
+def eliminate_duplicates(list_with_duplicates):
+    with Profiling.stage('deduplicate'):
+        return repair_timestamps(list_with_duplicates)[1]
 
-    sorted_list = sorted([acc_timestamp_start, acc_timestamp_end, emg_timestamp_start, emg_timestamp_end,
-                         gyro_timestamp_start, gyro_timestamp_end, ori_timestamp_start, ori_timestamp_end])
 
-    start = math.floor(sorted_list[0] / CONVERT_MILLI_MICRO) * CONVERT_MILLI_MICRO
-    end = math.ceil(sorted_list[-1] / CONVERT_MILLI_MICRO) * CONVERT_MILLI_MICRO
+# timestep_size is an integer with unit microseconds, method is one of Interpolation.METHODS
+# every stream of the result has the same timestamps, the columns of a stream are interpolated at once
+def interpolate_data(start, end, timestep_size, gesture_dict, method='cubic'):
+    # prepare interpolated dict
+    interpolated_dict = {}
+    interpolated_dict['gesture'] = gesture_dict['gesture']
+    interpolated_dict['datetime'] = gesture_dict['datetime']
+    interpolated_dict['performed_by'] = gesture_dict['performed_by']
+    for key in ('device', 'firmware'):
+        if key in gesture_dict:
+            interpolated_dict[key] = gesture_dict[key]
+    interpolated_dict['timestamps'] = np.arange(start, end + 1, timestep_size, dtype=np.int64)  # end is included
+
+    # interpolate and add results, the columns of a stream without samples are NaN
+    for stream, columns in STREAM_COLUMNS.items():
+        if len(gesture_dict[stream]['timestamps']) == 0:
+            interpolated_dict[stream] = {'timestamps': interpolated_dict['timestamps']}
+            for column in columns:
+                interpolated_dict[stream][column] = np.full(len(interpolated_dict['timestamps']), np.nan)
+            continue
+        interpolated_dict[stream] = interpolate_stream(interpolated_dict['timestamps'], gesture_dict[stream], columns,
+                                                       method)
 
-    # start and end are returned in microseconds
-    return start, end
+    return interpolated_dict
 
 
-def main():
-    rawUserPath = glob(rawPath + '\*')
-    rawUsers = [re.sub(r'.*\\', '', user) for user in rawUserPath]
-    # rawUsers = ['flo']
-    # print(rawUsers)
+# interpolates all columns of a stream dict on timestamp_list, the given dict is not changed
+def interpolate_stream(timestamp_list, data_dict, columns, method='cubic'):
+    with Profiling.stage('deduplicate'):
+        order, timestamps = repair_timestamps(data_dict['timestamps'])
+        values = np.column_stack([np.asarray(data_dict[column])[order] for column in columns])
 
-    thread_list = []
+    with Profiling.stage('interpolate'):
+        interpolated = interpolate(timestamps, values, timestamp_list, method)
 
-    for user in rawUsers:
-        rawGesturePath = glob(os.path.join(rawPath, user) + '\*')
-        rawGestures = [re.sub(r'.*\\', '', gesture) for gesture in rawGesturePath]
-        # rawGestures = ['big_stop']
-        # print(rawGestures)
+    result_dict = {'timestamps': timestamp_list}
+    for index, column in enumerate(columns):
+        result_dict[column] = interpolated[:, index]
+    return result_dict
 
-        convertedGesturePath = glob(os.path.join(convertedPath, user) + '\*')
-        convertedGestures = [re.sub(r'.*\\', '', gesture) for gesture in convertedGesturePath]
-        # print(convertedGestures)
 
-        # remove any existing gestures from rawGesture list, so only new ones will be converted
-        [rawGestures.remove(gesture) if gesture in rawGestures else '' for gesture in convertedGestures]
-        # print(rawGestures)
+# streams without samples are skipped, a recording without any samples raises a ValueError
+def find_gesture_start_end(gesture_dict):
+    CONVERT_MILLI_MICRO = 1_000
 
-        if len(rawGestures) == 0:
-            print('Converted gestures are up-to-date.')
-            break
+    sorted_list = []
+    for stream in ('accelerometer', 'emg', 'gyro', 'orientation'):
+        timestamps = gesture_dict[stream]['timestamps']
+        if len(timestamps):
+            sorted_list.extend((np.min(timestamps), np.max(timestamps)))
+    if not sorted_list:
+        raise ValueError('recording of {}/{} contains no samples'.format(gesture_dict['performed_by'],
+                                                                          gesture_dict['gesture']))
+    sorted_list.sort()
 
-        print('Converting gestures for {}... '.format(user), end='\n', flush=True)
+    start = math.floor(sorted_list[0] / CONVERT_MILLI_MICRO) * CONVERT_MILLI_MICRO
+    end = math.ceil(sorted_list[-1] / CONVERT_MILLI_MICRO) * CONVERT_MILLI_MICRO
 
-        for gesture in rawGestures:
-            gesture_dict = {}
-            # print('Creating pickles {}/{}... '.format(user, gesture), end='', flush=True)
-            # acquire_data(user, gesture, gesture_dict)
-            # print('DONE')
+    # start and end are returned in microseconds
+    return start, end
 
-            t = threading.Thread(target=acquire_data, args=(user, gesture, gesture_dict), daemon=True)
-            thread_list.append(t)
-            t.start()
-        # print('DONE')
 
-    for thread in thread_list:
-        thread.join()
+# parameters a converted file depends on, a file converted with other parameters is converted again
+# interpolation: one of Interpolation.METHODS or None to keep the recorded samples, timestep: microseconds
+# output_format: 'pickle' for gesture dicts or 'array' for fixed-rate arrays, which are always interpolated
+def conversion_parameters(interpolation=None, timestep=1_000, output_format='pickle'):
+    if output_format == 'array' and interpolation is None:
+        interpolation = 'cubic'
+    return {'converter_version': CONVERTER_VERSION, 'interpolation': interpolation,
+            'timestep': timestep if interpolation is not None else None, 'output_format': output_format}
+
+
+def file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as hashed_file:
+        for block in iter(lambda: hashed_file.read(1 << 20), b''):
+            sha1.update(block)
+    Profiling.count('bytes_hashed', os.path.getsize(path))
+    return sha1.hexdigest()
+
+
+# size and modification time of every raw file of a recording, raw_path relative paths as keys
+def recording_identity(recording, raw_path):
+    identity = {}
+    for path in sorted(recording.values()):
+        stat = os.stat(path)
+        identity[os.path.relpath(path, raw_path).replace(os.sep, '/')] = {'size': stat.st_size,
+                                                                         'mtime_ns': stat.st_mtime_ns}
+    return identity
+
+
+# compares the raw files with a manifest entry, with use_hash a file whose modification time changed but whose
+# content did not (e.g. after copying the raw tree) still counts as unchanged, its new time is stored in identity
+def same_identity(identity, entry, raw_path, use_hash):
+    sources = entry.get('sources', {})
+    if sources.keys() != identity.keys():
+        return False
+
+    for relative_path, file_identity in identity.items():
+        source = sources[relative_path]
+        if source['size'] != file_identity['size']:
+            return False
+        if source['mtime_ns'] != file_identity['mtime_ns']:
+            if not use_hash or 'sha1' not in source:
+                return False
+            file_identity['sha1'] = file_hash(os.path.join(raw_path, relative_path))
+            if source['sha1'] != file_identity['sha1']:
+                return False
+        elif 'sha1' in source:
+            file_identity['sha1'] = source['sha1']
+    return True
+
+
+def load_manifest(converted_path):
+    try:
+        with open(os.path.join(converted_path, MANIFEST_NAME)) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest['recordings']
+
+
+# written to a temporary file first, so an interrupted run never leaves a broken manifest behind
+def save_manifest(converted_path, recordings):
+    os.makedirs(converted_path, exist_ok=True)
+    manifest_path = os.path.join(converted_path, MANIFEST_NAME)
+    with Profiling.stage('manifest'):
+        with open(manifest_path + '.tmp', 'w') as manifest_file:
+            json.dump({'version': MANIFEST_VERSION, 'recordings': recordings}, manifest_file, indent=1,
+                      sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+
+# compares the raw tree with the manifest, returns the jobs of all new or changed recordings, the manifest keys of
+# the recordings which are gone and the identities of all current recordings by manifest key
+# recordings which are missing in catalog_keys are converted again as well, so the catalog gets their summaries
+def plan_conversion(raw_path, converted_path, manifest, parameters, use_hash=False, force=False, catalog_keys=None):
+    jobs, identities = [], {}
+    recordings = find_recordings(raw_path)
+
+    # the identities of all files are compared with the manifest, with use_hash the hashes are part of this stage
+    with Profiling.stage('plan'):
+        for user, gesture, creation_time, recording in recordings:
+            output_path = converted_file_path(converted_path, user, gesture, creation_time, parameters['output_format'])
+            key = os.path.relpath(output_path, converted_path).replace(os.sep, '/')
+            identities[key] = recording_identity(recording, raw_path)
+
+            entry = manifest.get(key)
+            if (force or entry is None or entry.get('parameters') != parameters or not os.path.exists(output_path) or
+                    (catalog_keys is not None and key not in catalog_keys) or
+                    not same_identity(identities[key], entry, raw_path, use_hash)):
+                jobs.append((user, gesture, creation_time, recording, converted_path, parameters))
+
+                # the hashes of converted recordings are stored, so later runs can compare them
+                if use_hash:
+                    for relative_path, file_identity in identities[key].items():
+                        file_identity.setdefault('sha1', file_hash(os.path.join(raw_path, relative_path)))
+
+    stale = [key for key in manifest if key not in identities]
+    return jobs, stale, identities
+
+
+# converts the jobs on `workers` processes, every recording is a task of its own, so a gesture with many
+# recordings is spread over all processes, the largest recordings are started first to keep all processes busy
+# yields (job, (path, summary) of the converted file, None) as soon as a file has been written, or
+# (job, None, error message) for a recording which failed, the other recordings are converted anyway
+# convert: convert_recording or convert_recording_chunked
+def convert_recordings(jobs, workers, convert=convert_recording):
+    jobs = sorted(jobs, key=lambda job: recording_size(job[3]), reverse=True)
+    convert = partial(try_conversion, convert)
+
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield convert_profiled(convert, job)
+        return
+
+    with Pool(min(workers, len(jobs))) as pool:
+        if not Profiling.enabled():
+            yield from pool.imap_unordered(convert, jobs, chunksize=1)
+            return
+
+        # the workers measure every recording and send the measurements back with the result
+        for result, profile in pool.imap_unordered(partial(profile_conversion, convert), jobs, chunksize=1):
+            Profiling.activeRun.add_recording(profile)
+            yield result
+
+
+# (job, convert(job), None) or (job, None, error message) if the recording can not be converted, the message is
+# sent back instead of the exception, which might not be picklable
+def try_conversion(convert, job):
+    try:
+        return job, convert(job), None
+    except Exception as error:
+        return job, None, '{}: {}'.format(type(error).__name__, error)
+
+
+# runs in the worker processes while profiling, returns (result of convert, profile of the recording)
+def profile_conversion(convert, job):
+    return Profiling.profile_recording('{}/{}/{}'.format(*job[:3]), convert, job)
+
+
+# convert(job) in this process, measured as a recording of its own while profiling
+def convert_profiled(convert, job):
+    if not Profiling.enabled():
+        return convert(job)
+
+    result, profile = profile_conversion(convert, job)
+    Profiling.activeRun.add_recording(profile)
+    return result
+
+
+# only recordings which are new or changed since the last run are converted, converted files of recordings which
+# have been deleted are removed as well, the catalog is kept in sync with the converted files
+# chunked: convert every recording with constant memory, only arrays can be written this way
+# profile: path of a json report with the time, cpu time, rows and bytes of every stage and recording,
+# profile_top: number of the slowest recordings which are printed
+def main(workers=None, use_hash=False, force=False, interpolation=None, timestep=1_000, output_format='pickle',
+         chunked=False, profile=None, profile_top=10):
+    if profile:
+        Profiling.enable()
+
+    try:
+        with Catalog.Catalog(convertedPath) as catalog:
+            convert_all(catalog, workers, use_hash, force, interpolation, timestep, output_format, chunked)
+    finally:
+        if profile:
+            report = Profiling.disable().write_report(profile, profile_top)
+            print('\n'.join(Profiling.summary_lines(report, profile_top)))
+            print('Profile written to {}'.format(profile))
+
+
+# removes a converted file if it exists, gesture and user folders which are empty now are removed as well
+def remove_output(output_path):
+    if not os.path.exists(output_path):
+        return
+    if output_path.endswith(ArrayDataset.ARRAY_EXTENSION):
+        ArrayDataset.remove_recording(output_path)
+    else:
+        os.remove(output_path)
+    try:
+        os.removedirs(os.path.dirname(output_path))
+    except OSError:
+        pass
+
+
+def convert_all(catalog, workers, use_hash, force, interpolation, timestep, output_format, chunked):
+    workers = workers or os.cpu_count() or 1
+    if chunked:
+        output_format = 'array'
+    parameters = conversion_parameters(interpolation, timestep, output_format)
+
+    manifest = load_manifest(convertedPath)
+    catalog_keys = catalog.keys()
+    jobs, stale, identities = plan_conversion(rawPath, convertedPath, manifest, parameters, use_hash, force,
+                                              catalog_keys)
+
+    # rows of files which are neither converted nor kept anymore, e.g. written by an interrupted run
+    for key in catalog_keys - identities.keys() - set(stale):
+        catalog.remove(key)
+
+    for key in stale:
+        stale_path = os.path.join(convertedPath, *key.split('/'))
+        with Profiling.stage('cleanup'):
+            remove_output(stale_path)
+        del manifest[key]
+        catalog.remove(key)
+
+    # entries whose raw files only got a new modification time are refreshed without converting them again
+    converting = {os.path.relpath(converted_file_path(converted_path, user, gesture, creation_time,
+                                                      parameters['output_format']), convertedPath).replace(os.sep, '/')
+                  for user, gesture, creation_time, _, converted_path, _ in jobs}
+    for key, identity in identities.items():
+        if key not in converting:
+            manifest[key] = {'sources': identity, 'parameters': parameters}
+
+    if len(jobs) == 0:
+        save_manifest(convertedPath, manifest)
+        print('Converted gestures are up-to-date.' + (' (removed {} stale)'.format(len(stale)) if stale else ''))
+        return
+
+    print('Converting {} recordings with {} processes... '.format(len(jobs), min(workers, len(jobs))),
+          end='', flush=True)
+
+    # the manifest is saved even if the conversion is interrupted, so the next run continues where this one stopped
+    # a recording which fails is reported and its output is removed, it is converted again by the next run
+    failed = []
+    try:
+        convert = convert_recording_chunked if chunked else convert_recording
+        for job, result, error in convert_recordings(jobs, workers, convert):
+            user, gesture, creation_time, _, converted_path, _ = job
+            output_path = converted_file_path(converted_path, user, gesture, creation_time,
+                                              parameters['output_format'])
+            key = os.path.relpath(output_path, convertedPath).replace(os.sep, '/')
+            if error is not None:
+                failed.append((key, error))
+                remove_output(output_path)
+                manifest.pop(key, None)
+                catalog.remove(key)
+                continue
+
+            manifest[key] = {'sources': identities[key], 'parameters': parameters}
+            with Profiling.stage('catalog'):
+                catalog.add(key, result[1], parameters['output_format'])
+    finally:
+        save_manifest(convertedPath, manifest)
+        with Profiling.stage('catalog'):
+            catalog.commit()
+    print('DONE' + (' (removed {} stale)'.format(len(stale)) if stale else '') +
+          (' ({} failed)'.format(len(failed)) if failed else ''))
+    for key, error in sorted(failed):
+        print('Could not convert {}: {}'.format(key, error))
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert the raw recordings into pickled gesture dicts or arrays.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes converting recordings in parallel, defaults to the number of cores')
+    parser.add_argument('--hash', action='store_true',
+                        help='compare the content of raw files whose modification time changed')
+    parser.add_argument('--force', action='store_true', help='convert all recordings again')
+    parser.add_argument('--interpolate', choices=METHODS, default=None,
+                        help='interpolate all streams on a common time grid instead of keeping the recorded samples')
+    parser.add_argument('--timestep', type=int, default=1_000,
+                        help='microseconds between two interpolated samples')
+    parser.add_argument('--output-format', choices=['pickle', 'array'], default='pickle',
+                        help='array writes every recording as memory-mappable .npy of shape (time, 22) with a json '
+                             'sidecar, interpolated with --interpolate (default cubic)')
+    parser.add_argument('--chunked', action='store_true',
+                        help='convert recordings piece by piece with constant memory, e.g. hour-long sessions, '
+                             'implies --output-format array')
+    parser.add_argument('--profile', metavar='REPORT', default=None,
+                        help='measure every stage of every recording and write a json report to this file')
+    parser.add_argument('--profile-top', type=int, default=10, help='number of the slowest recordings printed')
+    args = parser.parse_args()
+
     starttime = time.time()
-    main()
+    main(args.workers, args.hash, args.force, args.interpolate, args.timestep, args.output_format, args.chunked,
+         args.profile, args.profile_top)
     print('CSVconverter: {}'.format(time.time()-starttime))
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from glob import glob
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils import ArrayDataset, Catalog
+from Utils.FeatureExtraction import DEFAULT_PARAMETERS, FeatureCache, extract_features, feature_names
+
+convertedPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'converted')
+featuresPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'features')
+
+
+# gesture and user of a converted recording from its place in the tree, e.g. Data/converted/alice/fist/fist....p
+def recording_labels(path):
+    gesture_folder = os.path.dirname(os.path.abspath(path))
+    return os.path.basename(gesture_folder), os.path.basename(os.path.dirname(gesture_folder))
+
+
+def main(paths, parameters, workers=None, cache=None, output=None):
+    results = extract_features(paths, parameters, workers, cache)
+
+    hits = sum(1 for _, _, _, hit in results if hit)
+    windows = sum(len(timestamps) for _, timestamps, _, _ in results)
+    print('{} recordings, {} windows, {} from the cache'.format(len(results), windows, hits))
+
+    if output:
+        # one row per window, labelled with the gesture, the user and the recording it belongs to
+        labels = [recording_labels(path) for path, _, _, _ in results]
+        counts = [len(timestamps) for _, timestamps, _, _ in results]
+        np.savez(output,
+                 features=np.vstack([features for _, _, features, _ in results]) if results else np.empty((0, 0)),
+                 timestamps=np.concatenate([timestamps for _, timestamps, _, _ in results] or [[]]),
+                 gestures=np.repeat([gesture for gesture, _ in labels], counts),
+                 users=np.repeat([user for _, user in labels], counts),
+                 recordings=np.repeat(np.arange(len(results)), counts),
+                 paths=np.array([path for path, _, _, _ in results]),
+                 feature_names=np.array(feature_names(parameters)))
+        print('features written to {}'.format(output))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute EMG/IMU time domain and spectral features over sliding '
+                                                 'windows of the converted recordings.')
+    parser.add_argument('recordings', nargs='*', help='converted recordings (.p or .npy), glob patterns are allowed, '
+                                                      'all catalogued recordings if none are given')
+    parser.add_argument('--user', default=None)
+    parser.add_argument('--gesture', default=None)
+    parser.add_argument('--window-ms', type=int, default=DEFAULT_PARAMETERS['window_ms'])
+    parser.add_argument('--hop-ms', type=int, default=DEFAULT_PARAMETERS['hop_ms'])
+    parser.add_argument('--threshold', type=float, default=DEFAULT_PARAMETERS['threshold'],
+                        help='steps smaller than this are ignored by zero crossings and slope sign changes')
+    parser.add_argument('--streams', nargs='+', default=list(DEFAULT_PARAMETERS['streams']),
+                        choices=list(DEFAULT_PARAMETERS['streams']))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', default=featuresPath, help='folder of the feature cache')
+    parser.add_argument('--cache-size', type=float, default=2048, help='megabytes the cache may take on disk')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--output', default=None, help='write the features of all recordings to this .npz file')
+    args = parser.parse_args()
+
+    if args.recordings:
+        paths = sorted(path for pattern in args.recordings for path in (glob(pattern) or [pattern])
+                       if not path.endswith(ArrayDataset.SIDECAR_EXTENSION))
+    else:
+        with Catalog.Catalog(convertedPath) as catalog:
+            paths = catalog.query(user=args.user, gesture=args.gesture)
+
+    parameters = dict(DEFAULT_PARAMETERS, window_ms=args.window_ms, hop_ms=args.hop_ms, threshold=args.threshold,
+                      streams=tuple(args.streams))
+    cache = None if args.no_cache else FeatureCache(args.cache, int(args.cache_size * 1024 ** 2))
+
+    starttime = time.time()
+    main(paths, parameters, args.workers, cache, args.output)
+    print('FeatureExtractor: {}'.format(time.time() - starttime))
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from glob import glob
+from multiprocessing import Pool
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils import ArrayDataset, Catalog
+from Utils.DTW import DEFAULT_BAND, DEFAULT_LENGTH, DEFAULT_STREAMS, DTWIndex, prepare_sequence
+
+convertedPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'converted')
+
+
+# job: (path, length, streams)
+def load_sequence(job):
+    path, length, streams = job
+    return prepare_sequence(ArrayDataset.load_converted(path), length, streams)
+
+
+def load_sequences(paths, length, streams, workers=None):
+    jobs = [(path, length, streams) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(jobs)))
+    if workers > 1:
+        with Pool(workers) as pool:
+            return np.array(pool.map(load_sequence, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    return np.array([load_sequence(job) for job in jobs])
+
+
+# gesture and user of a converted recording from its place in the tree, e.g. Data/converted/alice/fist/fist....p
+def recording_label(path):
+    gesture_folder = os.path.dirname(os.path.abspath(path))
+    return '{}/{}'.format(os.path.basename(os.path.dirname(gesture_folder)), os.path.basename(gesture_folder))
+
+
+def nearest(index, paths, query_path, k, length, streams):
+    query_path = os.path.abspath(query_path)
+    absolute_paths = [os.path.abspath(path) for path in paths]
+    exclude = absolute_paths.index(query_path) if query_path in absolute_paths else None
+    query = index.sequences[exclude] if exclude is not None else load_sequence((query_path, length, streams))
+
+    print('nearest to {} ({}):'.format(query_path, recording_label(query_path)))
+    for distance, neighbour in index.knn(query, k, exclude):
+        print('{:12.4f}  {:<24} {}'.format(distance, recording_label(paths[neighbour]), paths[neighbour]))
+
+
+def matrix(index, paths, output, workers):
+    distances = index.distance_matrix(workers=workers)
+    labels = np.array([recording_label(path) for path in paths])
+
+    # mean distance within every class compared with the mean distance to the other recordings
+    for label in sorted(set(labels)):
+        members = labels == label
+        within = distances[np.ix_(members, members)][~np.eye(int(members.sum()), dtype=bool)]
+        between = distances[np.ix_(members, ~members)]
+        print('{:<24} {:4d} recordings, mean distance within {:10.4f}, to others {:10.4f}'.format(
+            label, int(members.sum()), within.mean() if within.size else 0.0, between.mean() if between.size else 0.0))
+
+    if output:
+        np.savez(output, distances=distances, paths=np.array(paths), labels=labels)
+        print('distance matrix written to {}'.format(output))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare converted recordings with multivariate dynamic time '
+                                                 'warping: the k nearest recordings to one recording or the pairwise '
+                                                 'distance matrix of a set of recordings.')
+    parser.add_argument('recordings', nargs='*', help='converted recordings (.p or .npy), glob patterns are allowed, '
+                                                      'the catalogued recordings matching --user/--gesture if none '
+                                                      'are given')
+    parser.add_argument('--user', default=None)
+    parser.add_argument('--gesture', default=None)
+    parser.add_argument('--query', default=None, help='recording whose nearest neighbours are searched')
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--matrix', action='store_true', help='compute the pairwise distance matrix')
+    parser.add_argument('--output', default=None, help='write the distance matrix to this .npz file')
+    parser.add_argument('--length', type=int, default=DEFAULT_LENGTH, help='points every recording is resampled to')
+    parser.add_argument('--band', type=float, default=DEFAULT_BAND,
+                        help='Sakoe-Chiba band width as fraction of the length')
+    parser.add_argument('--streams', nargs='+', default=list(DEFAULT_STREAMS), choices=list(DEFAULT_STREAMS))
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.recordings:
+        paths = sorted(path for pattern in args.recordings for path in (glob(pattern) or [pattern])
+                       if not path.endswith(ArrayDataset.SIDECAR_EXTENSION))
+    else:
+        with Catalog.Catalog(convertedPath) as catalog:
+            paths = catalog.query(user=args.user, gesture=args.gesture)
+    if not paths:
+        parser.error('no recordings found')
+    if args.query is None and not args.matrix:
+        parser.error('use --query and/or --matrix')
+
+    streams = tuple(args.streams)
+    starttime = time.time()
+    index = DTWIndex(load_sequences(paths, args.length, streams, args.workers), args.band)
+    print('{} recordings prepared in {:.3f} s'.format(len(index), time.time() - starttime))
+
+    starttime = time.time()
+    if args.query is not None:
+        nearest(index, paths, args.query, args.k, args.length, streams)
+    if args.matrix:
+        matrix(index, paths, args.output, args.workers)
+    print('{} DTW comparisons, {} candidates pruned by LB_Keogh in {:.3f} s'.format(
+        index.dtwCount, index.prunedCount, time.time() - starttime))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import pickle
+import argparse
+from glob import glob
+from time import sleep
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils.HubSimulator import ReplayHub
+from Utils.GestureRecognizer import GestureRecognizer, change_printer
+
+modelPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'models', 'recognizer.npz')
+
+
+def run_live(recognizer):
+    import myo as libmyo
+    libmyo.init(os.path.join(os.path.dirname(sys.path[0]), 'myo-sdk-win-0.9.0', 'bin'))
+
+    print('Connecting to Myo ... Use CTRL^C to exit.')
+    try:
+        hub = libmyo.Hub()
+    except MemoryError:
+        print('Myo Hub could not be created. Make sure Myo Connect is running.')
+        return
+
+    hub.set_locking_policy(libmyo.LockingPolicy.none)
+    try:
+        hub.run(1000, recognizer)
+        while hub.running:
+            sleep(0.1)
+    except KeyboardInterrupt:
+        print('\nQuitting ...')
+    finally:
+        hub.shutdown()
+
+
+# replays converted recordings at real-time speed and compares every decision with the recorded gesture
+def run_replay(recognizer, paths, time_scale):
+    recordings = []
+    for path in paths:
+        with open(path, 'rb') as pickle_file:
+            recordings.append(pickle.load(pickle_file))
+
+    hub = ReplayHub(recordings, time_scale=time_scale)
+    correct = [0, 0]
+    print_change = recognizer.onDecision
+
+    def on_decision(timestamp, gesture, decision_time):
+        correct[0] += gesture == recordings[hub.currentRecording]['gesture']
+        correct[1] += 1
+        print_change(timestamp, gesture, decision_time)
+
+    recognizer.onDecision = on_decision
+    hub.run(1000, recognizer)
+    hub.wait()
+
+    if correct[1]:
+        print('Correct decisions: {:.3f}'.format(correct[0] / correct[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recognize gestures on the live stream of a Myo.')
+    parser.add_argument('--model', default=modelPath, help='model written by RecognizerTrainer.py')
+    parser.add_argument('--replay', nargs='*',
+                        help='replay converted recordings (glob patterns) instead of connecting to a Myo')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='replay speed, 1.0 is real time and 0 replays as fast as possible')
+    args = parser.parse_args()
+
+    recognizer = GestureRecognizer(args.model, on_decision=change_printer())
+
+    if args.replay:
+        paths = sorted(path for pattern in args.replay for path in glob(pattern))
+        run_replay(recognizer, paths, args.time_scale if args.time_scale > 0 else None)
+    else:
+        run_live(recognizer)
+
+    # time from the callback receiving the sample which closed a window to the decision
+    summary = recognizer.decision_time_summary()
+    if summary['decisions']:
+        print('Decisions: {decisions}, decision time p50: {p50:.3f} ms, p99: {p99:.3f} ms, max: {max:.3f} ms'.format(
+            **summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,36 @@
 import os
 import sys
 import msvcrt
+import argparse
 from time import sleep
 import myo as libmyo
 
 # add project folder to path, this needs to be done so that modules of these folders are importable
 sys.path.append(os.path.dirname(sys.path[0]))
 from Utils import FileWriter, DataCollector
+from Utils.DeviceWriters import DeviceWriters
+from Utils.ListenerGroup import ListenerGroup
+from Utils.GestureRecognizer import GestureRecognizer, change_printer
 
 libmyo.init(os.path.join(os.path.dirname(sys.path[0]), 'myo-sdk-win-0.9.0', 'bin'))
 
-fileWriter = FileWriter.FileWriter()
-dataCollector = DataCollector.DataCollector(fileWriter)
 
+def main(file_format='session', stats_interval=None, pre_roll=500, user=None, gesture=None, model=None,
+         multi_device=False):
+    # with several armbands every armband gets its own writer and files, so they never wait for each other
+    if multi_device:
+        fileWriter = DeviceWriters(backend=file_format, async_writing=True, pre_roll=pre_roll)
+    else:
+        fileWriter = FileWriter.FileWriter(backend=file_format, async_writing=True, pre_roll=pre_roll)
+    if user is not None and gesture is not None:
+        fileWriter.set_labels(user, gesture)
+    dataCollector = DataCollector.DataCollector(fileWriter, summary_interval=stats_interval)
+
+    # optionally recognize gestures while recording
+    listener = dataCollector
+    if model is not None:
+        listener = ListenerGroup(dataCollector, GestureRecognizer(model, on_decision=change_printer()))
 
-def main():
     print('Connecting to Myo ... Use CTRL^C to exit.')
     try:
         hub = libmyo.Hub()
@@ -26,16 +42,27 @@ def main():
 
     # Listen to keyboard interrupts and stop the hub in that case.
     try:
-        hub.run(1000, dataCollector)
+        hub.run(1000, listener)
         while hub.running:
 
+            key = msvcrt.getch() if msvcrt.kbhit() else None
+
+            # the hub keeps streaming into the pre-roll buffer while the new labels are typed in
+            if key == b'l' and not fileWriter.filesOpened:
+                fileWriter.set_labels(*input('Please provide name and gesture (e.g: Alice Fist)\n').split())
+                print('Next recordings: {} {}'.format(fileWriter.userLabel, fileWriter.gestureLabel))
+
             # check if Enter was pressed to start/stop recording data
-            if msvcrt.kbhit() and (msvcrt.getch() == b'\r'):
+            if key == b'\r':
                 if fileWriter.filesOpened:
                     fileWriter.close_files()
-                    print('Finished collecting data!')
+                    print('Finished collecting data! (dropped samples: {}, blocked callbacks: {})'.format(
+                        fileWriter.overflowCount, fileWriter.backPressureCount))
+                    for line in dataCollector.summary_lines():
+                        print('STATS -- ' + line)
                 else:
                     fileWriter.open_files()
+                    dataCollector.reset_stats()
                     print('Starting to collect data...')
 
             sleep(0.1)
@@ -54,4 +81,18 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Record Myo data, press Enter to start/stop a recording.')
+    parser.add_argument('--format', choices=['session', 'csv', 'binary'], default='session',
+                        help='file format of the recordings, session writes all streams and metadata into one file')
+    parser.add_argument('--stats-interval', type=float, default=None,
+                        help='print a summary of the stream statistics every STATS_INTERVAL seconds')
+    parser.add_argument('--pre-roll', type=int, default=500,
+                        help='milliseconds of data before Enter was pressed that are added to a recording')
+    parser.add_argument('--user', help='name used for all recordings, press l to change it while running')
+    parser.add_argument('--gesture', help='gesture used for all recordings, press l to change it while running')
+    parser.add_argument('--model', help='print the gestures recognized with this model while recording')
+    parser.add_argument('--multi-device', action='store_true',
+                        help='record every connected armband into its own files')
+    args = parser.parse_args()
+
+    main(args.format, args.stats_interval, args.pre_roll, args.user, args.gesture, args.model, args.multi_device)
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import pickle
+import argparse
+import numpy as np
+
+from glob import glob
+from multiprocessing import Pool
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils import ArrayDataset, Catalog
+from Utils.Segmentation import DEFAULT_PARAMETERS, detect_segments, cut_gesture_dict
+
+convertedPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'converted')
+segmentedPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'segmented')
+
+STREAM_COLUMNS = dict(ArrayDataset.ARRAY_STREAMS)
+
+
+def stream_values(gesture_dict, stream):
+    return np.column_stack([np.asarray(gesture_dict[stream][column]) for column in STREAM_COLUMNS[stream]])
+
+
+# list of (start, end) timestamps of the gestures in a converted recording
+def find_segments(gesture_dict, parameters):
+    return detect_segments(gesture_dict['emg']['timestamps'], stream_values(gesture_dict, 'emg'),
+                           gesture_dict['gyro']['timestamps'], stream_values(gesture_dict, 'gyro'),
+                           gesture_dict['accelerometer']['timestamps'], stream_values(gesture_dict, 'accelerometer'),
+                           **parameters)
+
+
+# splits one continuous recording into one pickle per detected gesture, e.g. Data/segmented/alice/fist/
+# fist2018-05-04_12-00-00_seg003.p, returns [(path, catalog summary)]
+# job: (path of the converted recording, output folder, segmentation parameters)
+def segment_recording(job):
+    path, segmented_path, parameters = job
+    gesture_dict = ArrayDataset.load_converted(path)
+
+    streams = [stream for stream in STREAM_COLUMNS if stream in gesture_dict]
+    name = os.path.splitext(os.path.basename(path))[0]
+    output_folder = os.path.join(segmented_path, gesture_dict['performed_by'], gesture_dict['gesture'])
+    os.makedirs(output_folder, exist_ok=True)
+
+    results = []
+    for index, (start, end) in enumerate(find_segments(gesture_dict, parameters)):
+        segment = cut_gesture_dict(gesture_dict, start, end, streams)
+        segment['source'] = path
+        segment['segment'] = (start, end)
+
+        segment_path = os.path.join(output_folder, '{}_seg{:03d}.p'.format(name, index))
+        with open(segment_path, 'wb') as pickle_file:
+            pickle.dump(segment, pickle_file)
+        results.append((segment_path, Catalog.summarize(segment)))
+    return results
+
+
+def main(paths, parameters, workers=None, segmented_path=segmentedPath):
+    workers = min(workers or os.cpu_count() or 1, max(1, len(paths)))
+    jobs = [(path, segmented_path, parameters) for path in paths]
+
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.map(segment_recording, jobs, chunksize=1)
+    else:
+        results = [segment_recording(job) for job in jobs]
+
+    # the segments get a catalog of their own, so they can be queried like the converted recordings
+    with Catalog.Catalog(segmented_path) as catalog:
+        for segments in results:
+            for segment_path, summary in segments:
+                catalog.add(os.path.relpath(segment_path, segmented_path).replace(os.sep, '/'), summary, 'pickle')
+
+    for path, segments in zip(paths, results):
+        print('{}: {} gestures'.format(path, len(segments)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Split continuous converted recordings into one recording per '
+                                                 'gesture, detected from the EMG envelope and the IMU motion.')
+    parser.add_argument('recordings', nargs='+', help='converted recordings (.p or .npy), glob patterns are allowed')
+    parser.add_argument('--output', default=segmentedPath, help='folder of the segmented recordings')
+    parser.add_argument('--workers', type=int, default=None)
+    for name, default in DEFAULT_PARAMETERS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=float, default=default,
+                            help='milliseconds' if name in ('window', 'min_gap', 'min_duration', 'padding') else None)
+    args = parser.parse_args()
+
+    parameters = {name: getattr(args, name) for name in DEFAULT_PARAMETERS}
+    parameters['window'] = int(parameters['window'])
+    paths = sorted(path for pattern in args.recordings for path in (glob(pattern) or [pattern])
+                   if not path.endswith(ArrayDataset.SIDECAR_EXTENSION))
+
+    starttime = time.time()
+    main(paths, parameters, args.workers, args.output)
+    print('GestureSegmenter: {}'.format(time.time() - starttime))
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from glob import glob
+
+# add project folder to path, this needs to be done so that modules of these folders are importable
+sys.path.append(os.path.dirname(sys.path[0]))
+from Utils.ArrayDataset import ARRAY_EXTENSION, load_converted
+from Utils.GestureRecognizer import extract_features, save_model
+
+convertedPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'converted')
+modelPath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'models', 'recognizer.npz')
+
+
+# pickles and arrays, interpolated recordings are resampled to the rates of the armband by extract_features
+def load_recordings(users, gestures):
+    recordings = []
+    paths = (glob(os.path.join(convertedPath, '*', '*', '*.p')) +
+             glob(os.path.join(convertedPath, '*', '*', '*' + ARRAY_EXTENSION)))
+    for path in sorted(paths):
+        user = os.path.basename(os.path.dirname(os.path.dirname(path)))
+        gesture = os.path.basename(os.path.dirname(path))
+        if (users and user not in users) or (gestures and gesture not in gestures):
+            continue
+
+        recordings.append(load_converted(path))
+    return recordings
+
+
+# linear discriminant analysis with a shrunk pooled covariance, returns weights (classes, features) and bias
+def train_lda(features, labels, class_count, shrinkage):
+    means = np.array([features[labels == label].mean(axis=0) for label in range(class_count)])
+    centered = features - means[labels]
+    covariance = centered.T @ centered / max(1, len(features) - class_count)
+    covariance = ((1 - shrinkage) * covariance +
+                  shrinkage * np.trace(covariance) / len(covariance) * np.eye(len(covariance)))
+
+    weights = np.linalg.solve(covariance, means.T).T
+    priors = np.bincount(labels, minlength=class_count) / len(labels)
+    bias = -0.5 * np.einsum('ij,ij->i', weights, means) + np.log(priors)
+    return weights, bias
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the real-time gesture recognizer on converted recordings.')
+    parser.add_argument('--users', nargs='*', help='only use recordings of these users')
+    parser.add_argument('--gestures', nargs='*', help='only use these gestures')
+    parser.add_argument('--window', type=int, default=200, help='window length in milliseconds')
+    parser.add_argument('--hop', type=int, default=50, help='milliseconds between two decisions')
+    parser.add_argument('--shrinkage', type=float, default=0.1)
+    parser.add_argument('--test-every', type=int, default=5,
+                        help='every n-th recording of a gesture is held out to measure the accuracy')
+    parser.add_argument('--output', default=modelPath)
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.users, args.gestures)
+    classes = sorted({recording['gesture'] for recording in recordings})
+    if len(classes) < 2:
+        print('At least two gestures are needed to train the recognizer.')
+        return
+
+    print('Extracting features of {} recordings... '.format(len(recordings)), end='', flush=True)
+    train_features, train_labels, test_features, test_labels = [], [], [], []
+    seen = {gesture: 0 for gesture in classes}
+    for recording in recordings:
+        features = extract_features(recording, args.window, args.hop)
+        labels = np.full(len(features), classes.index(recording['gesture']))
+
+        seen[recording['gesture']] += 1
+        if args.test_every > 0 and seen[recording['gesture']] % args.test_every == 0:
+            test_features.append(features)
+            test_labels.append(labels)
+        else:
+            train_features.append(features)
+            train_labels.append(labels)
+    print('DONE')
+
+    features = np.concatenate(train_features)
+    labels = np.concatenate(train_labels)
+    mean = features.mean(axis=0)
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+
+    weights, bias = train_lda((features - mean) / std, labels, len(classes), args.shrinkage)
+
+    if test_features:
+        features = (np.concatenate(test_features) - mean) / std
+        predictions = (features @ weights.T + bias).argmax(axis=1)
+        print('Accuracy on held out recordings: {:.3f}'.format(np.mean(predictions == np.concatenate(test_labels))))
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    save_model(args.output, classes, mean, std, weights, bias, args.window, args.hop)
+    print('Model saved to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    starttime = time.time()
+    main()
+    print('RecognizerTrainer: {}'.format(time.time() - starttime))
@@ -0,0 +1,130 @@
+import os
+import json
+import pickle
+import numpy as np
+from numpy.lib.format import open_memmap
+from datetime import datetime
+
+# a converted recording as one array of shape (time, 22) with all streams interpolated on the same time grid,
+# saved as uncompressed .npy so it can be memory-mapped, and a small json sidecar with the metadata,
+# e.g. fist2018-05-04_12-00-00.npy and fist2018-05-04_12-00-00.json
+ARRAY_EXTENSION = '.npy'
+SIDECAR_EXTENSION = '.json'
+
+# (stream, columns) in the order of the array columns, column 0 holds the timestamps in microseconds
+ARRAY_STREAMS = (
+    ('emg', ('1', '2', '3', '4', '5', '6', '7', '8')),
+    ('accelerometer', ('x', 'y', 'z')),
+    ('gyro', ('x', 'y', 'z')),
+    ('orientation', ('x', 'y', 'z', 'w')),
+    ('orientationEuler', ('roll', 'pitch', 'yaw')),
+)
+ARRAY_COLUMNS = ('timestamp',) + tuple(stream + '_' + column for stream, columns in ARRAY_STREAMS for column in columns)
+
+# the metadata of the gesture dicts which is copied into the sidecar
+METADATA_KEYS = ('gesture', 'performed_by', 'device', 'firmware')
+
+
+def sidecar_path(array_path):
+    return os.path.splitext(array_path)[0] + SIDECAR_EXTENSION
+
+
+# interpolated_dict: result of CSVconverter.interpolate_data, every stream has the same timestamps
+def save_recording(array_path, interpolated_dict, parameters=None):
+    timestamps = interpolated_dict['timestamps']
+    array = np.empty((len(timestamps), len(ARRAY_COLUMNS)), dtype=np.float64)
+
+    # microsecond timestamps stay exact in float64 up to 2^53, about 285 years after 1970
+    array[:, 0] = timestamps
+    index = 1
+    for stream, columns in ARRAY_STREAMS:
+        for column in columns:
+            array[:, index] = interpolated_dict[stream][column]
+            index += 1
+
+    np.save(array_path, array)
+    save_metadata(array_path, interpolated_dict, len(timestamps), int(timestamps[0]) if len(timestamps) else None,
+                  int(timestamps[1] - timestamps[0]) if len(timestamps) > 1 else None, parameters)
+
+
+# creates the .npy of a recording with `length` rows on disk and returns it memory-mapped for writing,
+# so a long recording can be written piece by piece, save_metadata completes it
+def create_recording(array_path, length):
+    return open_memmap(array_path, mode='w+', dtype=np.float64, shape=(length, len(ARRAY_COLUMNS)))
+
+
+# writes the sidecar, metadata: gesture dict or dict with its metadata keys, length: rows of the array,
+# start and timestep: timestamp of the first row and microseconds between two rows
+def save_metadata(array_path, metadata, length, start, timestep, parameters=None):
+    sidecar = {key: metadata[key] for key in METADATA_KEYS if key in metadata}
+    sidecar['datetime'] = metadata['datetime'].isoformat()
+    sidecar['columns'] = list(ARRAY_COLUMNS)
+    sidecar['shape'] = [length, len(ARRAY_COLUMNS)]
+    sidecar['start'] = start
+    sidecar['timestep'] = timestep
+    if parameters is not None:
+        sidecar['parameters'] = parameters
+
+    with open(sidecar_path(array_path), 'w') as sidecar_file:
+        json.dump(sidecar, sidecar_file, indent=1)
+
+
+def load_metadata(array_path):
+    with open(sidecar_path(array_path)) as sidecar_file:
+        return json.load(sidecar_file)
+
+
+# returns (metadata, array), the array is memory-mapped read-only unless mmap_mode is None,
+# so pages of a recording are only read when they are used and are shared by all processes reading it
+def load_recording(array_path, mmap_mode='r'):
+    return load_metadata(array_path), np.load(array_path, mmap_mode=mmap_mode)
+
+
+# the columns of one stream in the dict layout of the pickled gesture dicts, copied into memory if mmap_mode is None
+def load_stream(array_path, stream, mmap_mode='r'):
+    array = np.load(array_path, mmap_mode='r')
+
+    index = 1
+    for name, columns in ARRAY_STREAMS:
+        if name == stream:
+            break
+        index += len(columns)
+    else:
+        raise KeyError(stream)
+
+    data_dict = {'timestamps': array[:, 0].astype(np.int64)}
+    for column in columns:
+        data_dict[column] = array[:, index] if mmap_mode is not None else np.array(array[:, index])
+        index += 1
+    return data_dict
+
+
+# the recording in the dict layout of the pickled gesture dicts, all columns are views onto the array
+def load_gesture_dict(array_path, mmap_mode='r'):
+    metadata, array = load_recording(array_path, mmap_mode)
+
+    gesture_dict = {key: metadata[key] for key in METADATA_KEYS if key in metadata}
+    gesture_dict['datetime'] = datetime.fromisoformat(metadata['datetime'])
+    gesture_dict['timestamps'] = array[:, 0].astype(np.int64)
+
+    index = 1
+    for stream, columns in ARRAY_STREAMS:
+        gesture_dict[stream] = {'timestamps': gesture_dict['timestamps']}
+        for column in columns:
+            gesture_dict[stream][column] = array[:, index]
+            index += 1
+    return gesture_dict
+
+
+# any converted recording, arrays are memory-mapped and pickles are read as a whole
+def load_converted(path):
+    if path.endswith(ARRAY_EXTENSION):
+        return load_gesture_dict(path)
+    with open(path, 'rb') as pickle_file:
+        return pickle.load(pickle_file)
+
+
+def remove_recording(array_path):
+    for path in (array_path, sidecar_path(array_path)):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,173 @@
+import json
+import struct
+import numpy as np
+
+# every binary stream file starts with MAGIC, the offset of the first record as uint32 and a json header
+# padded to a multiple of HEADER_ALIGNMENT, followed by fixed-width little endian records without padding
+MAGIC = b'MYOSTRM1'
+VERSION = 1
+HEADER_ALIGNMENT = 64
+FILE_EXTENSION = '.bin'
+
+# record layout per stream: int64 timestamp in microseconds followed by the sample values
+# orientationEuler is no longer recorded, it is only kept to read older recordings
+RECORD_FORMATS = {
+    'emg': '<q8b',
+    'gyro': '<q3f',
+    'orientation': '<q4f',
+    'orientationEuler': '<q3f',
+    'accelerometer': '<q3f',
+}
+
+RECORD_DTYPES = {
+    'emg': np.dtype([('timestamp', '<i8'), ('values', 'i1', (8,))]),
+    'gyro': np.dtype([('timestamp', '<i8'), ('values', '<f4', (3,))]),
+    'orientation': np.dtype([('timestamp', '<i8'), ('values', '<f4', (4,))]),
+    'orientationEuler': np.dtype([('timestamp', '<i8'), ('values', '<f4', (3,))]),
+    'accelerometer': np.dtype([('timestamp', '<i8'), ('values', '<f4', (3,))]),
+}
+
+
+def pack_header(stream, metadata=None):
+    header = {'version': VERSION, 'stream': stream, 'format': RECORD_FORMATS[stream]}
+    if metadata is not None:
+        header.update(metadata)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_offset = len(MAGIC) + 4 + len(header_bytes)
+    data_offset += -data_offset % HEADER_ALIGNMENT
+
+    return (MAGIC + struct.pack('<I', data_offset) + header_bytes).ljust(data_offset, b' ')
+
+
+def read_header(path):
+    with open(path, 'rb') as binary_file:
+        if binary_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a binary myo stream file'.format(path))
+
+        data_offset, = struct.unpack('<I', binary_file.read(4))
+        header = json.loads(binary_file.read(data_offset - len(MAGIC) - 4).decode('utf-8'))
+
+    return header, data_offset
+
+
+# returns a read-only structured array with the fields 'timestamp' and 'values' mapped directly from disk
+def open_stream(path):
+    header, data_offset = read_header(path)
+    dtype = RECORD_DTYPES[header['stream']]
+
+    # a recording that was interrupted may end with an incomplete record, which is ignored
+    with open(path, 'rb') as binary_file:
+        binary_file.seek(0, 2)
+        record_count = (binary_file.tell() - data_offset) // dtype.itemsize
+
+    if record_count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=(record_count,))
+
+
+# a session container holds all streams of one recording and is written while recording, so everything up to the
+# last complete block survives if the recorder is interrupted:
+#   SESSION_MAGIC, the offset of the first block as uint32 and a json header with the version, the metadata known
+#   when the recording started and the streams in the order of their ids, padded to a multiple of HEADER_ALIGNMENT
+#   blocks of one stream each: BLOCK_MAGIC, stream id and record count as uint32, then the records
+#   when the recording is closed: a json index with the final metadata and {stream: [[offset, count], ...]}, offsets
+#   of the first record of every block, followed by the offset of the index as uint64 and INDEX_MAGIC
+# sessions without an index are read by walking the blocks, an incomplete last block keeps its complete records
+SESSION_MAGIC = b'MYOSESS2'
+SESSION_EXTENSION = '.myo'
+SESSION_VERSION = 2
+BLOCK_MAGIC = b'MYOB'
+BLOCK_HEADER = struct.Struct('<4sII')
+INDEX_MAGIC = b'MYOINDEX'
+INDEX_TRAILER = struct.Struct('<Q8s')
+
+# the first session files had a single json header with {stream: {format, offset, count}} and one contiguous block
+# per stream, written when the recording was closed, they are still read
+SESSION_MAGIC_V1 = b'MYOSESS1'
+
+
+def pack_session_header(metadata, streams):
+    header_bytes = json.dumps({'version': SESSION_VERSION, 'metadata': metadata, 'streams': list(streams),
+                               'formats': {stream: RECORD_FORMATS[stream] for stream in streams}}).encode('utf-8')
+    data_offset = len(SESSION_MAGIC) + 4 + len(header_bytes)
+    data_offset += -data_offset % HEADER_ALIGNMENT
+    return (SESSION_MAGIC + struct.pack('<I', data_offset) + header_bytes).ljust(data_offset, b' ')
+
+
+def pack_block_header(stream_id, count):
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, stream_id, count)
+
+
+# index_offset: position of the index in the file, blocks: {stream: [[offset, count], ...]}
+def pack_session_index(metadata, blocks, index_offset):
+    index_bytes = json.dumps({'metadata': metadata, 'blocks': blocks}).encode('utf-8')
+    return index_bytes + INDEX_TRAILER.pack(index_offset, INDEX_MAGIC)
+
+
+# {stream: [[offset, count], ...]} of a session without index, found by walking from block to block
+def scan_session_blocks(session_file, data_offset, streams, file_size):
+    blocks = {stream: [] for stream in streams}
+    position = data_offset
+    while position + BLOCK_HEADER.size <= file_size:
+        session_file.seek(position)
+        magic, stream_id, count = BLOCK_HEADER.unpack(session_file.read(BLOCK_HEADER.size))
+        if magic != BLOCK_MAGIC or stream_id >= len(streams):
+            break
+
+        stream = streams[stream_id]
+        position += BLOCK_HEADER.size
+        complete = min(count, (file_size - position) // RECORD_DTYPES[stream].itemsize)
+        if complete > 0:
+            blocks[stream].append([position, complete])
+        if complete < count:
+            break
+        position += count * RECORD_DTYPES[stream].itemsize
+    return blocks
+
+
+# returns the metadata and (offset, count) of the blocks of every stream, offsets are positions in the file
+def read_session_layout(path):
+    with open(path, 'rb') as session_file:
+        magic = session_file.read(len(SESSION_MAGIC))
+        if magic not in (SESSION_MAGIC, SESSION_MAGIC_V1):
+            raise ValueError('{} is not a myo session file'.format(path))
+
+        data_offset, = struct.unpack('<I', session_file.read(4))
+        header = json.loads(session_file.read(data_offset - len(SESSION_MAGIC) - 4).decode('utf-8'))
+        if magic == SESSION_MAGIC_V1:
+            return header['metadata'], {stream: [[data_offset + layout['offset'], layout['count']]]
+                                        for stream, layout in header['streams'].items()}
+
+        file_size = session_file.seek(0, 2)
+        if file_size >= data_offset + INDEX_TRAILER.size:
+            session_file.seek(file_size - INDEX_TRAILER.size)
+            index_offset, index_magic = INDEX_TRAILER.unpack(session_file.read(INDEX_TRAILER.size))
+            if index_magic == INDEX_MAGIC and data_offset <= index_offset < file_size - INDEX_TRAILER.size:
+                session_file.seek(index_offset)
+                index = json.loads(session_file.read(file_size - INDEX_TRAILER.size - index_offset).decode('utf-8'))
+                return index['metadata'], index['blocks']
+
+        # the recording was not closed, the metadata is the one known when it started
+        return header['metadata'], scan_session_blocks(session_file, data_offset, header['streams'], file_size)
+
+
+# returns the metadata and for every stream a list of read-only structured arrays mapped from disk, one per block
+def open_session_blocks(path):
+    metadata, layout = read_session_layout(path)
+    return metadata, {stream: [np.memmap(path, dtype=RECORD_DTYPES[stream], mode='r', offset=offset, shape=(count,))
+                               for offset, count in blocks if count > 0]
+                      for stream, blocks in layout.items()}
+
+
+# returns the metadata and a read-only structured array for every stream of the session, streams written in one
+# block are mapped from disk, the blocks of the others are copied into one array
+def open_session(path):
+    metadata, stream_blocks = open_session_blocks(path)
+    streams = {}
+    for stream, blocks in stream_blocks.items():
+        if len(blocks) == 0:
+            streams[stream] = np.zeros(0, dtype=RECORD_DTYPES[stream])
+        else:
+            streams[stream] = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+    return metadata, streams
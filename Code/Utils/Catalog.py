@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import numpy as np
+
+# the catalog lives next to the converted recordings, e.g. Data/converted/catalog.sqlite
+CATALOG_NAME = 'catalog.sqlite'
+
+STREAMS = ('emg', 'accelerometer', 'gyro', 'orientation')
+
+# one row per converted file, path is relative to the converted folder with / as separator
+COLUMNS = (
+    ('path', 'TEXT PRIMARY KEY'),
+    ('user', 'TEXT NOT NULL'),
+    ('gesture', 'TEXT NOT NULL'),
+    ('datetime', 'TEXT'),
+    ('device', 'TEXT'),
+    ('output_format', 'TEXT'),
+    ('start', 'INTEGER'),
+    ('duration', 'REAL'),
+) + tuple((stream + '_samples', 'INTEGER') for stream in STREAMS) + (
+    ('duplicates', 'INTEGER'),
+    ('out_of_order', 'INTEGER'),
+    ('max_gap', 'INTEGER'),
+    ('emg_rate', 'REAL'),
+    # rows of an interpolated file and microseconds between them, NULL for files with the recorded samples
+    ('length', 'INTEGER'),
+    ('timestep', 'INTEGER'),
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+
+# length and quality stats of the recorded (not interpolated) samples, the timestamps of a stream can be added in
+# chunks, e.g. while a long recording is converted piece by piece, timestamps and gaps are microseconds
+class RecordingSummary:
+
+    def __init__(self):
+        self.counts = {stream: 0 for stream in STREAMS}
+        self.lastTimestamps = {stream: None for stream in STREAMS}
+        self.duplicates = 0
+        self.outOfOrder = 0
+        self.maxGap = 0
+        self.first = None
+        self.last = None
+
+    def add(self, stream, timestamps):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(timestamps) == 0:
+            return
+
+        # the gap to the last timestamp of the previous chunk counts as well
+        if self.lastTimestamps[stream] is not None:
+            gaps = np.diff(timestamps, prepend=self.lastTimestamps[stream])
+        else:
+            gaps = np.diff(timestamps)
+
+        self.counts[stream] += len(timestamps)
+        self.lastTimestamps[stream] = int(timestamps[-1])
+        self.duplicates += int(np.count_nonzero(gaps == 0))
+        self.outOfOrder += int(np.count_nonzero(gaps < 0))
+        if len(gaps):
+            self.maxGap = max(self.maxGap, int(gaps.max()))
+
+        first, last = int(timestamps.min()), int(timestamps.max())
+        self.first = first if self.first is None else min(self.first, first)
+        self.last = last if self.last is None else max(self.last, last)
+
+    # metadata: the gesture dict or its metadata, duration is seconds
+    def as_dict(self, metadata):
+        summary = {
+            'user': metadata['performed_by'],
+            'gesture': metadata['gesture'],
+            'datetime': metadata['datetime'].isoformat() if metadata.get('datetime') else None,
+            'device': metadata.get('device'),
+            'duplicates': self.duplicates,
+            'out_of_order': self.outOfOrder,
+            'max_gap': self.maxGap,
+            'start': self.first,
+            'duration': (self.last - self.first) / 1_000_000 if self.first is not None else 0.0,
+        }
+        for stream, count in self.counts.items():
+            summary[stream + '_samples'] = count
+
+        emg_span = summary['duration'] if self.counts['emg'] > 1 else 0.0
+        summary['emg_rate'] = (self.counts['emg'] - 1) / emg_span if emg_span > 0 else 0.0
+        return summary
+
+
+# metadata, length and quality stats of a gesture dict with the recorded (not interpolated) samples
+def summarize(gesture_dict):
+    summary = RecordingSummary()
+    for stream in STREAMS:
+        summary.add(stream, gesture_dict[stream]['timestamps'])
+    return summary.as_dict(gesture_dict)
+
+
+# index of the converted recordings, CSVconverter adds a row for every file it writes and removes the rows of
+# deleted recordings, so recordings can be selected without opening them, e.g.
+#
+#   with Catalog(convertedPath) as catalog:
+#       paths = catalog.query(user='ruben', gesture='come_up', min_duration=1.5)
+class Catalog:
+
+    def __init__(self, converted_path):
+        self.convertedPath = converted_path
+        os.makedirs(converted_path, exist_ok=True)
+
+        self.connection = sqlite3.connect(os.path.join(converted_path, CATALOG_NAME))
+        self.connection.execute('CREATE TABLE IF NOT EXISTS recordings ({})'.format(
+            ', '.join('{} {}'.format(name, column_type) for name, column_type in COLUMNS)))
+        # catalogs written before a column was added get it with NULL in every row
+        existing = {column[1] for column in self.connection.execute('PRAGMA table_info(recordings)')}
+        for name, column_type in COLUMNS:
+            if name not in existing:
+                self.connection.execute('ALTER TABLE recordings ADD COLUMN {} {}'.format(name, column_type))
+        self.connection.execute('CREATE INDEX IF NOT EXISTS user_gesture ON recordings (user, gesture)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS gesture ON recordings (gesture)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS datetime ON recordings (datetime)')
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def commit(self):
+        self.connection.commit()
+
+    # key: path of the converted file relative to the converted folder, summary: result of summarize
+    def add(self, key, summary, output_format=None):
+        row = dict(summary, path=key, output_format=output_format)
+        self.connection.execute('INSERT OR REPLACE INTO recordings ({}) VALUES ({})'.format(
+            ', '.join(COLUMN_NAMES), ', '.join('?' * len(COLUMN_NAMES))), [row.get(name) for name in COLUMN_NAMES])
+
+    def remove(self, key):
+        self.connection.execute('DELETE FROM recordings WHERE path = ?', (key,))
+
+    # the row of a converted file as dict or None, key is relative to the converted folder
+    def row(self, key):
+        row = self.connection.execute('SELECT {} FROM recordings WHERE path = ?'.format(', '.join(COLUMN_NAMES)),
+                                      (key,)).fetchone()
+        return dict(zip(COLUMN_NAMES, row)) if row is not None else None
+
+    def keys(self):
+        return {key for key, in self.connection.execute('SELECT path FROM recordings')}
+
+    # rows of all recordings matching every given filter as dicts, ordered by user, gesture and datetime,
+    # since and until are datetimes or iso strings, durations are seconds
+    def rows(self, user=None, gesture=None, since=None, until=None, min_duration=None, max_duration=None):
+        conditions, parameters = [], []
+        for condition, value in (('user = ?', user), ('gesture = ?', gesture), ('datetime >= ?', since),
+                                 ('datetime < ?', until), ('duration >= ?', min_duration),
+                                 ('duration <= ?', max_duration)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+
+        statement = 'SELECT {} FROM recordings'.format(', '.join(COLUMN_NAMES))
+        if conditions:
+            statement += ' WHERE ' + ' AND '.join(conditions)
+        statement += ' ORDER BY user, gesture, datetime'
+
+        return [dict(zip(COLUMN_NAMES, row)) for row in self.connection.execute(statement, parameters)]
+
+    # absolute paths of all recordings matching the filters, see rows
+    def query(self, **filters):
+        return [os.path.join(self.convertedPath, *row['path'].split('/')) for row in self.rows(**filters)]
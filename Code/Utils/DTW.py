@@ -0,0 +1,220 @@
+import os
+import numpy as np
+from multiprocessing import Pool
+from numpy.lib.stride_tricks import sliding_window_view
+
+from Utils import ArrayDataset
+from Utils.Interpolation import repair_timestamps
+from Utils.Segmentation import moving_average, samples_per_window
+
+STREAM_COLUMNS = dict(ArrayDataset.ARRAY_STREAMS)
+DEFAULT_STREAMS = ('emg', 'accelerometer', 'gyro')
+
+# every recording is resampled to this many points, so all sequences share one length and one band
+DEFAULT_LENGTH = 128
+# width of the Sakoe-Chiba band as fraction of the sequence length
+DEFAULT_BAND = 0.1
+# EMG is compared by its moving RMS, raw EMG samples hardly ever line up between two recordings
+EMG_ENVELOPE_MS = 100
+# candidates compared against a query at once
+BATCH_SIZE = 512
+
+
+# (length, channels) sequence of a recording, the streams are resampled onto the time they all cover and every
+# channel is z-normalized, so recordings of different duration and offset can be compared
+# recorded timestamps may repeat or arrive out of order, they are repaired first since np.interp needs them increasing
+def prepare_sequence(gesture_dict, length=DEFAULT_LENGTH, streams=DEFAULT_STREAMS):
+    stream_data = {}
+    for stream in streams:
+        order, timestamps = repair_timestamps(gesture_dict[stream]['timestamps'])
+        values = np.column_stack([np.asarray(gesture_dict[stream][column], dtype=np.float64)[order]
+                                  for column in STREAM_COLUMNS[stream]])
+        stream_data[stream] = (timestamps, values)
+    start = max(timestamps[0] for timestamps, _ in stream_data.values())
+    end = min(timestamps[-1] for timestamps, _ in stream_data.values())
+    grid = np.linspace(start, end, length) if end > start else np.full(length, float(start))
+
+    channels = []
+    for stream in streams:
+        timestamps, values = stream_data[stream]
+        if stream == 'emg':
+            values = np.sqrt(moving_average(np.square(values), samples_per_window(timestamps, EMG_ENVELOPE_MS)))
+        channels.extend(np.interp(grid, timestamps, values[:, c]) for c in range(values.shape[1]))
+
+    sequence = np.column_stack(channels)
+    deviation = sequence.std(axis=0)
+    return (sequence - sequence.mean(axis=0)) / np.where(deviation > 0, deviation, 1.0)
+
+
+def band_width(length, band):
+    return max(1, int(round(band * length)))
+
+
+# lower and upper envelope of (count, length, channels) sequences, the minimum/maximum over +-width points
+def envelopes(sequences, width):
+    lower = np.pad(sequences, ((0, 0), (width, width), (0, 0)), constant_values=np.inf)
+    upper = np.pad(sequences, ((0, 0), (width, width), (0, 0)), constant_values=-np.inf)
+    return (sliding_window_view(lower, 2 * width + 1, axis=1).min(axis=-1),
+            sliding_window_view(upper, 2 * width + 1, axis=1).max(axis=-1))
+
+
+# LB_Keogh of a query against the envelopes of all candidates, per query point: (candidates, length)
+# every point of the query is matched to at least one candidate point inside the band, so summing these gives a lower
+# bound of the squared DTW distance
+def lb_keogh_points(query, lower, upper):
+    above = np.maximum(query - upper, 0.0)
+    below = np.maximum(lower - query, 0.0)
+    return np.sum(np.square(above) + np.square(below), axis=-1)
+
+
+# squared euclidean distances between every query point and the candidate points within +-width of it,
+# returns (count, length, 2 * width + 1) where [:, i, k] belongs to candidate point i - width + k, points outside of
+# the candidate are nan
+def band_costs(query, candidates, width):
+    count, length, channels = candidates.shape
+    padded = np.pad(candidates, ((0, 0), (width, width), (0, 0)))
+    # (count, length, channels, 2 * width + 1) view, every query point gets the points of its band
+    band = sliding_window_view(padded, 2 * width + 1, axis=1)
+
+    query_points = query[:, :, np.newaxis, :] if query.ndim == 3 else query[np.newaxis, :, np.newaxis, :]
+    products = np.matmul(query_points, band)[:, :, 0, :]
+    squares = sliding_window_view(np.sum(np.square(padded), axis=-1), 2 * width + 1, axis=1)
+    costs = np.maximum(np.sum(np.square(query), axis=-1)[..., np.newaxis] + squares - 2.0 * products, 0.0)
+
+    offsets = np.arange(length)[:, np.newaxis] - width + np.arange(2 * width + 1)
+    costs[:, (offsets < 0) | (offsets >= length)] = np.nan
+    return costs
+
+
+# squared DTW distances between query (length, channels) and candidates (count, length, channels) in a Sakoe-Chiba
+# band of +-width points, the cost of a cell is the squared euclidean distance of the two points
+# query may also be (count, length, channels), then every candidate is compared with its own query
+#
+# all candidates advance row by row together, a row only holds the 2 * width + 1 cells of the band, cell k of row i
+# belongs to j = i - width + k, so D[i-1, j-1] and D[i-1, j] are cells k and k + 1 of the previous row
+# within a row the recursion D[i, j] = c[i, j] + min(D[i-1, j-1], D[i-1, j], D[i, j-1]) is solved with a cumulative
+# minimum: with t[j] = c[i, j] + min(D[i-1, j-1], D[i-1, j]) and C the cumulative cost of row i,
+# D[i, j] = C[j] + min(t[k] - C[k]) over k <= j
+#
+# abandon: candidates whose partial distance plus the lower bound of the remaining rows (lb_tail, (count, length))
+# exceeds it are dropped and get inf
+def dtw_batch(query, candidates, width, abandon=np.inf, lb_tail=None):
+    count, length = candidates.shape[:2]
+    distances = np.full(count, np.inf)
+    active = np.arange(count)
+    costs = band_costs(query, candidates, width)
+
+    # row -1 holds D[-1, -1] = 0 in cell width, one more cell of inf closes every row
+    previous = np.full((count, 2 * width + 2), np.inf)
+    previous[:, width] = 0.0
+    for i in range(length):
+        cost = costs[active, i]
+        outside = np.isnan(cost)
+        cost = np.where(outside, 0.0, cost)
+        step = np.where(outside, np.inf, cost + np.minimum(previous[:, :-1], previous[:, 1:]))
+
+        cumulative = np.cumsum(cost, axis=1)
+        current = np.full((len(active), 2 * width + 2), np.inf)
+        current[:, :-1] = cumulative + np.minimum.accumulate(step - cumulative, axis=1)
+
+        if abandon < np.inf:
+            bound = current.min(axis=1)
+            if lb_tail is not None and i + 1 < length:
+                bound = bound + lb_tail[active, i + 1]
+            alive = bound <= abandon
+            if not alive.all():
+                active, current = active[alive], current[alive]
+                if len(active) == 0:
+                    return distances
+        previous = current
+
+    distances[active] = previous[:, width]
+    return distances
+
+
+# sequences of many recordings with their envelopes, answers k nearest neighbour and distance matrix queries
+class DTWIndex:
+
+    def __init__(self, sequences, band=DEFAULT_BAND):
+        self.sequences = np.ascontiguousarray(sequences, dtype=np.float64)
+        self.band = band
+        self.width = band_width(self.sequences.shape[1], band)
+        self.lower, self.upper = envelopes(self.sequences, self.width)
+
+        self.dtwCount = 0
+        self.prunedCount = 0
+
+    def __len__(self):
+        return len(self.sequences)
+
+    # the k nearest sequences to query, returns [(distance, index)] ordered by distance
+    # candidates are visited in order of their LB_Keogh, the ones whose lower bound exceeds the k-th best distance
+    # found so far are never compared, the others are abandoned as soon as they exceed it
+    def knn(self, query, k=5, exclude=None):
+        query = np.asarray(query, dtype=np.float64)
+        lb_points = lb_keogh_points(query, self.lower, self.upper)
+        lower_bounds = lb_points.sum(axis=1)
+        # lower bound of the rows after row i, used for early abandoning
+        lb_tail = np.cumsum(lb_points[:, ::-1], axis=1)[:, ::-1]
+
+        order = np.argsort(lower_bounds, kind='stable')
+        if exclude is not None:
+            order = order[order != exclude]
+
+        # the k candidates with the lowest bounds come first, their distances are the threshold for all others
+        best = []
+        starts = [0] + list(range(k, len(order), BATCH_SIZE))
+        for batch_start, batch_end in zip(starts, starts[1:] + [len(order)]):
+            threshold = best[-1][0] if len(best) >= k else np.inf
+            batch = order[batch_start:batch_end]
+            batch = batch[lower_bounds[batch] <= threshold]
+            self.prunedCount += batch_end - batch_start - len(batch)
+            if len(batch) == 0:
+                # the candidates are sorted by their lower bound, none of the remaining ones can be closer
+                self.prunedCount += len(order) - batch_end
+                break
+
+            distances = dtw_batch(query, self.sequences[batch], self.width, threshold, lb_tail[batch])
+            self.dtwCount += len(batch)
+            best = sorted(best + [(distance, index) for distance, index in zip(distances, batch)
+                                  if distance < np.inf])[:k]
+
+        return [(float(np.sqrt(distance)), int(index)) for distance, index in best]
+
+    # symmetric matrix of the DTW distances between the given sequences (all by default), the pairs are compared in
+    # blocks of BATCH_SIZE, vectorized within a block and split between `workers` processes
+    def distance_matrix(self, indices=None, workers=None):
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        rows, columns = np.triu_indices(len(indices), k=1)
+        blocks = [(start, min(start + BATCH_SIZE, len(rows))) for start in range(0, len(rows), BATCH_SIZE)]
+        workers = min(workers or os.cpu_count() or 1, max(1, len(blocks)))
+
+        matrix = np.zeros((len(indices), len(indices)))
+        initargs = (self.sequences[indices], rows, columns, self.width)
+        if workers > 1:
+            with Pool(workers, initializer=init_matrix_worker, initargs=initargs) as pool:
+                for (start, end), distances in zip(blocks, pool.imap(matrix_block, blocks)):
+                    matrix[rows[start:end], columns[start:end]] = distances
+        else:
+            init_matrix_worker(*initargs)
+            for start, end in blocks:
+                matrix[rows[start:end], columns[start:end]] = matrix_block((start, end))
+
+        self.dtwCount += len(rows)
+        matrix = np.sqrt(matrix)
+        return matrix + matrix.T
+
+
+# sequences and pairs of the distance matrix, set once per worker process instead of being sent with every block
+matrixJob = None
+
+
+def init_matrix_worker(sequences, rows, columns, width):
+    global matrixJob
+    matrixJob = (sequences, rows, columns, width)
+
+
+def matrix_block(block):
+    sequences, rows, columns, width = matrixJob
+    start, end = block
+    return dtw_batch(sequences[rows[start:end]], sequences[columns[start:end]], width)
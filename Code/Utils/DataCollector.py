@@ -1,10 +1,35 @@
 from myo import DeviceListener, StreamEmg, WarmupState, WarmupResult
+import threading
+from time import perf_counter
 from datetime import datetime
 
+from Utils.StreamStats import CollectorStats
+
+# sample rates of the armband in Hz, used to detect missing samples
+EXPECTED_RATES = {'emg': 200, 'orientation': 50, 'accelerometer': 50, 'gyro': 50}
+
+
+# writer and stream stats of one armband
+class DeviceState:
+
+    def __init__(self, name, file_writer, stats, feature_stream=None):
+        self.name = name
+        self.fileWriter = file_writer
+        self.featureStream = feature_stream
+        self.stats = stats
+        self.emgStats = stats['emg']
+        self.orientationStats = stats['orientation']
+        self.accelerometerStats = stats['accelerometer']
+        self.gyroStats = stats['gyro']
+
 
 class DataCollector(DeviceListener):
 
-    def __init__(self, filewriter_instance):
+    # filewriter_instance: a FileWriter shared by all armbands or DeviceWriters with one FileWriter per armband
+    # summary_interval: seconds between two printed one-line stats summaries, None disables them
+    # new_feature_stream: optional function returning a new FeatureStream, every armband gets one which is fed with
+    # its EMG and IMU samples
+    def __init__(self, filewriter_instance, summary_interval=None, new_feature_stream=None):
         self.printedEMG = False
         self.printedACC = False
         self.printedGYR = False
@@ -14,15 +39,27 @@ class DataCollector(DeviceListener):
         self.warmup_complete = False
 
         self.fileWriter = filewriter_instance
+        self.newFeatureStream = new_feature_stream
+
+        self.summaryInterval = summary_interval
+
+        # the stats of the first armband, every further armband gets its own, see __device
+        self.stats = CollectorStats(EXPECTED_RATES, summary_interval)
+        self.devices = {}
+        self.devicesLock = threading.Lock()
 
     def on_pair(self, myo, timestamp, firmware_version):
         print('Myo paired')
+        device = self.__device(myo)
+        device.fileWriter.set_device_info(device.name, str(firmware_version))
 
     def on_unpair(self, myo, timestamp):
         print('Myo unpaired')
 
     def on_connect(self, myo, timestamp, firmware_version):
         print('CONNECTED -- {}: {}'.format(self.__timestamp_to_datetime(timestamp), firmware_version))
+        device = self.__device(myo)
+        device.fileWriter.set_device_info(device.name, str(firmware_version))
 
     def on_disconnect(self, myo, timestamp):
         print('DISCONNECTED -- {}'.format(self.__timestamp_to_datetime(timestamp)))
@@ -51,28 +88,45 @@ class DataCollector(DeviceListener):
         pass
 
     def on_orientation_data(self, myo, timestamp, orientation):
+        callback_start = perf_counter()
+        device = self.__device(myo)
+
         if not self.printedORI:
             self.printedORI = True
             print('ORIENTATION -- {}: {}'.format(self.__timestamp_to_datetime(timestamp), orientation))
 
-        if self.fileWriter.filesOpened:
-            self.fileWriter.write_orientation_data(timestamp, orientation)
+        # the FileWriter decides whether the sample goes into a recording or the pre-roll buffer
+        device.fileWriter.write_orientation_data(timestamp, orientation)
+
+        self.__update_stats(device.stats, device.orientationStats, timestamp, callback_start)
 
     def on_accelerometor_data(self, myo, timestamp, acceleration):
+        callback_start = perf_counter()
+        device = self.__device(myo)
+
         if not self.printedACC:
             self.printedACC = True
             print('ACCELEROMETER -- {}: {}'.format(self.__timestamp_to_datetime(timestamp), acceleration))
 
-        if self.fileWriter.filesOpened:
-            self.fileWriter.write_accelerometer_data(timestamp, acceleration)
+        device.fileWriter.write_accelerometer_data(timestamp, acceleration)
+        if device.featureStream is not None:
+            device.featureStream.add_accelerometer(timestamp, acceleration)
+
+        self.__update_stats(device.stats, device.accelerometerStats, timestamp, callback_start)
 
     def on_gyroscope_data(self, myo, timestamp, gyroscope):
+        callback_start = perf_counter()
+        device = self.__device(myo)
+
         if not self.printedGYR:
             self.printedGYR = True
             print('GYROSCOPE -- {}: {}'.format(self.__timestamp_to_datetime(timestamp), gyroscope))
 
-        if self.fileWriter.filesOpened:
-            self.fileWriter.write_gyro_data(timestamp, gyroscope)
+        device.fileWriter.write_gyro_data(timestamp, gyroscope)
+        if device.featureStream is not None:
+            device.featureStream.add_gyro(timestamp, gyroscope)
+
+        self.__update_stats(device.stats, device.gyroStats, timestamp, callback_start)
 
     def on_rssi(self, myo, timestamp, rssi):
         # print('RSSI -- {}: {}'.format(self.__timestampToDatetime(timestamp), rssi))
@@ -82,20 +136,71 @@ class DataCollector(DeviceListener):
         print('BATTERY -- {}: {}'.format(self.__timestamp_to_datetime(timestamp), level))
 
     def on_emg_data(self, myo, timestamp, emg):
+        callback_start = perf_counter()
+        device = self.__device(myo)
+
         if not self.printedEMG:
             self.printedEMG = True
             print('EMG -- {}: {}'.format(self.__timestamp_to_datetime(timestamp), emg))
 
             # print(datetime.strptime(str_time, '%Y-%m-%d %H:%M:%S.%f'))
 
-        if self.fileWriter.filesOpened:
-            self.fileWriter.write_emg_data(timestamp, emg)
+        device.fileWriter.write_emg_data(timestamp, emg)
+        if device.featureStream is not None:
+            device.featureStream.add_emg(timestamp, emg)
+
+        self.__update_stats(device.stats, device.emgStats, timestamp, callback_start)
 
     def on_warmup_completed(self, myo, timestamp, warmup_result):
         print('WARMUP COMPLETE -- {}: {}'.format(self.__timestamp_to_datetime(timestamp), warmup_result))
         if warmup_result == WarmupResult.success:
             myo.set_stream_emg(StreamEmg.enabled)
 
+    def __update_stats(self, collector_stats, stream_stats, timestamp, callback_start):
+        now = perf_counter()
+        stream_stats.add(timestamp, now - callback_start)
+        collector_stats.print_summary_if_due(now)
+
+    # the hub calls the listener for all connected armbands, every armband is looked up by its myo object,
+    # dict lookups are atomic so the lock is only taken when a new armband shows up
+    def __device(self, myo):
+        key = getattr(myo, 'mac_address', None) or id(myo)
+        device = self.devices.get(key)
+        if device is None:
+            device = self.__add_device(key, myo)
+        return device
+
+    def __add_device(self, key, myo):
+        with self.devicesLock:
+            if key not in self.devices:
+                name = self.__device_name(myo)
+                if self.devices:
+                    stats = CollectorStats(EXPECTED_RATES, self.summaryInterval, name=name)
+                    # the first armband gets its name as soon as there is a second one
+                    for device in self.devices.values():
+                        device.stats.name = device.name
+                else:
+                    stats = self.stats
+                feature_stream = self.newFeatureStream() if self.newFeatureStream is not None else None
+                self.devices[key] = DeviceState(name, self.fileWriter.for_device(key), stats, feature_stream)
+            return self.devices[key]
+
+    def reset_stats(self):
+        self.stats.reset()
+        for device in list(self.devices.values()):
+            device.stats.reset()
+
+    # one summary line per armband
+    def summary_lines(self):
+        devices = list(self.devices.values())
+        if not devices:
+            return [self.stats.summary_line()]
+        return [device.stats.summary_line() for device in devices]
+
+    @staticmethod
+    def __device_name(myo):
+        return str(getattr(myo, 'mac_address', myo))
+
     @staticmethod
     def __timestamp_to_datetime(timestamp):
 
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime
+
+from Utils.FileWriter import FileWriter
+
+
+# one FileWriter per armband, so every armband has its own ring buffer, writer thread and files and the
+# armbands never wait for each other, all of them are opened and closed together with the same start time
+#
+# the writers are created when an armband delivers its first event, the file names are tagged with myo1, myo2, ...
+class DeviceWriters:
+
+    # file_writer_options: keyword arguments for every FileWriter, e.g. backend or async_writing
+    def __init__(self, storage_path=None, **file_writer_options):
+        self.fileWriterOptions = file_writer_options
+        self.storagePath = storage_path
+
+        self.writers = {}
+        self.lock = threading.Lock()
+
+        self.filesOpened = False
+        self.userLabel = None
+        self.gestureLabel = None
+        self.startTime = None
+
+    # dict lookups are atomic, so only adding a new armband takes the lock
+    def for_device(self, device_key):
+        writer = self.writers.get(device_key)
+        if writer is None:
+            writer = self.__add_device(device_key)
+        return writer
+
+    def __add_device(self, device_key):
+        with self.lock:
+            if device_key not in self.writers:
+                writer = FileWriter(device_tag='myo{}'.format(len(self.writers) + 1), **self.fileWriterOptions)
+                if self.storagePath is not None:
+                    writer.storagePath = self.storagePath
+                writer.set_labels(self.userLabel, self.gestureLabel)
+
+                # an armband that connects during a recording joins it
+                if self.filesOpened:
+                    writer.open_files(self.userLabel, self.gestureLabel, self.startTime)
+
+                self.writers[device_key] = writer
+            return self.writers[device_key]
+
+    def set_labels(self, user_path, gesture_path):
+        self.userLabel = user_path
+        self.gestureLabel = gesture_path
+        for writer in list(self.writers.values()):
+            writer.set_labels(user_path, gesture_path)
+
+    def open_files(self, user_path=None, gesture_path=None):
+        if user_path is None or gesture_path is None:
+            user_path, gesture_path = self.userLabel, self.gestureLabel
+        if user_path is None or gesture_path is None:
+            user_path, gesture_path = input('Please provide name and gesture (e.g: Alice Fist)\n').split()
+
+        with self.lock:
+            self.userLabel = user_path
+            self.gestureLabel = gesture_path
+            self.startTime = datetime.now()
+
+            for writer in self.writers.values():
+                writer.open_files(user_path, gesture_path, self.startTime)
+            self.filesOpened = True
+
+    def close_files(self):
+        with self.lock:
+            self.filesOpened = False
+            for writer in self.writers.values():
+                if writer.filesOpened:
+                    writer.close_files()
+
+    @property
+    def overflowCount(self):
+        return sum(writer.overflowCount for writer in list(self.writers.values()))
+
+    @property
+    def backPressureCount(self):
+        return sum(writer.backPressureCount for writer in list(self.writers.values()))
@@ -0,0 +1,204 @@
+import os
+import json
+import hashlib
+import numpy as np
+from multiprocessing import Pool
+from numpy.lib.stride_tricks import sliding_window_view
+
+from Utils import ArrayDataset, FeatureStream
+from Utils.Interpolation import repair_timestamps
+from Utils.Segmentation import samples_per_window
+
+# sample rates of the armband in Hz, used for streams too short to measure their rate
+STREAM_RATES = {'emg': 200, 'accelerometer': 50, 'gyro': 50}
+STREAM_COLUMNS = {stream: columns for stream, columns in ArrayDataset.ARRAY_STREAMS if stream in STREAM_RATES}
+
+# time domain features as in FeatureStream followed by the variance and two spectral features:
+# mnf - mean frequency and mdf - median frequency of the power spectrum of a window
+FEATURE_NAMES = FeatureStream.FEATURE_NAMES + ('var', 'mnf', 'mdf')
+
+DEFAULT_PARAMETERS = {'window_ms': 200, 'hop_ms': 50, 'threshold': 0, 'streams': ('emg', 'accelerometer', 'gyro')}
+
+# version of the feature computation, part of every cache key
+FEATURE_VERSION = 2
+
+
+# features of every window of `window` samples, taken every `hop` samples, or only of the windows starting at the
+# samples `starts` if given
+# values: (samples, channels), returns (windows, channels * len(FEATURE_NAMES)) in the order channel after channel
+def window_features(values, window, hop, rate, threshold=0, starts=None):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        return np.empty((0, values.shape[1] * len(FEATURE_NAMES)))
+
+    # (windows, channels, window) view onto values, only the selected windows are copied
+    windows = sliding_window_view(values, window, axis=0)
+    windows = windows[::hop] if starts is None else windows[starts]
+    steps = np.diff(windows, axis=-1)
+
+    features = np.empty(windows.shape[:2] + (len(FEATURE_NAMES),))
+    features[..., 0] = np.sqrt(np.mean(np.square(windows), axis=-1))
+    features[..., 1] = np.mean(np.abs(windows), axis=-1)
+    features[..., 2] = np.sum(np.abs(steps), axis=-1)
+    features[..., 3] = np.count_nonzero(((windows[..., :-1] >= 0) != (windows[..., 1:] >= 0)) &
+                                        (np.abs(steps) >= threshold), axis=-1)
+    features[..., 4] = np.count_nonzero(-steps[..., :-1] * steps[..., 1:] > threshold, axis=-1)
+    features[..., 5] = np.var(windows, axis=-1)
+
+    power = np.square(np.abs(np.fft.rfft(windows - windows.mean(axis=-1, keepdims=True), axis=-1)))
+    frequencies = np.fft.rfftfreq(window, 1.0 / rate)
+    total = power.sum(axis=-1)
+    safe_total = np.where(total > 0, total, 1.0)
+    features[..., 6] = (power @ frequencies) / safe_total
+    cumulative = np.cumsum(power, axis=-1)
+    median_index = np.argmax(cumulative >= 0.5 * cumulative[..., -1:], axis=-1)
+    features[..., 7] = np.where(total > 0, frequencies[median_index], 0.0)
+
+    return features.reshape(len(windows), -1)
+
+
+def feature_names(parameters):
+    return ['{}_{}_{}'.format(stream, column, name) for stream in parameters['streams']
+            for column in STREAM_COLUMNS[stream] for name in FEATURE_NAMES]
+
+
+# samples per second of a stream from its timestamps, converted recordings may be interpolated onto any grid,
+# the rate of the armband if there are too few samples to tell
+def sample_rate(timestamps, stream):
+    span = int(timestamps[-1]) - int(timestamps[0]) if len(timestamps) >= 2 else 0
+    return (len(timestamps) - 1) * 1_000_000 / span if span > 0 else STREAM_RATES[stream]
+
+
+# timestamps and (samples, channels) values of a stream, sorted and without duplicate timestamps
+def stream_values(gesture_dict, stream):
+    order, timestamps = repair_timestamps(gesture_dict[stream]['timestamps'])
+    return timestamps, np.column_stack([np.asarray(gesture_dict[stream][column])[order]
+                                        for column in STREAM_COLUMNS[stream]])
+
+
+# features of a converted recording, the windows of all streams cover the same time as the EMG windows,
+# window and hop lengths are turned into samples with the rate of every stream, so recorded and interpolated
+# recordings give the same windows, returns (end timestamps of the windows, (windows, features))
+def recording_features(gesture_dict, parameters):
+    parameters = dict(DEFAULT_PARAMETERS, **parameters)
+    emg_timestamps = stream_values(gesture_dict, 'emg')[0]
+    emg_window = max(3, samples_per_window(emg_timestamps, parameters['window_ms']))
+    emg_hop = samples_per_window(emg_timestamps, parameters['hop_ms'])
+
+    window_count = max(0, (len(emg_timestamps) - emg_window) // emg_hop + 1)
+    timestamps = emg_timestamps[emg_window - 1::emg_hop][:window_count]
+
+    blocks = []
+    for stream in parameters['streams']:
+        stream_timestamps, values = stream_values(gesture_dict, stream)
+        rate = sample_rate(stream_timestamps, stream)
+        window = max(3, samples_per_window(stream_timestamps, parameters['window_ms']))
+
+        if stream == 'emg':
+            blocks.append(window_features(values, window, emg_hop, rate, parameters['threshold'])[:window_count])
+            continue
+
+        # the last window of the stream which ended before the EMG window ended, the first one before that,
+        # only these windows are computed
+        stream_ends = stream_timestamps[window - 1:]
+        if len(stream_ends) == 0:
+            blocks.append(np.zeros((window_count, values.shape[1] * len(FEATURE_NAMES))))
+            continue
+        index = np.clip(np.searchsorted(stream_ends, timestamps, side='right') - 1, 0, len(stream_ends) - 1)
+        blocks.append(window_features(values, window, 1, rate, parameters['threshold'], index))
+
+    return timestamps, np.hstack(blocks) if blocks else np.empty((window_count, 0))
+
+
+# key of the features of a recording: the file identity (path, size, modification time) and the parameters
+def cache_key(path, parameters):
+    stat = os.stat(path)
+    identity = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'parameters': dict(DEFAULT_PARAMETERS, **parameters), 'version': FEATURE_VERSION}
+    return hashlib.sha1(json.dumps(identity, sort_keys=True, default=list).encode()).hexdigest()
+
+
+# features on disk, one .npz per recording and parameter set, the least recently used files are removed once the
+# cache takes more than max_bytes
+class FeatureCache:
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.maxBytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    # returns (timestamps, features) or None
+    def get(self, key):
+        path = self.__path(key)
+        try:
+            with np.load(path) as cached:
+                result = cached['timestamps'], cached['features']
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # the modification time marks the last use
+        os.utime(path)
+        return result
+
+    # written to a temporary file first, so processes filling the cache at the same time never see half a file
+    def put(self, key, timestamps, features):
+        path = self.__path(key)
+        temporary_path = '{}.{}.tmp.npz'.format(path[:-len('.npz')], os.getpid())
+        np.savez(temporary_path, timestamps=timestamps, features=features)
+        os.replace(temporary_path, path)
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz') and '.tmp' not in name:
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                os.remove(os.path.join(self.directory, name))
+
+
+# job: (path, parameters, cache directory or None), returns (path, timestamps, features, cache hit)
+def extract_recording(job):
+    path, parameters, cache_directory = job
+    cache = FeatureCache(cache_directory) if cache_directory is not None else None
+
+    key = cache_key(path, parameters) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return path, cached[0], cached[1], True
+
+    timestamps, features = recording_features(ArrayDataset.load_converted(path), parameters)
+    if cache is not None:
+        cache.put(key, timestamps, features)
+    return path, timestamps, features, False
+
+
+# features of all recordings on `workers` processes, returns [(path, timestamps, features, cache hit)] in the order
+# of paths, cache: FeatureCache or None, it is trimmed to its size once all recordings are done
+def extract_features(paths, parameters=None, workers=None, cache=None):
+    parameters = dict(DEFAULT_PARAMETERS, **(parameters or {}))
+    jobs = [(path, parameters, cache.directory if cache is not None else None) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(jobs)))
+
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.map(extract_recording, jobs, chunksize=1)
+    else:
+        results = [extract_recording(job) for job in jobs]
+
+    if cache is not None:
+        cache.evict()
+    return results
@@ -0,0 +1,163 @@
+from time import perf_counter
+
+FEATURE_NAMES = ('rms', 'mav', 'wl', 'zc', 'ssc')
+
+# float sums are recomputed from the window after this many samples, so rounding errors cannot pile up
+RESYNC_INTERVAL = 4096
+
+
+# running time domain features over the last `window` samples of `channel_count` channels, every sample costs
+# O(channels) no matter how long the window is:
+# rms - root mean square, mav - mean absolute value, wl - waveform length,
+# zc - zero crossings and ssc - slope sign changes, both ignoring steps smaller than threshold
+class SlidingWindowFeatures:
+
+    def __init__(self, channel_count, window, hop, threshold=0):
+        self.channelCount = channel_count
+        self.window = window
+        self.hop = hop
+        self.threshold = threshold
+
+        # ring of the last `window` samples, the slots are allocated once and overwritten in place
+        self.samples = [[0] * channel_count for _ in range(window)]
+        self.position = 0
+        self.count = 0
+        self.sinceResync = 0
+
+        self.sumSquares = [0] * channel_count
+        self.sumAbs = [0] * channel_count
+        self.waveformLength = [0] * channel_count
+        self.zeroCrossings = [0] * channel_count
+        self.slopeSignChanges = [0] * channel_count
+
+        # features of the last complete hop, channel after channel in the order of FEATURE_NAMES
+        self.features = [0.0] * (channel_count * len(FEATURE_NAMES))
+
+    def __zero_crossing(self, a, b):
+        return 1 if (a >= 0) != (b >= 0) and abs(a - b) >= self.threshold else 0
+
+    def __slope_sign_change(self, a, b, c):
+        return 1 if (b - a) * (b - c) > self.threshold else 0
+
+    def __slot(self, age):
+        # age 0 is the newest sample in the ring, window - 1 the oldest
+        return self.samples[(self.position - 1 - age) % self.window]
+
+    # returns True if a hop was completed and self.features has been updated
+    def add(self, sample):
+        channels = range(self.channelCount)
+        full = self.count >= self.window
+
+        if full:
+            oldest = self.__slot(self.window - 1)
+            second = self.__slot(self.window - 2)
+            third = self.__slot(self.window - 3) if self.window > 2 else None
+            for c in channels:
+                old = oldest[c]
+                self.sumSquares[c] -= old * old
+                self.sumAbs[c] -= abs(old)
+                self.waveformLength[c] -= abs(second[c] - old)
+                self.zeroCrossings[c] -= self.__zero_crossing(old, second[c])
+                if third is not None:
+                    self.slopeSignChanges[c] -= self.__slope_sign_change(old, second[c], third[c])
+
+        previous = self.__slot(0) if self.count >= 1 else None
+        before_previous = self.__slot(1) if self.count >= 2 else None
+
+        # the slot of the oldest sample is reused for the new one
+        slot = self.samples[self.position]
+        for c in channels:
+            value = sample[c]
+            self.sumSquares[c] += value * value
+            self.sumAbs[c] += abs(value)
+            if previous is not None:
+                self.waveformLength[c] += abs(value - previous[c])
+                self.zeroCrossings[c] += self.__zero_crossing(previous[c], value)
+                if before_previous is not None:
+                    self.slopeSignChanges[c] += self.__slope_sign_change(before_previous[c], previous[c], value)
+            slot[c] = value
+
+        self.position = (self.position + 1) % self.window
+        self.count += 1
+
+        self.sinceResync += 1
+        if self.sinceResync >= RESYNC_INTERVAL:
+            self.resync()
+
+        if self.count >= self.window and (self.count - self.window) % self.hop == 0:
+            self.__update_features()
+            return True
+        return False
+
+    # recomputes all running sums from the samples in the window
+    def resync(self):
+        self.sinceResync = 0
+        length = min(self.count, self.window)
+        ordered = [self.__slot(age) for age in range(length - 1, -1, -1)]
+
+        for c in range(self.channelCount):
+            values = [slot[c] for slot in ordered]
+            self.sumSquares[c] = sum(value * value for value in values)
+            self.sumAbs[c] = sum(abs(value) for value in values)
+            self.waveformLength[c] = sum(abs(b - a) for a, b in zip(values, values[1:]))
+            self.zeroCrossings[c] = sum(self.__zero_crossing(a, b) for a, b in zip(values, values[1:]))
+            self.slopeSignChanges[c] = sum(self.__slope_sign_change(a, b, d)
+                                           for a, b, d in zip(values, values[1:], values[2:]))
+
+    def __update_features(self):
+        features = self.features
+        feature_count = len(FEATURE_NAMES)
+        for c in range(self.channelCount):
+            offset = c * feature_count
+            features[offset] = (max(self.sumSquares[c], 0) / self.window) ** 0.5
+            features[offset + 1] = self.sumAbs[c] / self.window
+            features[offset + 2] = self.waveformLength[c]
+            features[offset + 3] = self.zeroCrossings[c]
+            features[offset + 4] = self.slopeSignChanges[c]
+
+    def feature_names(self, prefix):
+        return ['{}{}_{}'.format(prefix, c + 1, name) for c in range(self.channelCount) for name in FEATURE_NAMES]
+
+
+# feeds the EMG and IMU samples of the DataCollector into sliding windows of window_ms milliseconds and calls
+# listener(timestamp, feature_vector) every hop_ms milliseconds of EMG data,
+# feature_vector holds the EMG features followed by the latest accelerometer and gyroscope features
+#
+# feature_vector is reused for every hop, listeners have to copy it if they want to keep it
+class FeatureStream:
+
+    def __init__(self, window_ms=200, hop_ms=50, emg_rate=200, imu_rate=50, listener=None):
+        emg_window = max(3, int(window_ms * emg_rate / 1000))
+        imu_window = max(3, int(window_ms * imu_rate / 1000))
+
+        self.emg = SlidingWindowFeatures(8, emg_window, max(1, int(hop_ms * emg_rate / 1000)))
+        self.accelerometer = SlidingWindowFeatures(3, imu_window, max(1, int(hop_ms * imu_rate / 1000)))
+        self.gyro = SlidingWindowFeatures(3, imu_window, max(1, int(hop_ms * imu_rate / 1000)))
+        self.listener = listener
+
+        self.featureNames = (self.emg.feature_names('emg') + self.accelerometer.feature_names('acc') +
+                             self.gyro.feature_names('gyro'))
+        self.featureVector = [0.0] * len(self.featureNames)
+        self.emgSlice = slice(0, len(self.emg.features))
+        self.accelerometerSlice = slice(self.emgSlice.stop, self.emgSlice.stop + len(self.accelerometer.features))
+        self.gyroSlice = slice(self.accelerometerSlice.stop, len(self.featureNames))
+
+        self.hopCount = 0
+        self.processingTime = 0.0
+
+    def add_emg(self, timestamp, emg):
+        start = perf_counter()
+        if self.emg.add(emg):
+            self.featureVector[self.emgSlice] = self.emg.features
+            self.hopCount += 1
+            if self.listener is not None:
+                self.listener(timestamp, self.featureVector)
+        self.processingTime += perf_counter() - start
+
+    def add_accelerometer(self, timestamp, acceleration):
+        if self.accelerometer.add((acceleration.x, acceleration.y, acceleration.z)):
+            self.featureVector[self.accelerometerSlice] = self.accelerometer.features
+
+    def add_gyro(self, timestamp, gyroscope):
+        if self.gyro.add((gyroscope.x, gyroscope.y, gyroscope.z)):
+            self.featureVector[self.gyroSlice] = self.gyro.features
@@ -1,33 +1,71 @@
 import os
 import re
 import sys
-import csv
-import math
+import threading
 from datetime import datetime
 
+from Utils.RingBuffer import RingBuffer
+from Utils.WriterBackends import BACKENDS, EMG, GYRO, ORIENTATION, ACCELEROMETER
+
+# samples per second of all streams together, used to size the pre-roll buffer
+TOTAL_SAMPLE_RATE = 350
+
 
 class FileWriter:
 
-    def __init__(self):
+    # backend: 'csv', 'binary', 'session' or an instance providing open, write_row, write_rows and close
+    # async_writing: callbacks only push raw tuples into a ring buffer which is written by a background thread
+    # flush_interval: seconds between two batches written by the background thread
+    # block_timeout: seconds a callback waits for free space if the buffer is full, 0 drops the sample at once
+    # pre_roll: milliseconds of data before open_files that are kept in memory and written to the new recording
+    # device_tag: appended to the file names, so the recordings of several armbands do not collide
+    def __init__(self, backend='csv', async_writing=False, buffer_capacity=16384, flush_interval=0.25,
+                 block_timeout=0.0, pre_roll=0, device_tag=None):
         self.filesOpened = False
+        self.deviceTag = device_tag
+
+        self.backend = BACKENDS[backend]() if isinstance(backend, str) else backend
+
+        self.asyncWriting = async_writing
+        self.flushInterval = flush_interval
+        self.blockTimeout = block_timeout
+        self.ringBuffer = RingBuffer(buffer_capacity) if async_writing else None
+        self.writerThread = None
+        self.stopWriter = threading.Event()
+        # exception which stopped the background thread, reported by close_files
+        self.writerError = None
+
+        # samples arriving while no recording is open are kept here, the lock guards opening a recording
+        self.preRoll = pre_roll
+        self.preRollBuffer = RingBuffer(int(2 * TOTAL_SAMPLE_RATE * pre_roll / 1000) + 64) if pre_roll > 0 else None
+        self.preRollLock = threading.Lock()
+
+        # name and gesture used by open_files if none are given
+        self.userLabel = None
+        self.gestureLabel = None
 
         self.storagePath = os.path.join(os.path.dirname(sys.path[0]), 'Data', 'raw')
 
-        # prepare variables for file objects to write data on disk
-        self.emgFile = None
-        self.emgFileWriter = None
-        self.gyroFile = None
-        self.gyroFileWriter = None
-        self.orientationFile = None
-        self.orientationFileWriter = None
-        self.orientationEulerFile = None
-        self.orientationEulerFileWriter = None
-        self.accelerometerFile = None
-        self.accelerometerFileWriter = None
-
-    # open files and prepare them for writing
-    def open_files(self):
-        user_path, gesture_path = input('Please provide name and gesture (e.g: Alice Fist)\n').split()
+        # stored with every recording by backends that support metadata
+        self.deviceInfo = {'device': None, 'firmware': None}
+        self.metadata = None
+
+    # labels for the next recordings, so open_files does not have to ask for them
+    def set_labels(self, user_path, gesture_path):
+        self.userLabel = user_path
+        self.gestureLabel = gesture_path
+
+    # a FileWriter serves all armbands, see DeviceWriters for one FileWriter per armband
+    def for_device(self, device_key):
+        return self
+
+    # open files and prepare them for writing, asks for name and gesture if they are neither given nor set
+    # start_time: datetime used for the file names, recordings of several armbands share it
+    def open_files(self, user_path=None, gesture_path=None, start_time=None):
+        if user_path is None or gesture_path is None:
+            user_path, gesture_path = self.userLabel, self.gestureLabel
+        if user_path is None or gesture_path is None:
+            user_path, gesture_path = input('Please provide name and gesture (e.g: Alice Fist)\n').split()
 
         # sanitize input to match character exceptions for folders
         user_path = re.sub(r'[/\\:*?"<>|]+', '', user_path)
@@ -37,73 +75,179 @@ class FileWriter:
         full_dir_path = os.path.join(self.storagePath, user_path, gesture_path)
         os.makedirs(full_dir_path, exist_ok=True)
 
-        creation_time = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        if start_time is None:
+            start_time = datetime.now()
+        creation_time = start_time.strftime('%Y-%m-%d_%H-%M-%S')
+        if self.deviceTag is not None:
+            creation_time += '_' + self.deviceTag
+        self.metadata = {'user': user_path, 'gesture': gesture_path, 'start_time': start_time.isoformat(),
+                         'created': creation_time, 'device_tag': self.deviceTag}
+        self.metadata.update(self.deviceInfo)
 
         try:
-            self.emgFile = open(os.path.join(full_dir_path, 'emg_' + creation_time + '.csv'),
-                                'a+', newline='')
-            self.emgFileWriter = csv.writer(self.emgFile, delimiter=',')
-            self.emgFileWriter.writerow(['timestamp,emg1,emg2,emg3,emg4,emg5,emg6,emg7,emg8'])
-
-            self.gyroFile = open(os.path.join(full_dir_path, 'gyro_' + creation_time + '.csv'),
-                                 'a+', newline='')
-            self.gyroFileWriter = csv.writer(self.gyroFile, delimiter=',')
-            self.gyroFileWriter.writerow(['timestamp,x,y,z'])
-
-            self.orientationFile = open(os.path.join(full_dir_path, 'orientation_' + creation_time + '.csv'),
-                                        'a+', newline='')
-            self.orientationFileWriter = csv.writer(self.orientationFile, delimiter=',')
-            self.orientationFileWriter.writerow(['timestamp,x,y,z,w'])
-
-            self.orientationEulerFile = open(os.path.join(full_dir_path, 'orientationEuler_' + creation_time + '.csv'),
-                                             'a+', newline='')
-            self.orientationEulerFileWriter = csv.writer(self.orientationEulerFile, delimiter=',')
-            self.orientationEulerFileWriter.writerow(['timestamp,roll,pitch,yaw'])
-
-            self.accelerometerFile = open(os.path.join(full_dir_path, 'accelerometer_' + creation_time + '.csv'),
-                                          'a+', newline='')
-            self.accelerometerFileWriter = csv.writer(self.accelerometerFile, delimiter=',')
-            self.accelerometerFileWriter.writerow(['timestamp,x,y,z'])
-
-            self.filesOpened = True
+            self.backend.open(full_dir_path, creation_time, self.metadata)
+
+            if self.asyncWriting:
+                # samples of callbacks which were still running when the last recording was closed are dropped
+                self.ringBuffer.drain([])
+                self.writerError = None
+                self.stopWriter.clear()
+                self.writerThread = threading.Thread(target=self.__writer_loop, daemon=True)
+                self.writerThread.start()
+
+            with self.preRollLock:
+                if self.preRollBuffer is not None:
+                    self.__flush_pre_roll()
+                self.filesOpened = True
         except IOError:
+            self.backend.close()
             self.filesOpened = False
             print('Could not open file!')
 
     def write_emg_data(self, timestamp, emg):
         if self.filesOpened:
-            self.emgFileWriter.writerow([timestamp] + list(emg))
+            if self.asyncWriting:
+                self.ringBuffer.put((EMG, timestamp, tuple(emg)), self.blockTimeout)
+            else:
+                self.backend.write_row(EMG, (timestamp,) + tuple(emg))
+        elif self.preRollBuffer is not None:
+            self.__buffer_pre_roll((EMG, timestamp, tuple(emg)))
 
     def write_gyro_data(self, timestamp, gyroscope):
         if self.filesOpened:
-            self.gyroFileWriter.writerow([timestamp, gyroscope.x, gyroscope.y, gyroscope.z])
+            if self.asyncWriting:
+                self.ringBuffer.put((GYRO, timestamp, (gyroscope.x, gyroscope.y, gyroscope.z)), self.blockTimeout)
+            else:
+                self.backend.write_row(GYRO, (timestamp, gyroscope.x, gyroscope.y, gyroscope.z))
+        elif self.preRollBuffer is not None:
+            self.__buffer_pre_roll((GYRO, timestamp, (gyroscope.x, gyroscope.y, gyroscope.z)))
 
     def write_orientation_data(self, timestamp, orientation):
         if self.filesOpened:
-            self.orientationFileWriter.writerow([timestamp, orientation.x, orientation.y, orientation.z, orientation.w])
-            self.orientationEulerFileWriter.writerow([timestamp] + list(self.__calculate_roll_pitch_yaw(orientation)))
+            if self.asyncWriting:
+                self.ringBuffer.put((ORIENTATION, timestamp,
+                                     (orientation.x, orientation.y, orientation.z, orientation.w)), self.blockTimeout)
+            else:
+                self.backend.write_row(ORIENTATION, (timestamp, orientation.x, orientation.y, orientation.z,
+                                                     orientation.w))
+        elif self.preRollBuffer is not None:
+            self.__buffer_pre_roll((ORIENTATION, timestamp,
+                                    (orientation.x, orientation.y, orientation.z, orientation.w)))
 
     def write_accelerometer_data(self, timestamp, acceleration):
         if self.filesOpened:
-            self.accelerometerFileWriter.writerow([timestamp, acceleration.x, acceleration.y, acceleration.z])
+            if self.asyncWriting:
+                self.ringBuffer.put((ACCELEROMETER, timestamp, (acceleration.x, acceleration.y, acceleration.z)),
+                                    self.blockTimeout)
+            else:
+                self.backend.write_row(ACCELEROMETER, (timestamp, acceleration.x, acceleration.y, acceleration.z))
+        elif self.preRollBuffer is not None:
+            self.__buffer_pre_roll((ACCELEROMETER, timestamp, (acceleration.x, acceleration.y, acceleration.z)))
 
     def close_files(self):
         self.filesOpened = False
 
-        self.emgFile.close()
-        self.gyroFile.close()
-        self.orientationFile.close()
-        self.orientationEulerFile.close()
-        self.accelerometerFile.close()
-
-    @staticmethod
-    def __calculate_roll_pitch_yaw(quaternion_object):
-        w = quaternion_object.w
-        x = quaternion_object.x
-        y = quaternion_object.y
-        z = quaternion_object.z
-
-        roll = math.atan2(2.0 * (w * x + y * z), 1.0 - 2.0 * (x * x + y * y))
-        pitch = math.asin(max(-1.0, min(1.0, 2.0 * (w * y - z * x))))
-        yaw = math.atan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
-        return roll, pitch, yaw
+        # let the background thread drain everything that is still buffered before closing the files,
+        # samples of callbacks which passed the filesOpened check just before are written afterwards
+        if self.writerThread is not None:
+            self.stopWriter.set()
+            self.writerThread.join()
+            self.writerThread = None
+            if self.writerError is None:
+                self.__write_remaining()
+
+        self.backend.close()
+        if self.writerError is not None:
+            print('Could not write recording {}, the samples since the error are lost: {!r}'.format(
+                self.metadata['created'], self.writerError))
+
+    # called by the DataCollector as soon as the armband is known, updates the metadata of an open recording as well
+    def set_device_info(self, device, firmware):
+        self.deviceInfo = {'device': device, 'firmware': firmware}
+        if self.metadata is not None:
+            self.metadata.update(self.deviceInfo)
+
+    # samples dropped because the ring buffer was full
+    @property
+    def overflowCount(self):
+        return self.ringBuffer.overflowCount if self.asyncWriting else 0
+
+    # callbacks that had to wait for free space in the ring buffer
+    @property
+    def backPressureCount(self):
+        return self.ringBuffer.backPressureCount if self.asyncWriting else 0
+
+    def __buffer_pre_roll(self, sample):
+        with self.preRollLock:
+            if not self.filesOpened:
+                self.preRollBuffer.push(sample)
+                return
+
+        # the recording was opened while this callback was waiting for the lock
+        self.__write_sample(sample, self.blockTimeout)
+
+    def __write_sample(self, sample, block_timeout):
+        stream, timestamp, values = sample
+        if self.asyncWriting:
+            self.ringBuffer.put(sample, block_timeout)
+        else:
+            self.backend.write_row(stream, (timestamp,) + values)
+
+    # writes the buffered samples of the last pre_roll milliseconds into the recording that is being opened
+    def __flush_pre_roll(self):
+        samples = []
+        self.preRollBuffer.drain(samples)
+        if not samples:
+            return
+
+        first_timestamp = max(timestamp for _, timestamp, _ in samples) - self.preRoll * 1_000
+        for sample in samples:
+            if sample[1] >= first_timestamp:
+                # the writer thread is already running, so waiting for free space in the ring buffer is fine here
+                self.__write_sample(sample, max(self.blockTimeout, self.flushInterval))
+
+    # an error of the backend stops the thread, close_files reports it
+    def __writer_loop(self):
+        batch = []
+        try:
+            while True:
+                stopping = self.stopWriter.is_set()
+                if not stopping:
+                    self.ringBuffer.wait(self.flushInterval)
+
+                if self.ringBuffer.drain(batch):
+                    self.__write_batch(batch)
+                    batch.clear()
+                elif stopping:
+                    break
+        except Exception as error:
+            self.writerError = error
+
+    def __write_remaining(self):
+        batch = []
+        try:
+            if self.ringBuffer.drain(batch):
+                self.__write_batch(batch)
+        except Exception as error:
+            self.writerError = error
+
+    def __write_batch(self, batch):
+        emg_rows = []
+        gyro_rows = []
+        orientation_rows = []
+        accelerometer_rows = []
+
+        for stream, timestamp, values in batch:
+            if stream == EMG:
+                emg_rows.append((timestamp,) + values)
+            elif stream == GYRO:
+                gyro_rows.append((timestamp,) + values)
+            elif stream == ORIENTATION:
+                orientation_rows.append((timestamp,) + values)
+            else:
+                accelerometer_rows.append((timestamp,) + values)
+
+        self.backend.write_rows(EMG, emg_rows)
+        self.backend.write_rows(GYRO, gyro_rows)
+        self.backend.write_rows(ORIENTATION, orientation_rows)
+        self.backend.write_rows(ACCELEROMETER, accelerometer_rows)
@@ -0,0 +1,166 @@
+import numpy as np
+from time import perf_counter
+
+from myo import DeviceListener
+
+from Utils.FeatureStream import FeatureStream
+from Utils.HubSimulator import recording_events
+
+
+def save_model(path, classes, mean, std, weights, bias, window_ms, hop_ms):
+    np.savez(path, classes=np.array(classes), mean=mean, std=std, weights=weights, bias=bias,
+             window_ms=window_ms, hop_ms=hop_ms)
+
+
+def load_model(path):
+    with np.load(path) as model:
+        return {key: model[key] for key in model.files}
+
+
+# samples per second the armband sends, FeatureStream sizes its windows for these rates
+ARMBAND_RATES = {'emg': 200, 'orientation': 50, 'accelerometer': 50, 'gyro': 50}
+
+
+# a gesture dict interpolated on a common time grid (it has top-level timestamps, e.g. arrays or pickles converted
+# with --interpolate) resampled to the rates of the armband, NaN samples of streams which were not recorded are
+# dropped, recorded gesture dicts are returned unchanged
+def armband_rates(gesture_dict):
+    if 'timestamps' not in gesture_dict:
+        return gesture_dict
+
+    resampled = {key: value for key, value in gesture_dict.items() if key not in ARMBAND_RATES and key != 'timestamps'}
+    for stream, rate in ARMBAND_RATES.items():
+        data = gesture_dict[stream]
+        columns = [column for column in data if column != 'timestamps']
+        timestamps = np.asarray(data['timestamps'], dtype=np.int64)
+        values = np.column_stack([np.asarray(data[column], dtype=np.float64) for column in columns])
+        valid = np.isfinite(values).all(axis=1)
+        timestamps, values = timestamps[valid], values[valid]
+
+        grid = np.arange(timestamps[0], timestamps[-1] + 1, 1_000_000 // rate) if len(timestamps) else timestamps
+        resampled[stream] = {'timestamps': grid}
+        for index, column in enumerate(columns):
+            resampled[stream][column] = np.interp(grid, timestamps, values[:, index]) if len(grid) else values[:, index]
+    return resampled
+
+
+# replays a converted recording through the same FeatureStream the recognizer uses live,
+# so training and recognition see exactly the same features, returns an array of shape (hops, features)
+# interpolated recordings are resampled to the rates of the armband first
+def extract_features(gesture_dict, window_ms, hop_ms):
+    gesture_dict = armband_rates(gesture_dict)
+    features = []
+    feature_stream = FeatureStream(window_ms, hop_ms, listener=lambda timestamp, vector: features.append(list(vector)))
+
+    for timestamp, stream, sample in recording_events(gesture_dict):
+        if stream == 'emg':
+            feature_stream.add_emg(timestamp, sample)
+        elif stream == 'accelerometer':
+            feature_stream.add_accelerometer(timestamp, sample)
+        elif stream == 'gyro':
+            feature_stream.add_gyro(timestamp, sample)
+
+    return np.array(features, dtype=np.float64).reshape(-1, len(feature_stream.featureNames))
+
+
+# returns a decision callback which prints the recognized gesture whenever it changes
+def change_printer():
+    last_gesture = None
+
+    def print_change(timestamp, gesture, decision_time):
+        nonlocal last_gesture
+        if gesture != last_gesture:
+            last_gesture = gesture
+            print('{} ({:.2f} ms)'.format(gesture, decision_time * 1_000))
+
+    return print_change
+
+
+# classifies the live stream with a linear model trained by Tools/RecognizerTrainer.py
+#
+# every hop of the EMG window produces one decision, all arrays used for it are allocated up front,
+# decision times are measured from the moment on_emg_data receives the sample that closed the window until the
+# decision, the time the sample took from the armband to the callback is not included
+# the windows start over whenever an armband connects, so no window spans two connections, every armband has windows
+# of its own, so the samples of several armbands are never mixed
+class GestureRecognizer(DeviceListener):
+
+    # on_decision: optional callback(timestamp, gesture, decision time in seconds)
+    def __init__(self, model_path, on_decision=None, decision_time_capacity=100_000):
+        model = load_model(model_path)
+
+        self.classes = [str(gesture) for gesture in model['classes']]
+        self.mean = model['mean']
+        self.scale = 1.0 / model['std']
+        self.weights = model['weights']
+        self.bias = model['bias']
+        self.onDecision = on_decision
+
+        self.windowMs = int(model['window_ms'])
+        self.hopMs = int(model['hop_ms'])
+        # FeatureStream of every armband by its mac address, or its myo object if it has none
+        self.featureStreams = {}
+
+        self.features = np.zeros(len(self.mean))
+        self.scores = np.zeros(len(self.classes))
+        self.decisionTimes = np.zeros(decision_time_capacity)
+        self.decisionCount = 0
+        self.lastGesture = None
+        self.windowClosed = 0.0
+
+    def on_connect(self, myo, timestamp, firmware_version):
+        self.featureStreams[self.__device_key(myo)] = FeatureStream(self.windowMs, self.hopMs,
+                                                                    listener=self.__on_features)
+        self.lastGesture = None
+
+    def on_emg_data(self, myo, timestamp, emg):
+        self.windowClosed = perf_counter()
+        self.__feature_stream(myo).add_emg(timestamp, emg)
+
+    def on_accelerometor_data(self, myo, timestamp, acceleration):
+        self.__feature_stream(myo).add_accelerometer(timestamp, acceleration)
+
+    def on_gyroscope_data(self, myo, timestamp, gyroscope):
+        self.__feature_stream(myo).add_gyro(timestamp, gyroscope)
+
+    # armbands which sent data before on_connect get their stream with the first sample
+    def __feature_stream(self, myo):
+        key = self.__device_key(myo)
+        feature_stream = self.featureStreams.get(key)
+        if feature_stream is None:
+            feature_stream = FeatureStream(self.windowMs, self.hopMs, listener=self.__on_features)
+            self.featureStreams[key] = feature_stream
+        return feature_stream
+
+    @staticmethod
+    def __device_key(myo):
+        return getattr(myo, 'mac_address', None) or id(myo)
+
+    def __on_features(self, timestamp, feature_vector):
+        features = self.features
+        features[:] = feature_vector
+        np.subtract(features, self.mean, out=features)
+        np.multiply(features, self.scale, out=features)
+        np.dot(self.weights, features, out=self.scores)
+        np.add(self.scores, self.bias, out=self.scores)
+
+        self.lastGesture = self.classes[int(self.scores.argmax())]
+        decision_time = perf_counter() - self.windowClosed
+        self.decisionTimes[self.decisionCount % len(self.decisionTimes)] = decision_time
+        self.decisionCount += 1
+
+        if self.onDecision is not None:
+            self.onDecision(timestamp, self.lastGesture, decision_time)
+
+    # decision time percentiles in milliseconds over the last decision_time_capacity decisions
+    def decision_time_summary(self):
+        decision_times = self.decisionTimes[:min(self.decisionCount, len(self.decisionTimes))] * 1_000
+        if len(decision_times) == 0:
+            return {'decisions': 0}
+
+        return {
+            'decisions': self.decisionCount,
+            'p50': float(np.percentile(decision_times, 50)),
+            'p99': float(np.percentile(decision_times, 99)),
+            'max': float(decision_times.max()),
+        }
@@ -0,0 +1,238 @@
+import math
+import heapq
+import random
+import threading
+from time import perf_counter, sleep, time
+from collections import namedtuple
+
+from myo import WarmupState, WarmupResult
+
+# stand-ins for the vector and quaternion objects of the myo library
+Vector = namedtuple('Vector', 'x y z')
+Quaternion = namedtuple('Quaternion', 'x y z w')
+
+# sample rates of the real armband in Hz
+DEFAULT_RATES = {'emg': 200, 'orientation': 50, 'accelerometer': 50, 'gyro': 50}
+
+CALLBACKS = {
+    'emg': 'on_emg_data',
+    'orientation': 'on_orientation_data',
+    'accelerometer': 'on_accelerometor_data',
+    'gyro': 'on_gyroscope_data',
+}
+
+# columns of the converted recordings in the order of the sample values
+ORDERED_COLUMNS = {
+    'emg': ('1', '2', '3', '4', '5', '6', '7', '8'),
+    'orientation': ('x', 'y', 'z', 'w'),
+    'accelerometer': ('x', 'y', 'z'),
+    'gyro': ('x', 'y', 'z'),
+}
+
+# samples are taken round robin from a pool, so generating them costs (almost) nothing during a run
+SAMPLE_POOL_SIZE = 1024
+
+
+class SimulatedMyo:
+
+    def __init__(self, mac_address='00-00-00-00-00-00'):
+        self.mac_address = mac_address
+        self.emgStreamState = None
+
+    def set_stream_emg(self, state):
+        self.emgStreamState = state
+
+    def vibrate(self, vibration_type):
+        pass
+
+
+# drop-in replacement for myo.Hub which feeds a DeviceListener with synthetic data
+#
+# rates: samples per second for every stream, may be far above the rates of the real armband
+# duration: seconds of data to generate, None runs until shutdown is called
+# time_scale: 1.0 delivers samples in real time, 2.0 twice as fast, None as fast as possible
+# jitter: standard deviation of the timestamps in microseconds
+# duplicate_probability: chance that a sample reuses the timestamp of the previous one of its stream
+class SimulatedHub:
+
+    def __init__(self, rates=None, duration=None, time_scale=1.0, jitter=200, duplicate_probability=0.05,
+                 seed=None, myo=None):
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        self.duration = duration
+        self.timeScale = time_scale
+        self.jitter = jitter
+        self.duplicateProbability = duplicate_probability
+        self.random = random.Random(seed)
+        self.myo = SimulatedMyo() if myo is None else myo
+
+        self.running = False
+        self.thread = None
+        self.stopEvent = threading.Event()
+
+        # callback execution times in seconds and number of delivered samples per stream
+        self.latencies = {stream: [] for stream in self.rates}
+        self.sampleCounts = {stream: 0 for stream in self.rates}
+        self.elapsed = 0.0
+
+        self.samplePools = self.__create_sample_pools()
+
+    def set_locking_policy(self, locking_policy):
+        pass
+
+    def run(self, duration_ms, listener):
+        self.stopEvent.clear()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, args=(listener,), daemon=True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.stopEvent.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # blocks until all samples of a run with a fixed duration have been delivered
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+
+    def __create_sample_pools(self):
+        pools = {}
+        for stream in self.rates:
+            if stream == 'emg':
+                pools[stream] = [tuple(self.random.randint(-128, 127) for _ in range(8))
+                                 for _ in range(SAMPLE_POOL_SIZE)]
+            elif stream == 'orientation':
+                pools[stream] = [self.__random_quaternion() for _ in range(SAMPLE_POOL_SIZE)]
+            elif stream == 'gyro':
+                pools[stream] = [Vector(*(self.random.uniform(-250.0, 250.0) for _ in range(3)))
+                                 for _ in range(SAMPLE_POOL_SIZE)]
+            else:
+                pools[stream] = [Vector(*(self.random.uniform(-2.0, 2.0) for _ in range(3)))
+                                 for _ in range(SAMPLE_POOL_SIZE)]
+        return pools
+
+    def __random_quaternion(self):
+        x, y, z, w = (self.random.gauss(0.0, 1.0) for _ in range(4))
+        norm = math.sqrt(x * x + y * y + z * z + w * w)
+        return Quaternion(x / norm, y / norm, z / norm, w / norm)
+
+    # overridden by ReplayHub, which delivers recorded instead of synthetic samples
+    def _run(self, listener):
+        start_timestamp = int(time() * 1_000_000)
+
+        listener.on_pair(self.myo, start_timestamp, (1, 5, 1970))
+        listener.on_connect(self.myo, start_timestamp, (1, 5, 1970))
+        listener.on_arm_sync(self.myo, start_timestamp, 'right', 'toward_wrist', 0.0, WarmupState.warm)
+        listener.on_warmup_completed(self.myo, start_timestamp, WarmupResult.success)
+
+        # (next sample time in seconds, stream, sample index), the events of all streams are merged by time
+        schedule = [(0.0, stream, 0) for stream in self.rates]
+        heapq.heapify(schedule)
+        last_timestamps = {stream: start_timestamp for stream in self.rates}
+        callbacks = {stream: getattr(listener, CALLBACKS[stream]) for stream in self.rates}
+
+        start = perf_counter()
+        while schedule and not self.stopEvent.is_set():
+            sample_time, stream, index = heapq.heappop(schedule)
+            if self.duration is not None and sample_time >= self.duration:
+                continue
+
+            if self.timeScale is not None:
+                delay = start + sample_time / self.timeScale - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+
+            if index > 0 and self.random.random() < self.duplicateProbability:
+                timestamp = last_timestamps[stream]
+            else:
+                timestamp = start_timestamp + int(sample_time * 1_000_000 + self.random.gauss(0.0, self.jitter))
+                last_timestamps[stream] = timestamp
+
+            sample = self.samplePools[stream][index % SAMPLE_POOL_SIZE]
+
+            callback_start = perf_counter()
+            callbacks[stream](self.myo, timestamp, sample)
+            self.latencies[stream].append(perf_counter() - callback_start)
+            self.sampleCounts[stream] += 1
+
+            heapq.heappush(schedule, ((index + 1) / self.rates[stream], stream, index + 1))
+
+        self.elapsed = perf_counter() - start
+        listener.on_disconnect(self.myo, start_timestamp + int(self.elapsed * 1_000_000))
+        self.running = False
+
+
+# all samples of a converted recording as (timestamp, stream, sample) in the order in which the hub delivered them
+def recording_events(gesture_dict):
+    events = []
+    for stream_order, stream in enumerate(CALLBACKS):
+        data = gesture_dict[stream]
+        timestamps = [int(timestamp) for timestamp in data['timestamps']]
+
+        # tolist turns numpy values of binary recordings into plain python numbers
+        columns = [list(data[column]) if isinstance(data[column], list) else data[column].tolist()
+                   for column in ORDERED_COLUMNS[stream]]
+        if stream == 'emg':
+            samples = zip(*columns)
+        elif stream == 'orientation':
+            samples = (Quaternion(*values) for values in zip(*columns))
+        else:
+            samples = (Vector(*values) for values in zip(*columns))
+
+        events.extend((timestamp, stream_order, stream, sample) for timestamp, sample in zip(timestamps, samples))
+
+    events.sort(key=lambda event: (event[0], event[1]))
+    return [(timestamp, stream, sample) for timestamp, _, stream, sample in events]
+
+
+# drop-in replacement for myo.Hub which replays converted recordings one after another,
+# time_scale 1.0 keeps the original timing, None replays as fast as possible
+# every recording is replayed as a connection of its own, from on_connect to on_disconnect, so listeners can start
+# over between two recordings
+#
+# currentRecording holds the index of the recording that is being replayed
+class ReplayHub(SimulatedHub):
+
+    def __init__(self, gesture_dicts, time_scale=1.0, myo=None):
+        self.gestureDicts = gesture_dicts
+        self.currentRecording = None
+        super().__init__(rates=DEFAULT_RATES, time_scale=time_scale, myo=myo)
+
+    def _run(self, listener):
+        callbacks = {stream: getattr(listener, CALLBACKS[stream]) for stream in CALLBACKS}
+        start = perf_counter()
+
+        for index, gesture_dict in enumerate(self.gestureDicts):
+            events = recording_events(gesture_dict)
+            if not events:
+                continue
+
+            first_timestamp = events[0][0]
+            if self.currentRecording is None:
+                listener.on_pair(self.myo, first_timestamp, (1, 5, 1970))
+            listener.on_connect(self.myo, first_timestamp, (1, 5, 1970))
+            self.currentRecording = index
+
+            recording_start = perf_counter()
+            for timestamp, stream, sample in events:
+                if self.stopEvent.is_set():
+                    break
+
+                if self.timeScale is not None:
+                    replay_time = (timestamp - first_timestamp) / 1_000_000 / self.timeScale
+                    delay = recording_start + replay_time - perf_counter()
+                    if delay > 0:
+                        sleep(delay)
+
+                callback_start = perf_counter()
+                callbacks[stream](self.myo, timestamp, sample)
+                self.latencies[stream].append(perf_counter() - callback_start)
+                self.sampleCounts[stream] += 1
+
+            listener.on_disconnect(self.myo, timestamp)
+            if self.stopEvent.is_set():
+                break
+
+        self.elapsed = perf_counter() - start
+        self.running = False
@@ -0,0 +1,54 @@
+import numpy as np
+from scipy.interpolate import make_interp_spline, PchipInterpolator
+
+# zoh - zero-order hold, every target timestamp gets the last sample at or before it
+METHODS = ('linear', 'cubic', 'pchip', 'zoh')
+
+
+# makes timestamps strictly increasing, samples are ordered by time (stable, so samples with the same timestamp keep
+# their order) and every timestamp which is not larger than its predecessor is moved to predecessor + 1,
+# returns (order, repaired timestamps), values[order] are the samples belonging to the repaired timestamps
+#
+# t'[i] = max(t[j] - j for j <= i) + i is the smallest strictly increasing sequence with t'[i] >= t[i]
+#
+# after: last repaired timestamp of the previous chunk if a recording is repaired chunk by chunk, all timestamps of
+# this chunk are moved behind it, samples are only reordered within a chunk
+def repair_timestamps(timestamps, after=None):
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    order = np.argsort(timestamps, kind='stable')
+    index = np.arange(len(timestamps), dtype=np.int64)
+
+    repaired = np.maximum.accumulate(timestamps[order] - index)
+    if after is not None:
+        np.maximum(repaired, after + 1, out=repaired)
+    return order, repaired + index
+
+
+# evaluates all channels of a stream on the target timestamps at once
+# timestamps: (samples,) strictly increasing, values: (samples, channels), returns (targets, channels) as float64
+# target timestamps outside of the recorded ones are extrapolated, zero-order hold repeats the first/last sample
+def interpolate(timestamps, values, target_timestamps, method='cubic'):
+    if method not in METHODS:
+        raise ValueError('unknown interpolation method {}, use one of {}'.format(method, ', '.join(METHODS)))
+
+    # microsecond timestamps relative to the first sample keep the float64 arithmetic exact
+    origin = timestamps[0]
+    x = np.asarray(timestamps - origin, dtype=np.float64)
+    target = np.asarray(np.asarray(target_timestamps) - origin, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    if len(x) == 1 or method == 'zoh':
+        index = np.clip(np.searchsorted(x, target, side='right') - 1, 0, len(x) - 1)
+        return values[index]
+
+    # a cubic spline needs at least 4 samples
+    if method == 'cubic' and len(x) >= 4:
+        return make_interp_spline(x, values, k=3, axis=0)(target)
+    if method == 'pchip':
+        return PchipInterpolator(x, values, axis=0, extrapolate=True)(target)
+
+    # linear, the outermost segments are extended for targets outside of the samples
+    index = np.clip(np.searchsorted(x, target, side='right'), 1, len(x) - 1)
+    left, right = x[index - 1], x[index]
+    weight = ((target - left) / (right - left))[:, np.newaxis]
+    return values[index - 1] * (1.0 - weight) + values[index] * weight
@@ -0,0 +1,24 @@
+from myo import DeviceListener
+
+CALLBACK_NAMES = ('on_pair', 'on_unpair', 'on_connect', 'on_disconnect', 'on_arm_sync', 'on_arm_unsync',
+                  'on_unlock', 'on_lock', 'on_pose', 'on_orientation_data', 'on_accelerometor_data',
+                  'on_gyroscope_data', 'on_rssi', 'on_battery_level_received', 'on_emg_data', 'on_warmup_completed')
+
+
+# the hub only takes a single listener, this one hands every event to several listeners in the given order
+class ListenerGroup(DeviceListener):
+
+    def __init__(self, *listeners):
+        self.listeners = listeners
+
+
+def _forward(callback_name):
+    def forward(self, *args):
+        for listener in self.listeners:
+            getattr(listener, callback_name)(*args)
+    forward.__name__ = callback_name
+    return forward
+
+
+for _callback_name in CALLBACK_NAMES:
+    setattr(ListenerGroup, _callback_name, _forward(_callback_name))
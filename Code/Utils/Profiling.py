@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+from time import perf_counter, process_time
+from datetime import datetime
+from contextlib import nullcontext
+
+# instrumentation of the converter, off unless enable() is called, then every stage() and count() of this process
+# is added to the recording which is converted at the moment or, outside of recordings, to the run itself
+# with profiling off both return right away, so the hooks can stay in the converted code
+activeRun = None
+activeRecording = None
+
+NO_STAGE = nullcontext()
+
+
+# peak resident memory of this process or, with children=True, of its largest finished child process,
+# None where the resource module does not exist (Windows), it is only imported when memory is reported, so the
+# converter imports this module on every platform
+def peak_rss_megabytes(children=False):
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / 1_024 ** 2 if sys.platform == 'darwin' else peak / 1_024
+
+
+# wall and cpu time of one stage, added to the stages of a profile when the stage ends
+class StageTimer:
+
+    __slots__ = ('stages', 'name', 'wall', 'cpu')
+
+    def __init__(self, stages, name):
+        self.stages = stages
+        self.name = name
+
+    def __enter__(self):
+        self.wall = perf_counter()
+        self.cpu = process_time()
+        return self
+
+    def __exit__(self, *exception):
+        times = self.stages.setdefault(self.name, [0.0, 0.0, 0])
+        times[0] += perf_counter() - self.wall
+        times[1] += process_time() - self.cpu
+        times[2] += 1
+
+
+# stages as {name: [wall seconds, cpu seconds, calls]} and counters as {name: value}
+class Profile:
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.wallStart = perf_counter()
+        self.cpuStart = process_time()
+
+    def stage_dicts(self):
+        return {name: {'wall_seconds': wall, 'cpu_seconds': cpu, 'calls': calls}
+                for name, (wall, cpu, calls) in sorted(self.stages.items())}
+
+
+class RecordingProfile(Profile):
+
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+
+    # the peak memory is the one of the process which converted the recording up to now, a pooled worker
+    # converts many recordings, so it is not the peak of this recording alone
+    def as_dict(self):
+        return {'key': self.key, 'pid': os.getpid(), 'wall_seconds': perf_counter() - self.wallStart,
+                'cpu_seconds': process_time() - self.cpuStart, 'stages': self.stage_dicts(),
+                'counters': dict(self.counters), 'worker_peak_rss_megabytes': peak_rss_megabytes()}
+
+
+# everything measured during a conversion run, the recordings may have been converted by other processes
+class RunProfile(Profile):
+
+    def __init__(self):
+        super().__init__()
+        self.created = datetime.now().isoformat(timespec='seconds')
+        self.recordings = []
+
+    def add_recording(self, recording_dict):
+        self.recordings.append(recording_dict)
+
+    # totals of all stages and counters of the run and its recordings, the recordings slowest first
+    def report(self, top=10):
+        stages = {name: list(times) for name, times in self.stages.items()}
+        counters = dict(self.counters)
+        for recording in self.recordings:
+            for name, times in recording['stages'].items():
+                total = stages.setdefault(name, [0.0, 0.0, 0])
+                total[0] += times['wall_seconds']
+                total[1] += times['cpu_seconds']
+                total[2] += times['calls']
+            for name, value in recording['counters'].items():
+                counters[name] = counters.get(name, 0) + value
+
+        recordings = sorted(self.recordings, key=lambda recording: recording['wall_seconds'], reverse=True)
+        return {
+            'created': self.created,
+            'wall_seconds': perf_counter() - self.wallStart,
+            'cpu_seconds': process_time() - self.cpuStart + sum(recording['cpu_seconds'] for recording in recordings),
+            'peak_rss_megabytes': {'main': peak_rss_megabytes(), 'workers': peak_rss_megabytes(children=True)},
+            'stages': {name: {'wall_seconds': wall, 'cpu_seconds': cpu, 'calls': calls}
+                       for name, (wall, cpu, calls) in sorted(stages.items(), key=lambda item: -item[1][0])},
+            'counters': counters,
+            'slowest': [recording['key'] for recording in recordings[:top]],
+            'recordings': recordings,
+        }
+
+    def write_report(self, path, top=10):
+        report = self.report(top)
+        with open(path + '.tmp', 'w') as report_file:
+            json.dump(report, report_file, indent=1)
+        os.replace(path + '.tmp', path)
+        return report
+
+
+def summary_lines(report, top=10):
+    counters = report['counters']
+    peaks = [peak for peak in report['peak_rss_megabytes'].values() if peak is not None]
+    lines = ['{} recordings in {:.3f} s wall, {:.3f} s cpu, {} rows, {:.1f} MB read, {:.1f} MB written{}'.format(
+        len(report['recordings']), report['wall_seconds'], report['cpu_seconds'], counters.get('rows', 0),
+        counters.get('bytes_read', 0) / 1_000_000, counters.get('bytes_written', 0) / 1_000_000,
+        ', peak rss {:.0f} MB'.format(max(peaks)) if peaks else '')]
+    for name, times in report['stages'].items():
+        lines.append('  {:<18} {:9.3f} s wall {:9.3f} s cpu {:7d} calls'.format(name, times['wall_seconds'],
+                                                                                 times['cpu_seconds'], times['calls']))
+    if report['recordings']:
+        lines.append('slowest recordings:')
+        for recording in report['recordings'][:top]:
+            lines.append('  {:8.3f} s  {:8.1f} MB  {}'.format(recording['wall_seconds'],
+                                                               recording['counters'].get('bytes_read', 0) / 1_000_000,
+                                                               recording['key']))
+    return lines
+
+
+def enable():
+    global activeRun
+    activeRun = RunProfile()
+    return activeRun
+
+
+def disable():
+    global activeRun
+    run, activeRun = activeRun, None
+    return run
+
+
+def enabled():
+    return activeRun is not None
+
+
+def stage(name):
+    profile = activeRecording if activeRecording is not None else activeRun
+    if profile is None:
+        return NO_STAGE
+    return StageTimer(profile.stages, name)
+
+
+def count(name, value):
+    profile = activeRecording if activeRecording is not None else activeRun
+    if profile is not None:
+        profile.counters[name] = profile.counters.get(name, 0) + value
+
+
+# runs function(*args) as the recording `key`, also in worker processes which never called enable(),
+# returns (result, profile of the recording as dict)
+def profile_recording(key, function, *args):
+    global activeRecording
+    activeRecording = RecordingProfile(key)
+    try:
+        result = function(*args)
+        return result, activeRecording.as_dict()
+    finally:
+        activeRecording = None
@@ -0,0 +1,76 @@
+import threading
+
+
+class RingBuffer:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+        # all slots are allocated once, put/drain only move the indices
+        self.__slots = [None] * capacity
+        self.__head = 0
+        self.__size = 0
+
+        self.__lock = threading.Lock()
+        self.__notEmpty = threading.Condition(self.__lock)
+        self.__notFull = threading.Condition(self.__lock)
+
+        # wake up a waiting consumer early once the buffer is filled up to this level
+        self.wakeupLevel = max(1, capacity // 2)
+
+        self.overflowCount = 0
+        self.backPressureCount = 0
+        self.highWaterMark = 0
+
+    def __len__(self):
+        return self.__size
+
+    # returns False if the item had to be dropped because the buffer was full
+    def put(self, item, block_timeout=0.0):
+        with self.__lock:
+            if self.__size == self.capacity:
+                if block_timeout > 0:
+                    self.backPressureCount += 1
+                    self.__notEmpty.notify()
+                    self.__notFull.wait_for(lambda: self.__size < self.capacity, block_timeout)
+
+                if self.__size == self.capacity:
+                    self.overflowCount += 1
+                    return False
+
+            self.__slots[(self.__head + self.__size) % self.capacity] = item
+            self.__size += 1
+
+            if self.__size > self.highWaterMark:
+                self.highWaterMark = self.__size
+            if self.__size == self.wakeupLevel:
+                self.__notEmpty.notify()
+            return True
+
+    # never blocks or drops the new item, overwrites the oldest one instead if the buffer is full
+    def push(self, item):
+        with self.__lock:
+            self.__slots[(self.__head + self.__size) % self.capacity] = item
+            if self.__size == self.capacity:
+                self.__head = (self.__head + 1) % self.capacity
+            else:
+                self.__size += 1
+
+    # blocks until the wakeup level is reached or the timeout expired
+    def wait(self, timeout):
+        with self.__lock:
+            return self.__notEmpty.wait_for(lambda: self.__size >= self.wakeupLevel, timeout)
+
+    # moves all buffered items into out_list in insertion order
+    def drain(self, out_list):
+        with self.__lock:
+            count = self.__size
+            for i in range(count):
+                index = (self.__head + i) % self.capacity
+                out_list.append(self.__slots[index])
+                self.__slots[index] = None
+
+            self.__head = (self.__head + count) % self.capacity
+            self.__size = 0
+            self.__notFull.notify_all()
+        return count
@@ -0,0 +1,145 @@
+import numpy as np
+
+from Utils.Interpolation import repair_timestamps
+
+# default parameters of the activity detection, durations in milliseconds
+DEFAULT_PARAMETERS = {
+    'window': 150,             # length of the moving RMS / moving mean windows
+    'baseline_percentile': 10, # the quietest part of the recording defines the rest level
+    'on_factor': 3.0,          # activity starts when a signal exceeds on_factor * its rest level
+    'off_factor': 1.5,         # and ends when all signals fall below off_factor * their rest level
+    'emg_threshold': None,     # absolute on thresholds instead of the factors, off scales with off/on_factor
+    'motion_threshold': None,
+    'min_gap': 300,            # pauses shorter than this are bridged
+    'min_duration': 300,       # shorter segments are dropped
+    'padding': 200,            # added before and after every segment, at most up to the middle of the pause to the
+                               # neighbouring segment, so no sample belongs to two segments
+}
+
+
+# moving average of the last `window` values along axis 0, computed with one cumulative sum
+def moving_average(values, window):
+    window = max(1, min(window, len(values)))
+    cumulative = np.cumsum(values, axis=0, dtype=np.float64)
+    result = np.empty_like(cumulative)
+    result[:window] = cumulative[:window] / np.arange(1, window + 1).reshape((-1,) + (1,) * (values.ndim - 1))
+    result[window:] = (cumulative[window:] - cumulative[:-window]) / window
+    return result
+
+
+def samples_per_window(timestamps, window_ms):
+    if len(timestamps) < 2:
+        return 1
+    interval = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+    return max(1, int(round(window_ms * 1_000 / interval))) if interval > 0 else 1
+
+
+# moving RMS of all EMG channels, emg: (samples, channels)
+def emg_envelope(timestamps, emg, window_ms):
+    power = np.mean(np.square(emg, dtype=np.float64), axis=1)
+    return np.sqrt(moving_average(power, samples_per_window(timestamps, window_ms)))
+
+
+# rotation speed plus the deviation of the acceleration from gravity at target_timestamps, both smoothed on the
+# timestamps of their own stream, which may have a sample more or less than the other one,
+# gyro in deg/s and acceleration in g are scaled to comparable ranges
+def motion_energy(target_timestamps, gyro_timestamps, gyro, accelerometer_timestamps, acceleration, window_ms):
+    motion = np.zeros(len(target_timestamps))
+    if len(gyro_timestamps):
+        rotation = moving_average(np.linalg.norm(gyro, axis=1) / 100.0, samples_per_window(gyro_timestamps, window_ms))
+        motion += np.interp(target_timestamps, gyro_timestamps, rotation)
+    if len(accelerometer_timestamps):
+        shaking = moving_average(np.abs(np.linalg.norm(acceleration, axis=1) - 1.0),
+                                 samples_per_window(accelerometer_timestamps, window_ms))
+        motion += np.interp(target_timestamps, accelerometer_timestamps, shaking)
+    return motion
+
+
+# timestamps sorted and without duplicates and the values in the same order
+def repaired_stream(timestamps, values):
+    order, timestamps = repair_timestamps(timestamps)
+    return timestamps, np.asarray(values, dtype=np.float64)[order]
+
+
+# two-threshold switch: on where score >= on, off where score < off, in between the previous state is kept
+def hysteresis(score, on, off):
+    above = score >= on
+    decided = above | (score < off)
+
+    index = np.where(decided, np.arange(len(score)), -1)
+    last_decision = np.maximum.accumulate(index)
+    return np.where(last_decision >= 0, above[np.maximum(last_decision, 0)], False)
+
+
+# (start, end) index pairs of the runs of True in mask, end is exclusive
+def runs(mask):
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def rest_level(signal, percentile):
+    level = np.percentile(signal, percentile) if len(signal) else 0.0
+    return level if level > 0 else (np.mean(signal) if len(signal) and np.mean(signal) > 0 else 1.0)
+
+
+# detects the gestures in a continuous recording, returns a list of (start, end) timestamps in microseconds
+# the recorded timestamps of every stream may repeat or be out of order, they are repaired first, all other samples
+# are mapped onto the EMG timestamps
+def detect_segments(emg_timestamps, emg, gyro_timestamps, gyro, accelerometer_timestamps, acceleration,
+                    **parameters):
+    parameters = dict(DEFAULT_PARAMETERS, **parameters)
+    emg_timestamps, emg = repaired_stream(emg_timestamps, emg)
+    if len(emg_timestamps) == 0:
+        return []
+    gyro_timestamps, gyro = repaired_stream(gyro_timestamps, gyro)
+    accelerometer_timestamps, acceleration = repaired_stream(accelerometer_timestamps, acceleration)
+
+    envelope = emg_envelope(emg_timestamps, emg, parameters['window'])
+    motion = motion_energy(emg_timestamps, gyro_timestamps, gyro, accelerometer_timestamps, acceleration,
+                           parameters['window'])
+
+    # both signals are scaled so that 1.0 is their on threshold
+    off_ratio = parameters['off_factor'] / parameters['on_factor']
+    emg_on = parameters['emg_threshold'] or parameters['on_factor'] * rest_level(envelope,
+                                                                                 parameters['baseline_percentile'])
+    motion_on = parameters['motion_threshold'] or parameters['on_factor'] * rest_level(
+        motion, parameters['baseline_percentile'])
+    score = np.maximum(envelope / emg_on, motion / motion_on)
+
+    starts, ends = runs(hysteresis(score, 1.0, off_ratio))
+    if len(starts) == 0:
+        return []
+    start_times = emg_timestamps[starts]
+    end_times = emg_timestamps[ends - 1]
+
+    # bridge short pauses, a segment continues if the next one starts less than min_gap after it ended
+    gap = parameters['min_gap'] * 1_000
+    new_segment = np.concatenate(([True], start_times[1:] - end_times[:-1] >= gap))
+    start_times = start_times[new_segment]
+    end_times = np.maximum.reduceat(end_times, np.flatnonzero(new_segment))
+
+    keep = end_times - start_times >= parameters['min_duration'] * 1_000
+    start_times, end_times = start_times[keep], end_times[keep]
+
+    # padding reaches at most the middle of the pause to the neighbouring segment, the sample in the middle belongs
+    # to the later segment
+    middles = (end_times[:-1] + start_times[1:]) // 2
+    lower = np.concatenate(([emg_timestamps[0]], middles))
+    upper = np.concatenate((middles - 1, [emg_timestamps[-1]]))
+    padding = parameters['padding'] * 1_000
+    return [(int(max(low, start - padding)), int(min(high, end + padding)))
+            for start, end, low, high in zip(start_times, end_times, lower, upper)]
+
+
+# the part of a gesture dict between start and end (inclusive), the samples of every stream are sorted by their
+# repaired timestamps first, so samples recorded out of order land in the right segment, the recorded timestamps
+# are kept
+def cut_gesture_dict(gesture_dict, start, end, streams):
+    segment = {key: value for key, value in gesture_dict.items() if key not in streams and key != 'timestamps'}
+    for stream in streams:
+        data_dict = gesture_dict[stream]
+        order, timestamps = repair_timestamps(data_dict['timestamps'])
+        first = np.searchsorted(timestamps, start, side='left')
+        last = np.searchsorted(timestamps, end, side='right')
+        segment[stream] = {column: np.asarray(values)[order[first:last]] for column, values in data_dict.items()}
+    return segment
@@ -0,0 +1,129 @@
+from bisect import bisect_left
+from time import perf_counter
+
+# upper bounds of the inter-sample gap histogram bins in microseconds, the last bin counts everything above
+GAP_BINS = (1_000, 2_500, 5_000, 10_000, 20_000, 40_000, 100_000, 1_000_000)
+
+# gaps longer than this many expected sample intervals are counted as dropouts
+DROPOUT_FACTOR = 4
+
+
+class StreamStats:
+
+    def __init__(self, name, expected_rate=None):
+        self.name = name
+        self.expectedRate = expected_rate
+        self.dropoutGap = DROPOUT_FACTOR * 1_000_000 / expected_rate if expected_rate else None
+        self.reset()
+
+    def reset(self):
+        self.sampleCount = 0
+        self.duplicateCount = 0
+        self.outOfOrderCount = 0
+        self.dropoutCount = 0
+        self.firstTimestamp = None
+        self.lastTimestamp = None
+        self.maxGap = 0
+        self.gapHistogram = [0] * (len(GAP_BINS) + 1)
+
+        # execution time of the callbacks in seconds
+        self.callbackTime = 0.0
+        self.maxCallbackTime = 0.0
+
+    def add(self, timestamp, callback_time):
+        last_timestamp = self.lastTimestamp
+        if last_timestamp is None:
+            self.firstTimestamp = timestamp
+        else:
+            gap = timestamp - last_timestamp
+            if gap == 0:
+                self.duplicateCount += 1
+            elif gap < 0:
+                self.outOfOrderCount += 1
+            else:
+                self.gapHistogram[bisect_left(GAP_BINS, gap)] += 1
+                if gap > self.maxGap:
+                    self.maxGap = gap
+                if self.dropoutGap is not None and gap > self.dropoutGap:
+                    self.dropoutCount += 1
+
+        if last_timestamp is None or timestamp > last_timestamp:
+            self.lastTimestamp = timestamp
+
+        self.sampleCount += 1
+        self.callbackTime += callback_time
+        if callback_time > self.maxCallbackTime:
+            self.maxCallbackTime = callback_time
+
+    @property
+    def duration(self):
+        if self.firstTimestamp is None:
+            return 0.0
+        return (self.lastTimestamp - self.firstTimestamp) / 1_000_000
+
+    @property
+    def effectiveRate(self):
+        duration = self.duration
+        return (self.sampleCount - 1) / duration if duration > 0 else 0.0
+
+    # samples that should have arrived at the expected rate but did not
+    @property
+    def missingCount(self):
+        if not self.expectedRate or self.firstTimestamp is None:
+            return 0
+        return max(0, int(self.duration * self.expectedRate) + 1 - self.sampleCount)
+
+    @property
+    def meanCallbackTime(self):
+        return self.callbackTime / self.sampleCount if self.sampleCount else 0.0
+
+    def as_dict(self):
+        return {
+            'samples': self.sampleCount,
+            'rate': self.effectiveRate,
+            'expected_rate': self.expectedRate,
+            'missing': self.missingCount,
+            'duplicates': self.duplicateCount,
+            'out_of_order': self.outOfOrderCount,
+            'dropouts': self.dropoutCount,
+            'max_gap_us': self.maxGap,
+            'gap_histogram': dict(zip([str(upper) for upper in GAP_BINS] + ['inf'], self.gapHistogram)),
+            'mean_callback_us': self.meanCallbackTime * 1_000_000,
+            'max_callback_us': self.maxCallbackTime * 1_000_000,
+        }
+
+    def summary(self):
+        return '{} {:.1f}Hz miss={} dup={} drop={} cb={:.0f}/{:.0f}us'.format(
+            self.name, self.effectiveRate, self.missingCount, self.duplicateCount, self.dropoutCount,
+            self.meanCallbackTime * 1_000_000, self.maxCallbackTime * 1_000_000)
+
+
+class CollectorStats:
+
+    # expected_rates: {stream name: samples per second}
+    # name: prefix of the summary line, used to tell several armbands apart
+    def __init__(self, expected_rates, summary_interval=None, name=None):
+        self.name = name
+        self.streams = {name: StreamStats(name, rate) for name, rate in expected_rates.items()}
+        self.summaryInterval = summary_interval
+        self.lastSummary = perf_counter()
+
+    def __getitem__(self, name):
+        return self.streams[name]
+
+    def reset(self):
+        for stream_stats in self.streams.values():
+            stream_stats.reset()
+
+    def as_dict(self):
+        return {name: stream_stats.as_dict() for name, stream_stats in self.streams.items()}
+
+    def summary_line(self):
+        line = ' | '.join(stream_stats.summary() for stream_stats in self.streams.values())
+        return line if self.name is None else '{}: {}'.format(self.name, line)
+
+    # prints the summary line if summary_interval seconds have passed since the last one
+    def print_summary_if_due(self, now):
+        if self.summaryInterval is not None and now - self.lastSummary >= self.summaryInterval:
+            self.lastSummary = now
+            print('STATS -- ' + self.summary_line())
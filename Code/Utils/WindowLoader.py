@@ -0,0 +1,299 @@
+import os
+import queue
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from Utils import ArrayDataset, Catalog
+from Utils.Interpolation import interpolate, repair_timestamps
+
+STREAM_COLUMNS = dict(ArrayDataset.ARRAY_STREAMS)
+DEFAULT_STREAMS = ('emg', 'accelerometer', 'gyro')
+
+# pickles with the recorded samples are resampled onto a grid of this many microseconds, the EMG rate, unless a
+# timestep is given, interpolated pickles and arrays keep their own grid
+DEFAULT_TIMESTEP = 5_000
+
+# bytes of decoded recordings kept in memory, memory-mapped arrays do not count
+CACHE_SIZE = 256 * 1024 * 1024
+
+# balance: how the windows of an epoch are drawn from the classes
+# oversample - every class gets as many windows as the largest one, the windows of smaller classes are repeated
+# undersample - every class gets as many windows as the smallest one
+BALANCING = (None, 'oversample', 'undersample')
+
+
+# positions of the columns of the streams in the arrays of ArrayDataset
+def array_columns(streams):
+    return np.array([ArrayDataset.ARRAY_COLUMNS.index(stream + '_' + column)
+                     for stream in streams for column in STREAM_COLUMNS[stream]])
+
+
+# (data, columns) of a converted recording, window i is data[start:start + window, columns],
+# arrays on the wanted grid stay memory-mapped, so only the rows of the windows are read
+# everything else becomes a (rows, channels) float32 matrix, interpolated pickles on their own grid are taken as they
+# are, all others are resampled onto a grid of timestep microseconds (DEFAULT_TIMESTEP if None) over the time all
+# streams cover, a recording with an empty stream has no rows
+def open_recording(path, streams, timestep=None):
+    if path.endswith(ArrayDataset.ARRAY_EXTENSION):
+        metadata, array = ArrayDataset.load_recording(path)
+        if timestep is None or timestep == metadata['timestep']:
+            return array, array_columns(streams)
+        gesture_dict = ArrayDataset.load_gesture_dict(path)
+    else:
+        gesture_dict = ArrayDataset.load_converted(path)
+        grid = gesture_dict.get('timestamps')
+        if grid is not None and (timestep is None or len(grid) < 2 or timestep == grid[1] - grid[0]):
+            return np.column_stack([np.asarray(gesture_dict[stream][column], dtype=np.float32)
+                                    for stream in streams for column in STREAM_COLUMNS[stream]]), None
+
+    timestep = timestep or DEFAULT_TIMESTEP
+    stream_data = []
+    for stream in streams:
+        order, timestamps = repair_timestamps(gesture_dict[stream]['timestamps'])
+        values = np.column_stack([np.asarray(gesture_dict[stream][column])[order]
+                                  for column in STREAM_COLUMNS[stream]])
+        stream_data.append((timestamps, values))
+    if any(len(timestamps) == 0 for timestamps, _ in stream_data):
+        return np.empty((0, sum(values.shape[1] for _, values in stream_data)), dtype=np.float32), None
+
+    # the time all streams cover
+    start = max(int(timestamps[0]) for timestamps, _ in stream_data)
+    end = min(int(timestamps[-1]) for timestamps, _ in stream_data)
+    grid = np.arange(start, end + 1, timestep, dtype=np.int64)
+    return np.hstack([interpolate(timestamps, values, grid, 'linear').astype(np.float32)
+                      for timestamps, values in stream_data]), None
+
+
+# rows of a recording interpolated on length rows own_timestep microseconds apart once open_recording has
+# resampled it onto a grid of timestep microseconds
+def grid_rows(length, own_timestep, timestep):
+    if timestep is None or timestep == own_timestep or length < 2:
+        return length
+    return (length - 1) * own_timestep // timestep + 1
+
+
+# rows open_recording returns for every recording without reading any data: arrays from their sidecar, interpolated
+# pickles from the length and timestep in the catalog of their converted folder
+# all other pickles have to be opened, they are put into cache
+def recording_rows(paths, timestep, cache):
+    rows = [None] * len(paths)
+    pickles = {}
+    for index, path in enumerate(paths):
+        if path.endswith(ArrayDataset.ARRAY_EXTENSION):
+            metadata = ArrayDataset.load_metadata(path)
+            rows[index] = grid_rows(metadata['shape'][0], metadata['timestep'], timestep)
+        else:
+            # Data/converted/<user>/<gesture>/<file>
+            converted_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+            pickles.setdefault(converted_path, []).append(index)
+
+    for converted_path, indices in pickles.items():
+        catalog_rows = {}
+        if os.path.exists(os.path.join(converted_path, Catalog.CATALOG_NAME)):
+            with Catalog.Catalog(converted_path) as catalog:
+                catalog_rows = {row['path']: row for row in catalog.rows()}
+
+        for index in indices:
+            key = os.path.relpath(os.path.abspath(paths[index]), converted_path).replace(os.sep, '/')
+            row = catalog_rows.get(key)
+            if row is not None and row['length'] is not None and row['timestep'] is not None:
+                rows[index] = grid_rows(row['length'], row['timestep'], timestep)
+            else:
+                rows[index] = len(cache.get(paths[index])[0])
+    return rows
+
+
+# gesture of a converted recording from its place in the tree, e.g. Data/converted/alice/fist/fist....p
+def recording_label(path):
+    return os.path.basename(os.path.dirname(os.path.abspath(path)))
+
+
+# least recently used recordings are dropped once the decoded ones take more than max_bytes,
+# shared by the worker threads of a loader
+class RecordingCache:
+
+    def __init__(self, max_bytes, streams, timestep):
+        self.maxBytes = max_bytes
+        self.streams = streams
+        self.timestep = timestep
+        self.currentBytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                self.entries.move_to_end(path)
+                return entry[0]
+
+        # opened outside of the lock, so the other threads are not held up, at worst a recording is opened twice
+        opened = open_recording(path, self.streams, self.timestep)
+        size = 0 if isinstance(opened[0], np.memmap) else opened[0].nbytes
+
+        with self.lock:
+            if path not in self.entries:
+                self.entries[path] = (opened, size)
+                self.currentBytes += size
+            # the most recently used recording is kept even if it is larger than max_bytes on its own
+            while self.currentBytes > self.maxBytes and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.currentBytes -= evicted_size
+        return opened
+
+
+# yields shuffled batches of fixed-length windows of all recordings as contiguous float32 arrays
+# (batch, window, channels) with int64 class indices (batch,), window and hop count rows of the recordings' time grid
+# the batches of an epoch are assembled ahead by `workers` threads, each thread keeps at most `prefetch` batches
+# ready, so memory stays bounded no matter how many recordings there are, workers=0 assembles every batch when it
+# is asked for
+# with more than one worker the batches still come in the same order for the same seed
+#
+# e.g. for x, y in WindowLoader(paths, window=100, hop=20, balance='oversample'): ...
+class WindowLoader:
+
+    # labels: class of every recording, by default the gesture folder of its path
+    def __init__(self, paths, window, hop, batch_size=64, streams=DEFAULT_STREAMS, labels=None, balance=None,
+                 shuffle=True, drop_last=False, workers=2, prefetch=2, timestep=None, seed=None,
+                 cache_size=CACHE_SIZE):
+        if balance not in BALANCING:
+            raise ValueError('unknown balancing {}, use one of {}'.format(balance, BALANCING))
+
+        self.paths = list(paths)
+        self.window = window
+        self.hop = hop
+        self.batchSize = batch_size
+        self.streams = tuple(streams)
+        self.balance = balance
+        self.shuffle = shuffle
+        self.dropLast = drop_last
+        self.workers = max(0, workers)
+        self.prefetch = max(1, prefetch)
+        self.rng = np.random.default_rng(seed)
+        self.cache = RecordingCache(cache_size, self.streams, timestep)
+
+        labels = [recording_label(path) for path in self.paths] if labels is None else list(labels)
+        self.classes = sorted(set(labels))
+        class_indices = {label: index for index, label in enumerate(self.classes)}
+
+        # (recording, first row, class) of every window, the recordings are only opened by the workers
+        recordings, starts, classes = [], [], []
+        for index, rows in enumerate(recording_rows(self.paths, timestep, self.cache)):
+            recording_starts = np.arange(0, rows - window + 1, hop, dtype=np.int64)
+            recordings.append(np.full(len(recording_starts), index, dtype=np.int64))
+            starts.append(recording_starts)
+            classes.append(np.full(len(recording_starts), class_indices[labels[index]], dtype=np.int64))
+
+        self.windowRecordings = np.concatenate(recordings) if recordings else np.empty(0, dtype=np.int64)
+        self.windowStarts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        self.windowClasses = np.concatenate(classes) if classes else np.empty(0, dtype=np.int64)
+        self.channelCount = sum(len(STREAM_COLUMNS[stream]) for stream in self.streams)
+
+        self.__stop = None
+        self.__threads = []
+
+    @classmethod
+    def from_catalog(cls, converted_path, window, hop, user=None, gesture=None, since=None, until=None,
+                     min_duration=None, max_duration=None, **options):
+        with Catalog.Catalog(converted_path) as catalog:
+            rows = catalog.rows(user, gesture, since, until, min_duration, max_duration)
+        paths = [os.path.join(converted_path, *row['path'].split('/')) for row in rows]
+        return cls(paths, window, hop, labels=[row['gesture'] for row in rows], **options)
+
+    def window_count(self):
+        counts = np.bincount(self.windowClasses, minlength=len(self.classes))
+        counts = counts[counts > 0]
+        if self.balance == 'oversample' and len(counts):
+            return int(counts.max()) * len(counts)
+        if self.balance == 'undersample' and len(counts):
+            return int(counts.min()) * len(counts)
+        return len(self.windowClasses)
+
+    def __len__(self):
+        windows = self.window_count()
+        return windows // self.batchSize if self.dropLast else -(-windows // self.batchSize)
+
+    # the windows of one epoch in the order they are batched
+    def __epoch_windows(self):
+        if self.balance is None:
+            selected = np.arange(len(self.windowClasses))
+        else:
+            members = [np.flatnonzero(self.windowClasses == index) for index in range(len(self.classes))]
+            members = [windows for windows in members if len(windows)]
+            target = self.window_count() // max(1, len(members))
+            selected = np.concatenate([
+                np.concatenate((windows, self.rng.choice(windows, target - len(windows))))
+                if target > len(windows) else self.rng.choice(windows, target, replace=False)
+                for windows in members]) if members else np.empty(0, dtype=np.int64)
+
+        if self.shuffle:
+            selected = self.rng.permutation(selected)
+        batch_count = len(self)
+        return [selected[batch * self.batchSize:(batch + 1) * self.batchSize] for batch in range(batch_count)]
+
+    def assemble(self, windows):
+        batch = np.empty((len(windows), self.window, self.channelCount), dtype=np.float32)
+        recordings = self.windowRecordings[windows]
+
+        # windows of the same recording are copied one after the other, so each recording is looked up once
+        for recording in np.unique(recordings):
+            data, columns = self.cache.get(self.paths[recording])
+            for position in np.flatnonzero(recordings == recording):
+                start = self.windowStarts[windows[position]]
+                rows = data[start:start + self.window]
+                if len(rows) < self.window:
+                    raise ValueError('{} has {} rows, fewer than planned, it changed after the loader was created'
+                                     .format(self.paths[recording], len(data)))
+                batch[position] = rows[:, columns] if columns is not None else rows
+        return batch, self.windowClasses[windows]
+
+    # worker `index` assembles the batches index, index + workers, ... into its own queue, errors are passed on
+    def __work(self, index, batches, output, stop):
+        for batch in range(index, len(batches), self.workers):
+            try:
+                result = self.assemble(batches[batch])
+            except Exception as error:
+                result = error
+
+            # waits for room in the queue until the epoch is stopped
+            while not stop.is_set():
+                try:
+                    output.put(result, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if stop.is_set() or isinstance(result, Exception):
+                return
+
+    def __iter__(self):
+        batches = self.__epoch_windows()
+        if self.workers == 0:
+            for windows in batches:
+                yield self.assemble(windows)
+            return
+
+        stop = threading.Event()
+        outputs = [queue.Queue(self.prefetch) for _ in range(self.workers)]
+        threads = [threading.Thread(target=self.__work, args=(index, batches, outputs[index], stop), daemon=True)
+                   for index in range(self.workers)]
+        self.__stop, self.__threads = stop, threads
+        for thread in threads:
+            thread.start()
+
+        try:
+            for batch in range(len(batches)):
+                result = outputs[batch % self.workers].get()
+                if isinstance(result, Exception):
+                    raise result
+                yield result
+        finally:
+            self.close()
+
+    # stops the workers of an epoch which was not iterated to its end
+    def close(self):
+        if self.__stop is not None:
+            self.__stop.set()
+            for thread in self.__threads:
+                thread.join()
+        self.__stop, self.__threads = None, []
@@ -0,0 +1,137 @@
+import os
+import csv
+import struct
+
+from Utils import BinaryFormat
+
+# stream ids used by the FileWriter, the backends keep one output per stream in this order
+# euler angles are not recorded, the converter derives them from the orientation quaternions
+EMG, GYRO, ORIENTATION, ACCELEROMETER = range(4)
+STREAM_NAMES = ('emg', 'gyro', 'orientation', 'accelerometer')
+
+CSV_HEADERS = ('timestamp,emg1,emg2,emg3,emg4,emg5,emg6,emg7,emg8',
+               'timestamp,x,y,z',
+               'timestamp,x,y,z,w',
+               'timestamp,x,y,z')
+
+
+# writes one text file per stream, e.g. emg_2018-05-04_12-00-00.csv
+class CsvBackend:
+
+    def __init__(self):
+        self.files = [None] * len(STREAM_NAMES)
+        self.writers = [None] * len(STREAM_NAMES)
+
+    def open(self, directory, creation_time, metadata):
+        for stream, stream_name in enumerate(STREAM_NAMES):
+            self.files[stream] = open(os.path.join(directory, stream_name + '_' + creation_time + '.csv'),
+                                      'a+', newline='')
+            self.writers[stream] = csv.writer(self.files[stream], delimiter=',')
+            self.writers[stream].writerow([CSV_HEADERS[stream]])
+
+    def write_row(self, stream, row):
+        self.writers[stream].writerow(row)
+
+    def write_rows(self, stream, rows):
+        self.writers[stream].writerows(rows)
+
+    def close(self):
+        for stream_file in self.files:
+            if stream_file is not None:
+                stream_file.close()
+
+        self.files = [None] * len(STREAM_NAMES)
+        self.writers = [None] * len(STREAM_NAMES)
+
+
+# writes one file of fixed-width records per stream, see BinaryFormat for the layout
+class BinaryBackend:
+
+    def __init__(self):
+        self.files = [None] * len(STREAM_NAMES)
+        self.packers = [struct.Struct(BinaryFormat.RECORD_FORMATS[stream_name]) for stream_name in STREAM_NAMES]
+
+    def open(self, directory, creation_time, metadata):
+        for stream, stream_name in enumerate(STREAM_NAMES):
+            self.files[stream] = open(os.path.join(directory, stream_name + '_' + creation_time +
+                                                   BinaryFormat.FILE_EXTENSION), 'wb')
+            self.files[stream].write(BinaryFormat.pack_header(stream_name, metadata))
+
+    def write_row(self, stream, row):
+        self.files[stream].write(self.packers[stream].pack(*row))
+
+    def write_rows(self, stream, rows):
+        pack = self.packers[stream].pack
+        self.files[stream].write(b''.join([pack(*row) for row in rows]))
+
+    def close(self):
+        for stream_file in self.files:
+            if stream_file is not None:
+                stream_file.close()
+
+        self.files = [None] * len(STREAM_NAMES)
+
+
+# writes a single session file per recording, e.g. session_2018-05-04_12-00-00.myo, which contains all streams
+# and the metadata, see BinaryFormat for the layout
+#
+# the records of every stream are collected until there are BLOCK_BYTES of them and then appended to the session as
+# one block, about as much as a csv file keeps in its write buffer, so an interrupted recording loses no more than
+# csv files would, the index with the final metadata (e.g. device info) is written when the recording is closed
+BLOCK_BYTES = 8192
+
+
+class SessionBackend:
+
+    def __init__(self):
+        self.sessionFile = None
+        self.packers = [struct.Struct(BinaryFormat.RECORD_FORMATS[stream_name]) for stream_name in STREAM_NAMES]
+        self.pending = [bytearray() for _ in STREAM_NAMES]
+        self.blocks = None
+        self.metadata = None
+
+    def open(self, directory, creation_time, metadata):
+        self.metadata = metadata
+        self.blocks = {stream_name: [] for stream_name in STREAM_NAMES}
+        self.sessionFile = open(os.path.join(directory, 'session_' + creation_time + BinaryFormat.SESSION_EXTENSION),
+                                'wb')
+        self.sessionFile.write(BinaryFormat.pack_session_header(metadata, STREAM_NAMES))
+
+    def write_row(self, stream, row):
+        self.pending[stream] += self.packers[stream].pack(*row)
+        if len(self.pending[stream]) >= BLOCK_BYTES:
+            self.__write_block(stream)
+
+    def write_rows(self, stream, rows):
+        pack = self.packers[stream].pack
+        self.pending[stream] += b''.join([pack(*row) for row in rows])
+        if len(self.pending[stream]) >= BLOCK_BYTES:
+            self.__write_block(stream)
+
+    def __write_block(self, stream):
+        count = len(self.pending[stream]) // self.packers[stream].size
+        if count == 0:
+            return
+        self.sessionFile.write(BinaryFormat.pack_block_header(stream, count))
+        self.blocks[STREAM_NAMES[stream]].append([self.sessionFile.tell(), count])
+        self.sessionFile.write(self.pending[stream])
+        self.pending[stream] = bytearray()
+
+    def close(self):
+        if self.sessionFile is not None:
+            for stream in range(len(STREAM_NAMES)):
+                self.__write_block(stream)
+            self.sessionFile.write(BinaryFormat.pack_session_index(self.metadata, self.blocks,
+                                                                   self.sessionFile.tell()))
+            self.sessionFile.close()
+
+        self.sessionFile = None
+        self.pending = [bytearray() for _ in STREAM_NAMES]
+        self.blocks = None
+
+
+BACKENDS = {
+    'csv': CsvBackend,
+    'binary': BinaryBackend,
+    'session': SessionBackend,
+}